@@ -0,0 +1,96 @@
+"""
+Benchmark do pool de compilação LaTeX com um compilador falso (não requer TeX instalado).
+
+O compilador falso é um script Python que consome CPU por --cpu segundos a cada passada e grava
+.aux e .pdf. Mede a vazão de N compilações simultâneas (versões distintas de um documento com o
+mesmo nome e preâmbulo, que compartilham o build) com 1, 2, 4 e 8 workers, conferindo que cada
+trabalho recebe o seu próprio PDF, e confere o encerramento de um documento que não termina e o
+limite da fila.
+Uso: python benchmarks/bench_compile_pool.py [--jobs 16] [--cpu 0.2]
+"""
+import argparse
+import os
+import stat
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from latex_compiler import CompilePool, CompileQueueFullError, LatexCompiler
+
+FAKE_COMPILER = """#!{python}
+import re, sys, time
+args = sys.argv[1:]
+job = next(a.split("=", 1)[1] for a in args if a.startswith("-jobname="))
+if "-ini" in args:
+    sys.exit(1) # sem suporte a formatos: o serviço compila sem preâmbulo pré-compilado
+tex = open(args[-1]).read()
+while "\\\\loop" in tex:
+    pass # documento que nunca termina
+end = time.process_time() + {cpu}
+while time.process_time() < end:
+    pass
+open(job + ".aux", "w").write("\\n".join(re.findall(r"\\\\section\\{{(.*?)\\}}", tex)))
+open(job + ".pdf", "w", encoding="utf-8").write("%PDF-1.4\\n% " + open(job + ".aux").read() + "\\n%%EOF\\n")
+print("Output written on " + job + ".pdf")
+"""
+
+DOCUMENT = "\\documentclass{article}\n\\begin{document}\n\\section{Sessão %d}\nTexto.\n\\end{document}\n"
+
+def wait_all(pool, job_ids):
+    results = {}
+    while len(results) < len(job_ids):
+        for job_id in job_ids:
+            if job_id not in results:
+                job = pool.poll(job_id)
+                if job.state == "concluído":
+                    results[job_id] = job.result
+        time.sleep(0.01)
+    return [results[job_id] for job_id in job_ids]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--cpu", type=float, default=0.2)
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    compiler_path = os.path.join(temp_dir, "fake-pdflatex")
+    with open(compiler_path, "w") as f:
+        f.write(FAKE_COMPILER.format(python=sys.executable, cpu=args.cpu))
+    os.chmod(compiler_path, os.stat(compiler_path).st_mode | stat.S_IEXEC)
+    print(f"{args.jobs} compilações simultâneas, {args.cpu}s de CPU por passada, {os.cpu_count()} CPUs")
+
+    for workers in (1, 2, 4, 8):
+        compiler = LatexCompiler(build_root=os.path.join(temp_dir, f"builds_{workers}"), compiler=compiler_path)
+        pool = CompilePool(compiler, workers=workers, max_queue=args.jobs)
+        start = time.perf_counter()
+        job_ids = [pool.submit(DOCUMENT % i, "documento_gerado") for i in range(args.jobs)]
+        results = wait_all(pool, job_ids)
+        elapsed = time.perf_counter() - start
+        assert all(result.success for result in results)
+        assert all(f"Sessão {i}".encode("utf-8") in result.pdf_data for i, result in enumerate(results)), "PDF trocado"
+        latencies = sorted(result.elapsed for result in results)
+        print(
+            f"{workers} workers: {elapsed:6.2f}s, {args.jobs / elapsed:5.1f} compilações/s, "
+            f"latência p50 {latencies[len(latencies) // 2]:.2f}s / máx {latencies[-1]:.2f}s"
+        )
+
+    compiler = LatexCompiler(build_root=os.path.join(temp_dir, "builds_timeout"), compiler=compiler_path, timeout_seconds=1)
+    pool = CompilePool(compiler, workers=1, max_queue=2)
+    start = time.perf_counter()
+    job_ids = [pool.submit(DOCUMENT.replace("Texto.", "\\loop"), "infinito"), pool.submit(DOCUMENT % 0, "normal")]
+    try:
+        pool.submit(DOCUMENT % 1, "excedente")
+        print("limite da fila não aplicado!")
+    except CompileQueueFullError as e:
+        print(f"terceiro trabalho recusado: {e}")
+    runaway, normal = wait_all(pool, job_ids)
+    print(f"documento sem fim: sucesso={runaway.success} ({runaway.log}); seguinte: sucesso={normal.success}, "
+          f"total {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
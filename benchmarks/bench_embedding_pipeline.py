@@ -0,0 +1,76 @@
+"""
+Benchmark do estágio de embeddings da ingestão contra um servidor Ollama falso local.
+
+Mede chunks/s para diferentes tamanhos de lote e níveis de concorrência.
+Uso: python benchmarks/bench_embedding_pipeline.py [--chunks 512] [--latency-ms 20]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from langchain_community.embeddings import OllamaEmbeddings
+from langchain_core.documents import Document
+
+from ingestion import embed_batches, iter_batches
+
+EMBEDDING_DIM = 768
+
+def make_handler(latency: float):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        """Responde a /api/embeddings (um texto) e /api/embed (vários textos) após uma latência fixa."""
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            if self.path.endswith("/api/embed"):
+                inputs = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+                body = {"embeddings": [[0.1] * EMBEDDING_DIM for _ in inputs]}
+            else:
+                body = {"embedding": [0.1] * EMBEDDING_DIM}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeOllamaHandler
+
+def run(embeddings, chunks, batch_size: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    done = 0
+    for batch, vectors in embed_batches(embeddings, iter_batches(chunks, batch_size), concurrency, concurrency * 2):
+        assert len(vectors) == len(batch)
+        done += len(batch)
+    return done / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    embeddings = OllamaEmbeddings(model="fake", base_url=f"http://127.0.0.1:{server.server_address[1]}")
+
+    chunks = [(str(i), Document(page_content=f"chunk {i} " * 50)) for i in range(args.chunks)]
+    print(f"{args.chunks} chunks, latência do servidor {args.latency_ms} ms por requisição")
+    print(f"{'lote':>6} {'concorrência':>13} {'chunks/s':>10}")
+    for batch_size in (1, 8, 32, 128):
+        for concurrency in (1, 2, 4, 8):
+            rate = run(embeddings, chunks, batch_size, concurrency)
+            print(f"{batch_size:>6} {concurrency:>13} {rate:>10.1f}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark de memória da ingestão: materializar todas as páginas vs. pipeline em janelas.
+
+Cada modo roda em um subprocesso separado sobre o mesmo PDF sintético de 1.000 páginas
+e reporta o pico de RSS e o pico de heap Python (tracemalloc).
+Uso: python benchmarks/bench_ingestion_memory.py [--pages 1000] [--window 16]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+def run_mode(mode: str, pdf_path: str, window: int) -> None:
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from config import CHUNK_OVERLAP, CHUNK_SIZE
+    from ingestion import iter_batches, iter_pdf_page_windows
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = 0
+    if mode == "materializado":
+        all_docs = PyPDFLoader(pdf_path).load()
+        all_chunks = splitter.split_documents(all_docs)
+        for batch in iter_batches(all_chunks, 32):
+            chunks += len(batch)
+    else:
+        windows = (splitter.split_documents(pages) for _, pages in iter_pdf_page_windows([pdf_path], window))
+        for batch in iter_batches((chunk for window_chunks in windows for chunk in window_chunks), 32):
+            chunks += len(batch)
+    elapsed = time.perf_counter() - start
+    _, heap_peak = tracemalloc.get_traced_memory()
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB -> MiB no Linux
+    print(f"{mode:>14} {chunks:>8} {heap_peak / 2**20:>12.1f} {rss_peak:>12.1f} {elapsed:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--window", type=int, default=16)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.pdf, args.window)
+        return
+
+    from synthetic_pdf import write_pdf
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = write_pdf(os.path.join(temp_dir, "sintetico.pdf"), args.pages)
+        print(f"PDF sintético: {args.pages} páginas, {os.path.getsize(pdf_path) / 2**20:.1f} MiB, janela de {args.window} páginas")
+        print(f"{'modo':>14} {'chunks':>8} {'heap (MiB)':>12} {'RSS (MiB)':>12} {'tempo (s)':>9}")
+        for mode in ("materializado", "janelas"):
+            subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--pdf", pdf_path, "--window", str(args.window)],
+                check=True
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark da conversão PDF -> LaTeX em blocos contra um cliente Gemini falso (sem rede).
+
+O cliente falso simula a latência de cada chamada e falhas transitórias, para medir o tempo total
+com 1, 2, 4 e 8 blocos simultâneos e conferir que as partes chegam ao documento final na ordem das páginas.
+Compara a união hierárquica (LLM só nas fronteiras) com o prompt único de concatenação. Depois simula um bloco que falha em todas as tentativas e mede a retomada a partir dos checkpoints
+e a reconversão do mesmo PDF.
+Uso: python benchmarks/bench_latex_conversion.py [--pages 300] [--latency 0.5] [--failure-rate 0.1]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+import latex_tools
+from disk_cache import SQLiteLRUCache
+from latex_tools import LatexTools
+from latex_merge import BOUNDARY_SEPARATOR
+from llm_gateway import LLMGateway
+from synthetic_pdf import build_pdf
+
+class FakeGenAI:
+    """Substituto de google.generativeai com a mesma interface usada por LatexTools."""
+
+    def __init__(self, latency: float, failure_rate: float, seed: int = 0, broken: str = ""):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.broken = broken # blocos cujo nome contém este texto falham sempre
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.uploaded = {}
+        self.uploads = 0
+        self.calls = 0
+        self.failures = 0
+        self.merge_inputs = [] # textos enviados na etapa de união (fronteiras ou concatenação)
+
+    def upload_file(self, path, display_name, mime_type):
+        with self.lock:
+            name = f"files/{self.uploads}"
+            self.uploads += 1
+            self.uploaded[name] = display_name
+        return SimpleNamespace(name=name, display_name=display_name)
+
+    def delete_file(self, name):
+        with self.lock:
+            del self.uploaded[name]
+
+    def GenerativeModel(self, model_name):
+        return SimpleNamespace(generate_content=self._generate_content)
+
+    def _generate_content(self, contents):
+        prompt, payload = contents
+        with self.lock:
+            self.calls += 1
+            fail = self.random.random() < self.failure_rate
+            fail = fail or bool(self.broken and not isinstance(payload, str) and self.broken in payload.display_name)
+            jitter = self.random.uniform(0.5, 1.5)
+        time.sleep(self.latency * jitter)
+        if fail:
+            with self.lock:
+                self.failures += 1
+            raise RuntimeError("503 Service Unavailable (simulado)")
+        if isinstance(payload, str):
+            with self.lock:
+                self.merge_inputs.append(payload)
+            return SimpleNamespace(text=payload.replace(BOUNDARY_SEPARATOR + "\n", ""))
+        return SimpleNamespace(text=f"\\section{{{payload.display_name}}}")
+
+class FakeUpload:
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    upload = FakeUpload("manuscrito.pdf", build_pdf(args.pages, lines_per_page=5))
+    latex_tools.LATEX_CONVERSION_RETRY_BASE_DELAY = 0.05
+    blocks = -(-args.pages // latex_tools.LATEX_PAGES_PER_BLOCK)
+    print(f"{args.pages} páginas em {blocks} blocos, latência ~{args.latency}s, {args.failure_rate:.0%} de falhas")
+
+    work_dir = tempfile.mkdtemp()
+    os.chdir(work_dir) # nenhum arquivo deve ser gravado no diretório de trabalho
+    def new_store(table="conversion_checkpoints"):
+        return SQLiteLRUCache(tempfile.mktemp(suffix=".sqlite3"), 10_000, table=table)
+
+    def convert(client, store):
+        gateway = LLMGateway(lambda api_key: client, new_store("llm_responses")).bind("fake-key")
+        start = time.perf_counter()
+        latex = LatexTools("fake-model", gateway=gateway, checkpoints=store).convert_pdf_to_latex(upload)
+        return latex, time.perf_counter() - start
+
+    for workers in (1, 2, 4, 8):
+        latex_tools.LATEX_CONVERSION_MAX_WORKERS = workers
+        client = FakeGenAI(args.latency, args.failure_rate)
+        latex, elapsed = convert(client, new_store())
+
+        starts = [int(page) for page in re.findall(r"\\section\{[^}]*_pags_(\d+)_a_", latex)]
+        assert len(starts) == blocks and starts == sorted(starts), "partes fora de ordem"
+        assert not client.uploaded and not os.listdir(work_dir), "arquivos remotos ou locais não removidos"
+        print(f"{workers} simultâneos: {elapsed:6.2f}s  ({client.calls} chamadas, {client.failures} falhas repetidas)")
+
+    latex_tools.LATEX_CONVERSION_MAX_WORKERS = 4
+    for mode in ("llm", "hierarchical"):
+        latex_tools.LATEX_MERGE_MODE = mode
+        client = FakeGenAI(args.latency, 0.0)
+        _, elapsed = convert(client, new_store())
+        largest = max(len(text) for text in client.merge_inputs)
+        print(
+            f"união {mode:>12}: {elapsed:6.2f}s  ({len(client.merge_inputs)} chamadas, "
+            f"{sum(map(len, client.merge_inputs))} caracteres enviados, maior prompt {largest})"
+        )
+
+    store = new_store()
+    client = FakeGenAI(args.latency, 0.0, broken="_pags_31_a_")
+    latex, elapsed = convert(client, store)
+    assert latex == ""
+    print(f"com um bloco sempre falhando: {elapsed:6.2f}s  ({client.calls} chamadas, conversão abortada)")
+    client = FakeGenAI(args.latency, 0.0)
+    latex, elapsed = convert(client, store)
+    assert latex and client.calls == 1 + blocks - 1
+    print(f"retomada do checkpoint:       {elapsed:6.2f}s  ({client.calls} chamadas: o bloco ausente e as fronteiras)")
+    client = FakeGenAI(args.latency, 0.0)
+    latex_again, elapsed = convert(client, store)
+    assert latex_again == latex and client.calls == 0
+    print(f"mesmo PDF novamente:          {elapsed:6.2f}s  ({client.calls} chamadas)")
+
+if __name__ == "__main__":
+    main()
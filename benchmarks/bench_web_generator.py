@@ -0,0 +1,77 @@
+"""
+Benchmark da conversão local LaTeX -> HTML do WebGenerator em documentos .tex grandes (sem LLM).
+
+Gera documentos sintéticos com seções, subseções, parágrafos, fórmulas em linha e de exibição,
+align, listas e tabelas, e mede o tempo até o primeiro pedaço da página, o tempo total e a vazão.
+Confere também que cada seção e cada fórmula chegam ao HTML.
+Uso: python benchmarks/bench_web_generator.py [--sections 50 500 2000] [--paragraphs 6]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from web_generator import iter_page_html, split_latex_sections
+
+_WORDS = (
+    "momento angular spin operador hamiltoniano autovalor campo elétrico onda "
+    "equação energia potencial oscilador precessão matriz pauli quântico vetor"
+).split()
+
+def build_tex(sections: int, paragraphs: int, seed: int = 0) -> str:
+    """Monta um documento LaTeX sintético; retorna o texto."""
+    rng = random.Random(seed)
+
+    def sentence() -> str:
+        words = [rng.choice(_WORDS) for _ in range(14)]
+        words[rng.randrange(len(words))] = f"$L_{{{rng.randint(1, 9)}}} = m\\hbar$"
+        words[rng.randrange(len(words))] = "\\textbf{" + rng.choice(_WORDS) + "}"
+        return " ".join(words).capitalize() + "."
+
+    parts = ["\\documentclass{article}", "\\usepackage{amsmath}", "\\begin{document}", "\\maketitle"]
+    for section in range(sections):
+        parts.append(f"\\section{{Seção {section + 1}: {rng.choice(_WORDS)} $\\vec{{L}}$}}")
+        for paragraph in range(paragraphs):
+            if paragraph == paragraphs // 2:
+                parts.append(f"\\subsection{{{rng.choice(_WORDS).capitalize()}}}")
+            parts.append(" ".join(sentence() for _ in range(4)) + " % comentário")
+            parts.append("")
+        parts.append("$$ |\\vec{L}| = \\hbar \\sqrt{l(l+1)} $$")
+        parts.append("\\begin{align}\nE &= \\frac{p^2}{2m} + V(x) \\label{eq:%d} \\\\\nL_z &= m_l \\hbar\n\\end{align}" % section)
+        parts.append("\\begin{itemize}\n\\item " + sentence() + "\n\\item " + sentence() + "\n\\end{itemize}")
+        parts.append("\\begin{tabular}{cc}\n$l$ & $m$ \\\\\n1 & 0 \\\\\n\\end{tabular}")
+        parts.append("")
+    parts.append("\\end{document}")
+    return "\n".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--paragraphs", type=int, default=6)
+    args = parser.parse_args()
+
+    for sections in args.sections:
+        tex = build_tex(sections, args.paragraphs)
+        start = time.perf_counter()
+        chunks = iter_page_html(split_latex_sections(tex))
+        first = next(chunks) + next(chunks) # cabeçalho e primeira seção
+        first_elapsed = time.perf_counter() - start
+        page = first + "".join(chunks)
+        elapsed = time.perf_counter() - start
+
+        assert page.count("<section id=") == sections, "seções ausentes"
+        main_html = page[page.index("<main"):page.index("</main>")]
+        assert main_html.count("\\[") == 2 * sections and "$" not in main_html, "fórmulas não convertidas"
+        size_mb = len(tex.encode("utf-8")) / 1e6
+        print(
+            f"{sections:5d} seções ({size_mb:6.2f} MB de LaTeX): primeira seção em {first_elapsed * 1000:7.1f}ms, "
+            f"página completa em {elapsed * 1000:8.1f}ms ({size_mb / elapsed:5.1f} MB/s, {len(page) / 1e6:.2f} MB de HTML)"
+        )
+
+if __name__ == "__main__":
+    main()
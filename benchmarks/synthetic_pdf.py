@@ -0,0 +1,56 @@
+"""Gera PDFs sintéticos de texto para os benchmarks (sem dependências externas)."""
+import random
+
+_WORDS = (
+    "momento angular spin operador hamiltoniano autovalor campo eletrico onda "
+    "equacao energia potencial oscilador precessao matriz pauli quantico vetor"
+).split()
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def build_pdf(num_pages: int, lines_per_page: int = 45, seed: int = 0) -> bytes:
+    """Monta um PDF válido com num_pages páginas de texto em Helvetica."""
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # preenchido depois
+    pages_root = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page in range(num_pages):
+        lines = [f"Pagina {page + 1}"] + [
+            " ".join(rng.choice(_WORDS) for _ in range(12)) for _ in range(lines_per_page)
+        ]
+        stream = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        data = stream.encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(data), data))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_root, font, content)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_root
+    objects[pages_root - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+def write_pdf(path: str, num_pages: int, **kwargs) -> str:
+    with open(path, "wb") as f:
+        f.write(build_pdf(num_pages, **kwargs))
+    return path
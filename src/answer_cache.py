@@ -0,0 +1,158 @@
+# Cache semântico de respostas do RAG
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import (
+    logger,
+    RAG_ANSWER_CACHE_SIMILARITY,
+    RAG_ANSWER_CACHE_TTL_SECONDS,
+    RAG_ANSWER_CACHE_MAX_ENTRIES
+)
+
+@dataclass
+class _CachedAnswer:
+    question: str
+    embedding: Optional[List[float]] # normalizado, para que o cosseno seja um produto escalar (None: só texto exato)
+    answer: str
+    latency: float # segundos gastos para gerar a resposta original
+    created_at: float
+
+def normalize_question(question: str) -> str:
+    """Forma canônica da pergunta para a comparação exata (caixa e espaços ignorados)."""
+    return " ".join(question.casefold().split())
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+class SemanticAnswerCache:
+    """
+    Cache de respostas chaveado pela impressão digital da coleção e pelo embedding da pergunta.
+    Perguntas com similaridade de cosseno >= similarity_threshold a uma pergunta já respondida
+    reaproveitam a resposta; a mesma pergunta (a menos de caixa e espaços) é encontrada pelo texto,
+    sem precisar do embedding. Entradas expiram após ttl_seconds e o total é limitado por max_entries (LRU).
+    """
+
+    def __init__(self, similarity_threshold: float, ttl_seconds: float, max_entries: int):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], _CachedAnswer]" = OrderedDict()
+        self._by_fingerprint: Dict[str, Set[Tuple[str, int]]] = {}
+        self._by_question: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def lookup(self, fingerprint: str, question: str, question_embedding: Optional[List[float]] = None) -> Optional[str]:
+        """
+        Retorna a resposta da mesma pergunta ou, se o embedding for informado, de uma pergunta
+        suficientemente parecida.
+        """
+        start = time.perf_counter()
+        now = time.time()
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            exact_key = self._by_question.get((fingerprint, normalize_question(question)))
+            if exact_key is not None and now - self._entries[exact_key].created_at > self.ttl_seconds:
+                self._remove(exact_key)
+                exact_key = None
+            if exact_key is not None:
+                best_key, best_score = exact_key, 1.0
+            elif question_embedding is not None:
+                query = _normalize(question_embedding)
+                for key in list(self._by_fingerprint.get(fingerprint, ())):
+                    entry = self._entries[key]
+                    if now - entry.created_at > self.ttl_seconds:
+                        self._remove(key)
+                        continue
+                    if entry.embedding is None:
+                        continue
+                    score = sum(a * b for a, b in zip(query, entry.embedding))
+                    if score >= best_score:
+                        best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            self.latency_saved += max(entry.latency - (time.perf_counter() - start), 0.0)
+        logger.info(f"Resposta reaproveitada do cache semântico (similaridade {best_score:.3f} com '{entry.question}').")
+        return entry.answer
+
+    def store(
+        self,
+        fingerprint: str,
+        question: str,
+        question_embedding: Optional[List[float]],
+        answer: str,
+        latency: float
+    ) -> None:
+        """
+        Armazena uma resposta gerada, despejando as entradas menos usadas além do limite. Sem
+        embedding, a resposta só é reaproveitada para a mesma pergunta.
+        """
+        with self._lock:
+            question_key = (fingerprint, normalize_question(question))
+            if question_key in self._by_question:
+                self._remove(self._by_question[question_key])
+            key = (fingerprint, self._next_id)
+            self._next_id += 1
+            embedding = _normalize(question_embedding) if question_embedding is not None else None
+            self._entries[key] = _CachedAnswer(question, embedding, answer, latency, time.time())
+            self._by_fingerprint.setdefault(fingerprint, set()).add(key)
+            self._by_question[question_key] = key
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, collection_name: Optional[str] = None) -> None:
+        """Descarta as respostas de uma coleção (todas as impressões digitais dela) ou de todas."""
+        with self._lock:
+            for fingerprint in list(self._by_fingerprint):
+                if collection_name is None or fingerprint.startswith(f"{collection_name}:"):
+                    for key in list(self._by_fingerprint[fingerprint]):
+                        self._remove(key)
+
+    def _remove(self, key: Tuple[str, int]) -> None:
+        """Remove uma entrada. Requer o lock."""
+        entry = self._entries.pop(key)
+        question_key = (key[0], normalize_question(entry.question))
+        if self._by_question.get(question_key) == key:
+            del self._by_question[question_key]
+        keys = self._by_fingerprint[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_fingerprint[key[0]]
+
+    def stats(self) -> Dict[str, float]:
+        """Retorna métricas do cache: acertos, falhas, taxa de acerto e latência economizada."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "latency_saved_s": self.latency_saved,
+            "entries": len(self._entries),
+        }
+
+_cache_lock = threading.Lock()
+_shared_cache: Optional[SemanticAnswerCache] = None
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Retorna o cache de respostas compartilhado pelo processo."""
+    global _shared_cache
+    with _cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SemanticAnswerCache(
+                RAG_ANSWER_CACHE_SIMILARITY, RAG_ANSWER_CACHE_TTL_SECONDS, RAG_ANSWER_CACHE_MAX_ENTRIES
+            )
+        return _shared_cache
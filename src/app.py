@@ -1,17 +1,22 @@
 # Arquivo principal da aplicação Streamlit
 import streamlit as st
 import os
+import time
 import warnings
+import re
 import uuid
-import google.generativeai as genai
 from langchain_google_genai import ChatGoogleGenerativeAI
 from streamlit_ace import st_ace
 
-from config import logger, GEMINI_MODEL_NAME
-from utils import extract_all_pages_as_images, extract_pages_as_images_from_path, get_base64_download_link
+from config import logger, GEMINI_MODEL_NAME, PDF_VIEWER_PAGES_PER_VIEW, PDF_VIEWER_POLL_SECONDS, LATEX_COMPILE_POLL_SECONDS
+from utils import get_base64_download_link
+from pdf_viewer import LazyPDFDocument
 from rag_core import RAGCore
+from answer_cache import get_answer_cache
 from latex_tools import LatexTools
+from latex_compiler import CompileQueueFullError
 from web_generator import WebGenerator
+from llm_gateway import get_llm_gateway
 
 # --- CONFIGURAÇÕES GLOBAIS E INICIALIZAÇÃO ---
 warnings.filterwarnings('ignore', category=UserWarning, message='.*torch.classes.*')
@@ -39,22 +44,36 @@ class PDFChatApp:
         """Define os valores padrão para o estado da sessão."""
         if "vector_db" not in st.session_state:
             st.session_state.vector_db = None
+        if "vector_store_lease" not in st.session_state:
+            st.session_state.vector_store_lease = None
         if "messages" not in st.session_state:
             st.session_state.messages = []
-        if "pdf_pages" not in st.session_state:
-            st.session_state.pdf_pages = None
+        if "pdf_documents" not in st.session_state:
+            st.session_state.pdf_documents = None
         if "file_uploads" not in st.session_state:
             st.session_state.file_uploads = []
-        if "compiled_pdf_images" not in st.session_state:
-            st.session_state.compiled_pdf_images = None
+        if "compiled_pdf_document" not in st.session_state:
+            st.session_state.compiled_pdf_document = None
         if "compilation_success" not in st.session_state:
             st.session_state.compilation_success = None
         if "compilation_result" not in st.session_state:
             st.session_state.compilation_result = None
+        if "compilation_diagnostics" not in st.session_state:
+            st.session_state.compilation_diagnostics = None
         if "code_to_compile" not in st.session_state:
             st.session_state.code_to_compile = ""
         if "compiled_pdf_path" not in st.session_state:
             st.session_state.compiled_pdf_path = None
+        if "compile_job_id" not in st.session_state:
+            st.session_state.compile_job_id = None
+        if "tenant_id" not in st.session_state:
+            # Identidade estável do usuário: fica na URL (?tenant=...) e sobrevive a recarregamentos
+            # da página, ao contrário do estado da sessão, que recomeça a cada sessão do navegador
+            tenant_id = st.query_params.get("tenant", "")
+            if not re.fullmatch(r"[0-9a-f]{32}", tenant_id):
+                tenant_id = uuid.uuid4().hex
+                st.query_params["tenant"] = tenant_id
+            st.session_state.tenant_id = tenant_id
 
 
     def setup_api_key_and_llm(self):
@@ -68,11 +87,13 @@ class PDFChatApp:
                 )
 
             if google_api_key:
-                genai.configure(api_key=google_api_key)
-                self.llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, temperature=0.3)
+                # O gateway é compartilhado (cache de respostas), mas cada sessão chama o Gemini com a própria chave
+                gateway = get_llm_gateway().bind(google_api_key)
+                # A chave vai explícita para o LLM: as cadeias RAG compartilhadas são separadas por chave
+                self.llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, temperature=0.3, google_api_key=google_api_key)
                 self.rag_core = RAGCore(self.llm)
-                self.latex_tools = LatexTools(GEMINI_MODEL_NAME)
-                self.web_generator = WebGenerator(GEMINI_MODEL_NAME)
+                self.latex_tools = LatexTools(GEMINI_MODEL_NAME, gateway=gateway)
+                self.web_generator = WebGenerator(GEMINI_MODEL_NAME, gateway=gateway)
                 return True
             return False
         except Exception as e:
@@ -92,13 +113,48 @@ class PDFChatApp:
 
         if st.sidebar.button("Processar PDFs", key="upload_button", disabled=not file_uploads):
             with st.spinner("Processando PDFs... Isso pode levar um momento."):
-                st.session_state.vector_db = self.rag_core.create_vector_db_from_files(file_uploads)
+                progress_bar = st.sidebar.progress(0.0, text="Lendo e embedando páginas...")
+
+                def _on_progress(done: int, total: int):
+                    progress_bar.progress(done / max(total, 1), text=f"{done}/{total} páginas processadas")
+
+                if st.session_state.vector_store_lease is not None:
+                    st.session_state.vector_store_lease.release()
+                lease = self.rag_core.create_vector_db_from_files(file_uploads, _on_progress, st.session_state.tenant_id)
+                st.session_state.vector_store_lease = lease
+                st.session_state.vector_db = lease.vector_db if lease else None
+                progress_bar.empty()
                 if st.session_state.vector_db:
                     st.session_state.file_uploads = file_uploads
-                    st.session_state.pdf_pages = extract_all_pages_as_images(tuple(file_uploads))
+                    # As páginas são renderizadas sob demanda pelo visualizador
+                    st.session_state.pdf_documents = [
+                        LazyPDFDocument(file_upload.name, file_upload.getvalue()) for file_upload in file_uploads
+                    ]
                     st.success("PDFs processados e prontos para o chat!")
                 else:
                     st.error("Falha ao processar os PDFs.")
+
+        with st.sidebar.expander("📊 Métricas de cache"):
+            answer_stats = get_answer_cache().stats()
+            st.caption(
+                f"Respostas: {answer_stats['hits']} acertos / {answer_stats['misses']} falhas "
+                f"({answer_stats['hit_ratio']:.0%}), {answer_stats['latency_saved_s']:.1f}s economizados"
+            )
+            embedding_stats = self.rag_core.embeddings.cache.stats()
+            st.caption(
+                f"Embeddings: {embedding_stats['hits']} acertos / {embedding_stats['misses']} falhas "
+                f"({embedding_stats['hit_ratio']:.0%}), {embedding_stats['entries']} vetores"
+            )
+            store_stats = self.rag_core.vector_stores.stats()
+            st.caption(
+                f"Banco vetorial: {store_stats['open_collections']} coleções abertas, "
+                f"{store_stats['leases']} sessões usando"
+            )
+            llm_stats = get_llm_gateway().stats()
+            st.caption(
+                f"LLM (LaTeX/Web): {llm_stats['hits']} acertos / {llm_stats['misses']} falhas "
+                f"({llm_stats['hit_ratio']:.0%}), {llm_stats['calls']} chamadas, {llm_stats['coalesced']} pedidos agrupados"
+            )
         
         st.sidebar.markdown(
         """
@@ -114,18 +170,38 @@ class PDFChatApp:
 
         with col1:
             st.subheader("Visualizador de PDF")
-            if st.session_state.get("pdf_pages"):
+            if st.session_state.get("pdf_documents"):
                 if st.button("⚠️ Limpar Base de Dados", use_container_width=True, type="primary"):
-                    st.session_state.vector_db.delete_collection()
-                    for key in ["vector_db", "messages", "pdf_pages", "file_uploads"]:
+                    # Libera as coleções deste usuário; as que outros usuários também usam ficam intactas
+                    if st.session_state.vector_store_lease is not None:
+                        st.session_state.vector_store_lease.release()
+                    self.rag_core.delete_tenant_data(st.session_state.tenant_id)
+                    for key in ["vector_db", "vector_store_lease", "messages", "pdf_documents", "file_uploads"]:
                         if key in st.session_state:
                             del st.session_state[key]
                     st.rerun()
 
-                zoom_level = st.slider("Nível de Zoom", 100, 1000, 700, 50)
+                documents = st.session_state.pdf_documents
+                document = documents[0]
+                if len(documents) > 1:
+                    document = st.selectbox("Documento", documents, format_func=lambda doc: doc.name)
+
+                viewer_controls = st.columns([3, 2])
+                with viewer_controls[0]:
+                    zoom_level = st.slider("Nível de Zoom", 100, 1000, 700, 50)
+                with viewer_controls[1]:
+                    first_page = st.number_input(
+                        f"Página (de {document.page_count})", min_value=1, max_value=max(document.page_count, 1),
+                        value=1, step=PDF_VIEWER_PAGES_PER_VIEW, key=f"viewer_page_{document.name}"
+                    )
                 with st.container(height=450, border=True):
-                    for page_image in st.session_state.pdf_pages:
+                    # Apenas o intervalo visível é renderizado, na resolução pedida pelo zoom
+                    start = first_page - 1
+                    end = start + PDF_VIEWER_PAGES_PER_VIEW
+                    for page_image in document.render_pages(start, end, zoom_level, placeholder=True):
                         st.image(page_image, width=zoom_level)
+                    if document.pending(start, end, zoom_level):
+                        self._render_pages_status(document, start, end, zoom_level)
             else:
                 st.info("Faça o upload e processe os PDFs para visualizá-los aqui.")
 
@@ -142,10 +218,10 @@ class PDFChatApp:
                     with st.chat_message("user", avatar="👤"):
                         st.markdown(prompt)
 
-                    with st.spinner("Pensando..."):
-                        response = self.rag_core.process_question(prompt)
-                        st.session_state.messages.append({"role": "assistant", "content": response})
-                        st.rerun()
+                    with st.chat_message("assistant", avatar="🤖"):
+                        # Renderiza os tokens conforme chegam, sem redesenhar o histórico com st.rerun
+                        response = st.write_stream(self.rag_core.stream_question(prompt, st.session_state.vector_db))
+                    st.session_state.messages.append({"role": "assistant", "content": response})
 
     def _render_latex_conversion_tab(self):
         """Renderiza a interface para conversão de PDF para LaTeX."""
@@ -206,23 +282,21 @@ class PDFChatApp:
             if st.button("▶️ Compilar para PDF", type="primary", use_container_width=True):
                 st.session_state.code_to_compile = st.session_state.get('latex_code_input', '')
                 if st.session_state.code_to_compile.strip() and nome_arquivo_saida.strip():
-                    with st.spinner(f"Compilando '{nome_arquivo_saida}.tex'..."):
-                        sucesso, resultado = self.latex_tools.compile_latex_to_pdf(st.session_state.code_to_compile, nome_arquivo_saida)
-                        st.session_state.compilation_success = sucesso
-                        st.session_state.compilation_result = resultado
-                        if sucesso:
-                            st.session_state.compiled_pdf_path = resultado
-                            st.session_state.compiled_pdf_images = extract_pages_as_images_from_path(resultado)
-                        else:
-                            st.session_state.compiled_pdf_images = None
+                    try:
+                        st.session_state.compile_job_id = self.latex_tools.submit_compilation(
+                            st.session_state.code_to_compile, nome_arquivo_saida
+                        )
+                    except CompileQueueFullError as e:
+                        st.warning(str(e))
                 else:
                     st.warning("Preencha o editor e o nome do arquivo.")
 
         with control_cols[2]:
             if st.button("🧹 Limpar Visualização", use_container_width=True):
-                st.session_state.compiled_pdf_images = None
+                st.session_state.compiled_pdf_document = None
                 st.session_state.compilation_success = None
                 st.session_state.compilation_result = None
+                st.session_state.compilation_diagnostics = None
                 st.rerun()
 
         st.markdown("---")
@@ -262,35 +336,142 @@ $$ \\int_a^b f(x) \\, dx = F(b) - F(a) $$
 
         with col2:
             st.subheader("Visualização do PDF Compilado")
+            compiling = self._poll_compilation()
+            if compiling:
+                self._render_compile_status(nome_arquivo_saida)
 
-            if st.session_state.get("compiled_pdf_images"):
+            if st.session_state.get("compiled_pdf_document"):
                 viewer_controls = st.columns([3,2])
                 with viewer_controls[0]:
                     zoom_level = st.slider("Nível de Zoom", 100, 1500, 1500, 50, key="latex_zoom_slider", label_visibility="collapsed")
                 with viewer_controls[1]:
-                    if st.session_state.get("compiled_pdf_path") and os.path.exists(st.session_state.compiled_pdf_path):
-                         with open(st.session_state.compiled_pdf_path, "rb") as pdf_file:
-                            st.download_button(
-                                label="⬇️ Baixar PDF",
-                                data=pdf_file,
-                                file_name=os.path.basename(st.session_state.compiled_pdf_path),
-                                mime="application/pdf",
-                                use_container_width=True
-                            )
-                    else:
-                        st.info("Compile o LaTeX para gerar o PDF para download.")
+                    # Os bytes em memória: o arquivo do build pode ser substituído por outra compilação
+                    st.download_button(
+                        label="⬇️ Baixar PDF",
+                        data=st.session_state.compiled_pdf_document.data,
+                        file_name=st.session_state.compiled_pdf_document.name,
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
+
+                diagnostics = st.session_state.compilation_diagnostics
+                if diagnostics is not None and diagnostics.records:
+                    st.caption(f"⚠️ {diagnostics.summary()}")
 
                 with st.container(height=615, border=True):
-                    for page_image in st.session_state.compiled_pdf_images:
+                    # Renderizadas na resolução do zoom; páginas inalteradas desde a última compilação vêm do cache
+                    compiled_pdf = st.session_state.compiled_pdf_document
+                    for page_image in compiled_pdf.render_pages(0, compiled_pdf.page_count, zoom_level, placeholder=True):
                         st.image(page_image, width=zoom_level)
+                    if compiled_pdf.pending(0, compiled_pdf.page_count, zoom_level):
+                        self._render_pages_status(compiled_pdf, 0, compiled_pdf.page_count, zoom_level)
 
             elif st.session_state.get('compilation_success') is False:
                 st.error("❌ Falha na compilação.")
-                st.code(st.session_state.get('compilation_result', 'Nenhum log de erro disponível.'), language="log")
+                diagnostics = st.session_state.compilation_diagnostics
+                if diagnostics is not None and diagnostics.errors:
+                    st.code("\n".join(f"{record.location()}: {record.message}" for record in diagnostics.errors), language="log")
+                else:
+                    st.code(st.session_state.get('compilation_result', 'Nenhum log de erro disponível.'), language="log")
 
-            else:
+            elif not compiling:
                 st.info("O PDF compilado aparecerá aqui.")
 
+            self._render_compiler_messages(st.session_state.compilation_diagnostics)
+
+    @st.fragment(run_every=LATEX_COMPILE_POLL_SECONDS)
+    def _render_compile_status(self, nome_arquivo_saida: str):
+        """
+        Aviso de compilação em andamento. Só este fragmento é reexecutado a cada
+        LATEX_COMPILE_POLL_SECONDS; quando o trabalho termina, a página é redesenhada com o resultado.
+        """
+        if self._poll_compilation():
+            st.info(f"⏳ Compilando '{nome_arquivo_saida}.tex'...")
+        else:
+            st.rerun()
+
+    @st.fragment(run_every=PDF_VIEWER_POLL_SECONDS)
+    def _render_pages_status(self, document: LazyPDFDocument, start: int, end: int, width_px: int):
+        """
+        Aviso das páginas exibidas em baixa resolução. Só este fragmento é reexecutado a cada
+        PDF_VIEWER_POLL_SECONDS; quando a renderização termina, a página é redesenhada com as imagens definitivas.
+        """
+        if document.pending(start, end, width_px):
+            st.caption("⏳ Renderizando as páginas em alta resolução...")
+        else:
+            st.rerun()
+
+    def _render_compiler_messages(self, diagnostics):
+        """Mostra, recolhidos, os avisos da última compilação e o final do log do compilador."""
+        if diagnostics is None or not (diagnostics.records or diagnostics.tail):
+            return
+        with st.expander(f"Mensagens do compilador ({diagnostics.summary()})"):
+            if diagnostics.records:
+                st.code(diagnostics.to_text(), language="log")
+            st.caption("Final do log")
+            st.code("\n".join(diagnostics.tail), language="log")
+
+    def _poll_compilation(self) -> bool:
+        """Atualiza a sessão com o resultado da compilação em andamento; retorna True enquanto ela não terminar."""
+        job_id = st.session_state.compile_job_id
+        if not job_id:
+            return False
+        try:
+            job = self.latex_tools.poll_compilation(job_id)
+        except KeyError: # trabalho de um processo anterior do servidor
+            st.session_state.compile_job_id = None
+            return False
+        if job.state != "concluído":
+            return True
+
+        st.session_state.compile_job_id = None
+        result = job.result
+        st.session_state.compilation_success = result.success
+        st.session_state.compilation_result = result.pdf_path if result.success else result.log
+        st.session_state.compilation_diagnostics = result.diagnostics
+        if result.success:
+            st.session_state.compiled_pdf_path = result.pdf_path
+            # Mantém todas as páginas em memória e herda as imagens das páginas que não mudaram
+            st.session_state.compiled_pdf_document = LazyPDFDocument(
+                os.path.basename(result.pdf_path), result.pdf_data, cache_pages=None,
+                track_page_changes=True, previous=st.session_state.compiled_pdf_document
+            )
+        else:
+            st.session_state.compiled_pdf_document = None
+        return False
+
+    def _stream_interactive_page(self, latex_input: str) -> str:
+        """Exibe a página interativa enquanto as seções chegam e informa os tempos de geração."""
+        st.subheader("Prévia da Página Interativa")
+        progress = st.progress(0.0, text="Montando o esqueleto da página...")
+        preview = st.empty()
+        html_output = ""
+        first_content = first_section = None
+        try:
+            for update in self.web_generator.stream_interactive_page(latex_input):
+                html_output = update.html
+                if first_content is None:
+                    first_content = update.elapsed
+                if update.completed and first_section is None:
+                    first_section = update.elapsed
+                with preview.container():
+                    st.components.v1.html(html_output, height=600, scrolling=True)
+                progress.progress(
+                    update.completed / max(update.total, 1),
+                    text=f"{update.completed}/{update.total} seções prontas ({update.elapsed:.1f}s)"
+                )
+        except Exception as e:
+            logger.error(f"Erro ao gerar página web interativa por seção: {e}", exc_info=True)
+            st.error(f"Ocorreu um erro ao gerar a página interativa: {e}")
+            return ""
+        progress.empty()
+        if first_section is not None:
+            st.caption(
+                f"Conversão local exibida em {first_content:.2f}s; primeira seção interativa em {first_section:.2f}s; "
+                f"página completa em {update.elapsed:.2f}s."
+            )
+        return html_output
+
     def _render_latex_to_html_tab(self):
         """Renderiza a aba para converter LaTeX em uma página web interativa."""
         st.header("📄 Gerador de Página Interativa a partir de LaTeX")
@@ -308,15 +489,35 @@ Como as componentes não comutam, o vetor $\\vec{L}$ precessa em torno do eixo z
         
         latex_input = st.text_area("Insira seu código LaTeX aqui:", value=default_latex, height=400)
         
+        mode = st.radio(
+            "Modo de geração",
+            ["Local (instantâneo)", "Por seção com LLM", "Chamada única ao LLM"],
+            horizontal=True,
+            help="Local converte o LaTeX em HTML sem o modelo. Por seção mostra a conversão local de imediato e a substitui, seção a seção, pela versão interativa do modelo."
+        )
+        with_insights = mode == "Local (instantâneo)" and st.checkbox(
+            "Adicionar visualização interativa na barra lateral (usa o LLM)", value=True
+        )
+
         if st.button("Gerar Página Interativa", type="primary"):
             if latex_input.strip():
-                with st.spinner("Gerando página HTML..."):
-                    html_output = self.web_generator.generate_interactive_page(latex_input)
-                        
+                if mode == "Por seção com LLM":
+                    html_output = self._stream_interactive_page(latex_input)
+                else:
+                    start = time.perf_counter()
+                    if mode == "Local (instantâneo)":
+                        with st.spinner("Gerando visualização interativa..." if with_insights else "Convertendo LaTeX..."):
+                            html_output = self.web_generator.render_local_page(latex_input, with_insights)
+                    else:
+                        with st.spinner("Gerando página HTML..."):
+                            html_output = self.web_generator.generate_interactive_page(latex_input)
+                    if html_output:
+                        st.subheader("Prévia da Página Interativa")
+                        st.components.v1.html(html_output, height=600, scrolling=True)
+                        st.caption(f"Página gerada em {time.perf_counter() - start:.2f}s.")
+
                 if html_output:
                     st.success("Página HTML gerada com sucesso!")
-                    st.subheader("Prévia da Página Interativa")
-                    st.components.v1.html(html_output, height=600, scrolling=True)
 
                     href = get_base64_download_link(html_output, "pagina_interativa.html", "Baixar Arquivo HTML")
                     st.markdown(href, unsafe_allow_html=True)
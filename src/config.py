@@ -16,6 +16,108 @@ GEMINI_MODEL_NAME = "gemini-1.5-flash" # Atualizado para um modelo mais recente/
 EMBEDDING_MODEL = "nomic-embed-text"
 CHUNK_SIZE = 1500
 CHUNK_OVERLAP = 100
+VECTOR_STORE_IDLE_SECONDS = 600 # Coleções sem sessões ativas por este tempo são fechadas
+VECTOR_CATALOG_PATH = os.path.join("data", "vector_catalog.sqlite3") # Inquilinos donos de cada coleção
+
+# Coleta de lixo de PERSIST_DIRECTORY (coleções, segmentos órfãos e índices lexicais)
+VECTOR_ACCESS_LOG_PATH = os.path.join("data", "vector_access.sqlite3") # Último acesso de cada coleção
+VECTOR_STORE_LOCK_PATH = os.path.join("data", "vector_store.lock") # Impede a coleta pela linha de comando com a aplicação aberta
+VECTOR_GC_MAX_AGE_DAYS = 30 # Coleções sem acesso há mais tempo são removidas (None desativa)
+VECTOR_GC_MAX_BYTES = 2 * 1024 ** 3 # Orçamento de disco do banco vetorial e dos índices lexicais (None desativa)
+VECTOR_GC_INTERVAL_SECONDS = 6 * 3600 # Intervalo da coleta em segundo plano na aplicação (None desativa)
+
+# Recuperação: "multi" (MultiQueryRetriever sequencial), "direct" (sem reescrita),
+# "parallel-multi" (reescrita e busca direta simultâneas, variantes concorrentes e fusão RRF),
+# "adaptive" (reescreve apenas quando a busca direta tem pontuação baixa)
+# ou "hybrid" (BM25 + vetorial, com caminho rápido apenas lexical)
+RAG_RETRIEVAL_MODE = "multi"
+RAG_RETRIEVAL_TOP_K = 4
+RAG_ADAPTIVE_MIN_SCORE = 0.5 # Pontuação de relevância mínima do melhor resultado direto no modo adaptativo
+RAG_RRF_K = 60 # Constante da fusão de posto recíproco
+RAG_RETRIEVAL_MAX_WORKERS = 8
+
+# Índice lexical (BM25) construído na ingestão, ao lado de PERSIST_DIRECTORY
+LEXICAL_INDEX_DIRECTORY = os.path.join("data", "lexical")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RAG_HYBRID_LEXICAL_WEIGHT = 0.4 # Peso do BM25 na fusão híbrida (o restante vai para a similaridade vetorial)
+# Caminho rápido apenas lexical (sem embedding): o melhor resultado precisa cobrir os termos
+# discriminativos da consulta e se destacar do segundo colocado
+RAG_LEXICAL_FAST_PATH_COVERAGE = 0.8 # Fração mínima do IDF da consulta presente no melhor resultado
+RAG_LEXICAL_FAST_PATH_MARGIN = 0.5 # Vantagem mínima do BM25 do melhor sobre o segundo (1 - segundo/melhor)
+
+# Cache de embeddings (SQLite, vetores float32, despejo LRU)
+EMBEDDING_CACHE_PATH = os.path.join("data", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000
+
+# Pipeline de embeddings da ingestão
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_MAX_CONCURRENCY = 4 # Requisições simultâneas ao servidor de embeddings
+EMBEDDING_MAX_PENDING_BATCHES = 8 # Lotes em voo antes de aplicar contrapressão
+INGESTION_PAGE_WINDOW = 16 # Páginas lidas e divididas por vez durante a ingestão
+PDF_EXTRACTION_WORKERS = min(4, os.cpu_count() or 1) # Processos de extração de texto (1 = serial)
+
+# Cadeias RAG compiladas mantidas em memória (compartilhadas entre sessões)
+RAG_CHAIN_CACHE_MAX_ENTRIES = 32
+
+# Cache semântico de respostas
+RAG_ANSWER_CACHE_SIMILARITY = 0.95 # Similaridade de cosseno mínima para reaproveitar uma resposta
+RAG_ANSWER_CACHE_TTL_SECONDS = 3600
+RAG_ANSWER_CACHE_MAX_ENTRIES = 512
+
+# Visualizador de PDF (renderização sob demanda)
+PDF_VIEWER_PAGES_PER_VIEW = 3 # Páginas renderizadas por vez no visualizador
+PDF_VIEWER_CACHE_PAGES = 12 # Páginas renderizadas mantidas em memória por documento
+PDF_VIEWER_PIXEL_RATIO = 1.5 # Fator sobre a largura exibida para telas de alta densidade
+PDF_VIEWER_MIN_DPI = 48
+PDF_VIEWER_MAX_DPI = 300
+PDF_VIEWER_DPI_STEP = 24
+PDF_VIEWER_PLACEHOLDER_DPI = 48 # Resolução exibida enquanto a página é renderizada em segundo plano
+PDF_VIEWER_POLL_SECONDS = 0.5 # Intervalo de verificação das páginas em renderização
+
+# Cache em disco de páginas renderizadas (compartilhado entre sessões)
+RENDER_CACHE_DIRECTORY = os.path.join("data", "render_cache")
+RENDER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RENDER_CACHE_FORMAT = "WEBP" # "WEBP" ou "PNG"
+RENDER_CACHE_QUALITY = 90
+RENDER_CACHE_WORKERS = 2
+
+# Conversão de PDF para LaTeX
+LATEX_PAGES_PER_BLOCK = 30 # PDFs maiores são divididos em blocos deste tamanho
+LATEX_CONVERSION_MAX_WORKERS = 4 # Blocos convertidos simultaneamente
+LATEX_CONVERSION_MAX_RETRIES = 3 # Novas tentativas por bloco em caso de falha
+LATEX_CONVERSION_RETRY_BASE_DELAY = 2.0 # Segundos; dobra a cada nova tentativa
+LATEX_MERGE_MODE = "hierarchical" # "hierarchical": união local + LLM só nas fronteiras; "llm": um único prompt de concatenação
+LATEX_MERGE_BOUNDARY_LINES = 12 # Linhas de cada lado da fronteira entre blocos enviadas ao LLM
+CONVERSION_CHECKPOINT_PATH = os.path.join("data", "conversion_checkpoints.sqlite3")
+CONVERSION_CHECKPOINT_MAX_ENTRIES = 20_000 # Blocos e resultados finais guardados (LRU)
+
+# Compilação LaTeX
+LATEX_COMPILER = "pdflatex"
+LATEX_BUILD_DIRECTORY = os.path.join("data", "latex_builds") # Um subdiretório persistente por documento (hash do preâmbulo/nome)
+LATEX_BUILD_MAX_AGE_SECONDS = 7 * 86400 # Builds sem compilação há mais tempo são removidos
+LATEX_BUILD_MAX_BYTES = 1024 ** 3 # Acima disso, os builds menos usados recentemente são removidos
+LATEX_BUILD_PRUNE_INTERVAL_SECONDS = 600 # Intervalo mínimo entre duas podas dos builds
+LATEX_MAX_PASSES = 3 # Passadas extras só enquanto .aux/.toc mudarem
+LATEX_PRECOMPILE_PREAMBLE = True # Reaproveita o preâmbulo pré-compilado (mylatexformat) enquanto não mudar
+LATEX_COMPILE_WORKERS = 2 # Compilações simultâneas
+LATEX_COMPILE_MAX_QUEUE = 16 # Trabalhos pendentes ou em andamento antes de recusar novos
+LATEX_COMPILE_JOB_TTL_SECONDS = 600 # Resultados não consultados (aba fechada) são descartados após este tempo
+LATEX_COMPILE_POLL_SECONDS = 0.5 # Intervalo de verificação do andamento da compilação na interface
+LATEX_COMPILE_TIMEOUT_SECONDS = 30 # Por execução do compilador
+LATEX_COMPILE_MEMORY_LIMIT_MB = 1024 # Memória virtual do compilador (apenas POSIX; None desativa)
+LATEX_LOG_MAX_RECORDS = 200 # Mensagens estruturadas guardadas por compilação (erros têm prioridade)
+LATEX_LOG_TAIL_LINES = 40 # Linhas finais do .log mantidas como texto bruto
+
+# Cache de respostas do LLM (melhoria de LaTeX, concatenação e páginas interativas)
+LLM_RESPONSE_CACHE_PATH = os.path.join("data", "llm_cache.sqlite3")
+LLM_RESPONSE_CACHE_MAX_ENTRIES = 2_000
+LLM_GATEWAY_MAX_CLIENTS = 32 # Chaves da API com cliente Gemini mantido em memória (LRU)
+
+# Página interativa gerada por seção
+WEB_SECTION_MAX_WORKERS = 4 # Seções pedidas ao LLM simultaneamente
+WEB_SECTION_SEPARATOR = "% --- Seção ---" # Separa o preâmbulo da seção enviada ao LLM
+WEB_SIDEBAR_MAX_INPUT_CHARS = 30_000 # Trecho do LaTeX enviado para gerar a visualização da barra lateral
 
 # Templates de Prompt
 RAG_QUERY_PROMPT_TEMPLATE = """
@@ -63,6 +165,26 @@ LATEX_CONCATENATE_PROMPT = """
 2. Retorne apenas o código LaTeX, sem explicações adicionais e sem textos fora do formato LaTeX.
 3. Retire TODOS os "newpage" do LaTeX, pois o manuscrito não possui páginas."""
 
+LATEX_BOUNDARY_PROMPT = """
+Você receberá dois trechos de LaTeX separados pela linha "%%% FRONTEIRA %%%": o final de um bloco e o início do bloco seguinte de um mesmo manuscrito, transcritos separadamente.
+1. Una os dois trechos em um único trecho contínuo, completando frases, parágrafos e ambientes (equações, listas) interrompidos na fronteira.
+2. Remova repetições causadas pela divisão e NÃO altere o restante do conteúdo.
+3. Retorne apenas o trecho LaTeX unido, sem preâmbulo, sem \\begin{document}, sem explicações e sem blocos de código markdown."""
+
+WEB_SECTION_PROMPT = """
+Você é um especialista em desenvolvimento web com profundo conhecimento em física e matemática. Você receberá UMA seção de um texto acadêmico em LaTeX; o título da seção, o índice e o template da página (Tailwind CSS, tema escuro, KaTeX, Three.js, Chart.js e D3.js já carregados via CDN) já existem.
+1. Converta o conteúdo da seção em HTML: `\\subsection{...}` em `<h3>...</h3>`, parágrafos em `<p>...</p>`, `$...$` em `\\(...\\)` e `$$...$$` em `\\[...\\]`. NÃO repita o título da seção.
+2. Se a seção tratar de um conceito de física ou matemática que se beneficie de visualização (momento angular, oscilações, ondas, estatística etc.), acrescente ao final um bloco `<div class="insight">` com uma visualização interativa em HTML/JavaScript, usando apenas as bibliotecas já carregadas e identificadores únicos para esta seção.
+3. Se a entrada tiver uma linha `% --- Seção ---`, o que vem antes dela é o preâmbulo do documento, apenas para referência das macros definidas nele (`\\newcommand` etc.): converta somente o que vem depois dessa linha.
+4. Retorne apenas o fragmento HTML, sem `<html>`, `<head>`, `<body>`, sem explicações e sem blocos de código markdown."""
+
+WEB_SIDEBAR_PROMPT = """
+Você é um especialista em desenvolvimento web com profundo conhecimento em física e matemática. Você receberá um texto acadêmico em LaTeX que já foi convertido em página HTML (Tailwind CSS, tema escuro, KaTeX, Three.js, Chart.js e D3.js já carregados via CDN).
+1. Identifique o principal conceito de física ou matemática do texto (momento angular, oscilações, ondas, estatística etc.).
+2. Gere UMA visualização interativa sobre esse conceito para a barra lateral da página: um título curto em `<h3>`, o elemento da visualização e os controles (sliders) necessários, com o JavaScript em `<script>`. Por exemplo, para momento angular quântico, a precessão 3D do vetor com Three.js e sliders para l e m.
+3. Use apenas as bibliotecas já carregadas e dimensione a visualização para uma coluna estreita (largura de 100%).
+4. Retorne apenas o fragmento HTML, sem `<html>`, `<head>`, `<body>`, sem explicações e sem blocos de código markdown."""
+
 LATEX_INSIGHTS_PROMPT = """ # Papel e Objetivo
 
 Você é um especialista em desenvolvimento web full-stack com um profundo conhecimento em física e matemática. Sua tarefa é atuar como um "enriquecedor de conteúdo", transformando um texto acadêmico em formato LaTeX em uma página web interativa, moderna e educacional. O objetivo é pegar um conteúdo estático e dar vida a ele com visualizações e interatividade.
@@ -0,0 +1,77 @@
+# Checkpoints persistentes da conversão PDF -> LaTeX
+import hashlib
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import (
+    logger,
+    CONVERSION_CHECKPOINT_PATH,
+    CONVERSION_CHECKPOINT_MAX_ENTRIES,
+    LATEX_CONVERSION_PROMPT,
+    LATEX_CONCATENATE_PROMPT,
+    LATEX_BOUNDARY_PROMPT,
+    LATEX_MERGE_MODE
+)
+from disk_cache import SQLiteLRUCache
+
+# Intervalo de páginas de um bloco: (primeira, última), numeradas a partir de 1
+PageRange = Tuple[int, int]
+
+def _prompt_version(*prompts: str) -> str:
+    """Versão dos prompts derivada do seu texto: alterar um prompt invalida os checkpoints antigos."""
+    return hashlib.sha256("\0".join(prompts).encode("utf-8")).hexdigest()[:12]
+
+_cache_lock = threading.Lock()
+_shared_store: Optional[SQLiteLRUCache] = None
+
+def get_checkpoint_store() -> SQLiteLRUCache:
+    """Retorna o armazenamento de checkpoints compartilhado pelo processo (criado sob demanda)."""
+    global _shared_store
+    with _cache_lock:
+        if _shared_store is None:
+            _shared_store = SQLiteLRUCache(
+                CONVERSION_CHECKPOINT_PATH, CONVERSION_CHECKPOINT_MAX_ENTRIES, table="conversion_checkpoints"
+            )
+        return _shared_store
+
+class ConversionJob:
+    """
+    Conversão de um PDF identificada pelo hash do conteúdo, pelo modelo e pela versão dos prompts.
+    O LaTeX de cada bloco é gravado assim que fica pronto, de modo que uma nova execução (após
+    falha ou reinício do processo) refaz apenas os blocos ausentes; o resultado final também é
+    gravado, e converter o mesmo PDF de novo o devolve sem nenhuma chamada ao modelo.
+    """
+
+    def __init__(self, pdf_hash: str, model_name: str, pages_per_block: int, store: Optional[SQLiteLRUCache] = None):
+        self.pdf_hash = pdf_hash
+        self.model_name = model_name
+        self.pages_per_block = pages_per_block
+        self.store = store if store is not None else get_checkpoint_store()
+        self._block_version = _prompt_version(LATEX_CONVERSION_PROMPT)
+        self._result_version = _prompt_version(LATEX_CONVERSION_PROMPT, LATEX_MERGE_MODE, LATEX_CONCATENATE_PROMPT, LATEX_BOUNDARY_PROMPT)
+
+    def _block_key(self, page_range: PageRange) -> str:
+        first, last = page_range
+        return f"block:{self.model_name}:{self._block_version}:{self.pdf_hash}:{first}-{last}"
+
+    def _result_key(self) -> str:
+        return f"result:{self.model_name}:{self._result_version}:{self.pdf_hash}:{self.pages_per_block}"
+
+    def completed_blocks(self, page_ranges: Iterable[PageRange]) -> Dict[PageRange, str]:
+        """Retorna o LaTeX já gravado dos blocos pedidos que foram concluídos em execuções anteriores."""
+        keys = {self._block_key(page_range): page_range for page_range in page_ranges}
+        found = self.store.get_many(keys)
+        if found:
+            logger.info(f"Conversão {self.pdf_hash[:12]}: {len(found)}/{len(keys)} blocos retomados do checkpoint.")
+        return {keys[key]: value.decode("utf-8") for key, value in found.items()}
+
+    def save_block(self, page_range: PageRange, latex: str) -> None:
+        self.store.set(self._block_key(page_range), latex.encode("utf-8"))
+
+    def result(self) -> Optional[str]:
+        """Retorna o LaTeX final de uma conversão já concluída, se houver."""
+        value = self.store.get(self._result_key())
+        return value.decode("utf-8") if value is not None else None
+
+    def save_result(self, latex: str) -> None:
+        self.store.set(self._result_key(), latex.encode("utf-8"))
@@ -0,0 +1,137 @@
+# Cache persistente em disco (SQLite) com despejo LRU
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import logger
+
+# Limite conservador de parâmetros por instrução SQLite
+_SQLITE_BATCH = 500
+
+class SQLiteLRUCache:
+    """
+    Armazenamento chave-valor (BLOB) persistido em SQLite, com limite de entradas,
+    despejo LRU e contadores de acertos/falhas. Seguro para uso entre threads.
+    """
+
+    def __init__(self, path: str, max_entries: int, table: str = "cache"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table}(last_access)")
+        # Contagem de entradas mantida a cada escrita, para o despejo não contar a tabela inteira
+        self._count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Retorna o valor armazenado para a chave, ou None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Busca várias chaves de uma vez e atualiza o instante de último acesso das encontradas."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value: bytes) -> None:
+        """Armazena um valor."""
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        """Armazena vários valores e aplica o despejo LRU se o limite for excedido."""
+        if not items:
+            return
+        now = time.time()
+        keys = list(items)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            existing = 0
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                existing += self._conn.execute(
+                    f"SELECT COUNT(*) FROM {self.table} WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchone()[0]
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, last_access) VALUES (?, ?, ?)",
+                [(key, sqlite3.Binary(value), now) for key, value in items.items()]
+            )
+            self._conn.execute("COMMIT")
+            self._count += len(keys) - existing
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove as entradas menos usadas recentemente além de max_entries. Requer o lock."""
+        excess = self._count - self.max_entries
+        if excess > 0:
+            deleted = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            ).rowcount
+            self._count -= deleted
+            logger.info(f"Cache {self.table}: {deleted} entradas despejadas (LRU).")
+
+    def items_by_access(self) -> List[Tuple[str, float]]:
+        """Retorna (chave, instante do último acesso) de todas as entradas, das mais antigas às mais recentes."""
+        with self._lock:
+            return self._conn.execute(f"SELECT key, last_access FROM {self.table} ORDER BY last_access ASC").fetchall()
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """Remove as chaves informadas."""
+        keys = list(keys)
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                self._count -= self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).rowcount
+
+    def clear(self) -> None:
+        """Remove todas as entradas e zera os contadores."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._count = 0
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        """Retorna contadores de uso do cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
@@ -0,0 +1,75 @@
+# Cache persistente de embeddings na frente do OllamaEmbeddings
+import hashlib
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from config import logger, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+from disk_cache import SQLiteLRUCache
+
+_cache_lock = threading.Lock()
+_shared_cache: Optional[SQLiteLRUCache] = None
+
+def get_embedding_cache() -> SQLiteLRUCache:
+    """Retorna o cache de embeddings compartilhado pelo processo (criado sob demanda)."""
+    global _shared_cache
+    with _cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SQLiteLRUCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, table="embeddings")
+            logger.info(f"Cache de embeddings aberto em {EMBEDDING_CACHE_PATH}.")
+        return _shared_cache
+
+def _encode(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+def _decode(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envolve um modelo de embeddings com um cache em disco chaveado por (modelo, tipo, hash do texto).
+    Os vetores são armazenados como float32 compactos; documentos e consultas usam chaves
+    distintas porque o OllamaEmbeddings aplica instruções diferentes a cada um.
+    """
+
+    def __init__(self, embedder: Embeddings, model_name: str, cache: Optional[SQLiteLRUCache] = None):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    def _key(self, kind: str, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{text_hash}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeda documentos, consultando o modelo apenas para os textos ausentes do cache."""
+        keys = [self._key("doc", text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        vectors: Dict[str, List[float]] = {key: _decode(blob) for key, blob in cached.items()}
+        if missing:
+            new_vectors = self.embedder.embed_documents(list(missing.values()))
+            encoded = {key: _encode(vector) for key, vector in zip(missing.keys(), new_vectors)}
+            self.cache.set_many(encoded)
+            # Devolve os vetores já arredondados para float32, como virão do cache nas próximas vezes
+            vectors.update({key: _decode(blob) for key, blob in encoded.items()})
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeda uma consulta, reutilizando o vetor em cache quando disponível."""
+        key = self._key("query", text)
+        blob = self.cache.get(key)
+        if blob is not None:
+            return _decode(blob)
+        blob = _encode(self.embedder.embed_query(text))
+        self.cache.set(key, blob)
+        return _decode(blob)
@@ -0,0 +1,94 @@
+# Estágios do pipeline de ingestão de PDFs (extração, lotes e embeddings concorrentes)
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from config import logger
+from pdf_extraction import iter_page_ranges
+
+T = TypeVar("T")
+
+# Um item do pipeline: (id do chunk, documento)
+Chunk = Tuple[str, Document]
+
+def iter_batches(items: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """Agrupa um iterável (possivelmente preguiçoso) em listas de até batch_size itens."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+def extraction_executor(workers: int):
+    """
+    Pool de processos para a extração de texto, ou um contexto nulo (extração serial) se workers <= 1.
+    Usa 'spawn' porque o Streamlit roda o script em threads, e fork de processos multithread é inseguro.
+    """
+    if workers <= 1:
+        return nullcontext(None)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def iter_pdf_page_windows(
+    pdf_paths: Sequence[str],
+    window_pages: int,
+    executor: Optional[ProcessPoolExecutor] = None,
+    max_pending: int = 8,
+) -> Iterator[Tuple[int, List[Document]]]:
+    """
+    Entrega (índice do arquivo, páginas) em janelas de até window_pages páginas, na ordem dos
+    arquivos e das páginas. O texto e os metadados 'source' e 'page' são os do PyPDFLoader, com
+    ou sem executor.
+    """
+    for file_index, pages, _ in iter_page_ranges(pdf_paths, window_pages, executor, max_pending):
+        yield file_index, [
+            Document(page_content=text, metadata={"source": pdf_paths[file_index], "page": number})
+            for number, text in pages
+        ]
+
+def _embed_batch(embeddings: Embeddings, batch: List[Chunk]) -> List[List[float]]:
+    return embeddings.embed_documents([doc.page_content for _, doc in batch])
+
+def embed_batches(
+    embeddings: Embeddings,
+    batches: Iterable[List[Chunk]],
+    max_workers: int,
+    max_pending: int,
+) -> Iterator[Tuple[List[Chunk], List[List[float]]]]:
+    """
+    Embeda lotes de chunks com até max_workers requisições simultâneas ao servidor de embeddings.
+
+    Os lotes são consumidos sob demanda: no máximo max_pending lotes ficam em voo, o que aplica
+    contrapressão ao produtor. Os resultados são entregues na ordem de conclusão, na thread
+    chamadora, para que a escrita no banco vetorial ocorra de forma serial.
+    """
+    max_pending = max(max_pending, max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed") as executor:
+        pending = {}
+        try:
+            for batch in batches:
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+                pending[executor.submit(_embed_batch, embeddings, batch)] = batch
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+def upsert_embedded(vector_db, batch: List[Chunk], vectors: List[List[float]]) -> None:
+    """Grava um lote já embedado na coleção Chroma, sem novas chamadas ao embedder."""
+    vector_db._collection.upsert(
+        ids=[chunk_id for chunk_id, _ in batch],
+        embeddings=vectors,
+        documents=[doc.page_content for _, doc in batch],
+        metadatas=[doc.metadata for _, doc in batch],
+    )
+    logger.debug(f"{len(batch)} chunks gravados na coleção {vector_db._collection.name}.")
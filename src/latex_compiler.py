@@ -0,0 +1,480 @@
+# Serviço de compilação LaTeX incremental, com diretório de build persistente por documento
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from config import (
+    logger,
+    LATEX_COMPILER,
+    LATEX_BUILD_DIRECTORY,
+    LATEX_MAX_PASSES,
+    LATEX_PRECOMPILE_PREAMBLE,
+    LATEX_COMPILE_WORKERS,
+    LATEX_COMPILE_TIMEOUT_SECONDS,
+    LATEX_COMPILE_MEMORY_LIMIT_MB,
+    LATEX_COMPILE_MAX_QUEUE,
+    LATEX_COMPILE_JOB_TTL_SECONDS,
+    LATEX_BUILD_MAX_AGE_SECONDS,
+    LATEX_BUILD_MAX_BYTES,
+    LATEX_BUILD_PRUNE_INTERVAL_SECONDS
+)
+from latex_log import ParsedLog, parse_log_file
+
+# Arquivos auxiliares cuja mudança exige uma nova passada do compilador
+_AUX_EXTENSIONS = (".aux", ".toc", ".lof", ".lot", ".out", ".nav", ".snm")
+_STATE_FILE = ".build_state.json"
+# Diretórios de trabalho das compilações em andamento, em build_root mas fora dos namespaces: a
+# cópia do build leva o arquivo de estado junto, e prune_builds não pode tomá-la por um build
+_WORK_DIRECTORY = ".work"
+_BEGIN_DOCUMENT = "\\begin{document}"
+
+# Um lock por diretório de build: compilações do mesmo documento no processo são serializadas
+_dir_locks: Dict[str, threading.Lock] = {}
+_dir_locks_lock = threading.Lock()
+# Diretórios de trabalho das compilações em andamento neste processo (nunca podados)
+_active_work_dirs: Set[str] = set()
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                pass
+    return total
+
+def document_namespace(source: str) -> str:
+    """
+    Namespace do build de um documento: o hash do preâmbulo. Quem compila um documento com o mesmo
+    preâmbulo (em qualquer sessão) reaproveita o formato pré-compilado e os auxiliares do build.
+    """
+    preamble = source[:source.index(_BEGIN_DOCUMENT)] if _BEGIN_DOCUMENT in source else ""
+    return _hash_text(preamble)[:16]
+
+def safe_document_name(name: str) -> str:
+    """Nome de documento utilizável como nome de arquivo e de diretório."""
+    return re.sub(r"[^\w\-]", "_", name.strip()) or "documento"
+
+@dataclass
+class CompileResult:
+    success: bool
+    pdf_path: Optional[str]
+    log: str # resumo das mensagens do compilador ou mensagem de erro
+    passes: int # execuções do compilador nesta chamada (0 = PDF anterior reaproveitado)
+    elapsed: float
+    diagnostics: Optional[ParsedLog] = None # erros, avisos e final do .log da última execução
+    pdf_data: Optional[bytes] = None # conteúdo do PDF, lido antes que outra compilação do build o substitua
+
+class CompileTimeoutError(Exception):
+    """O compilador excedeu o tempo limite e foi encerrado."""
+
+class CompileQueueFullError(Exception):
+    """A fila de compilação atingiu o limite de trabalhos pendentes."""
+
+class LatexCompiler:
+    """
+    Compila documentos em data/latex_builds/<hash do preâmbulo>/<nome>, mantendo .aux, .toc e o
+    PDF entre compilações (de qualquer sessão). Não recompila se o código não mudou; faz passadas
+    adicionais apenas enquanto os arquivos auxiliares mudarem (até max_passes) e, opcionalmente,
+    pré-compila o preâmbulo em um formato (pacote mylatexformat) reaproveitado enquanto o
+    preâmbulo não mudar.
+    Cada compilação roda em um diretório temporário com uma cópia do build; o build só é
+    atualizado se ela terminar com sucesso, e compilações simultâneas do mesmo build rodam em
+    paralelo (a última a terminar prevalece). O compilador tem limite de tempo e de memória.
+    prune_builds() remove os builds antigos ou além do orçamento de disco.
+    """
+
+    def __init__(
+        self,
+        build_root: str = LATEX_BUILD_DIRECTORY,
+        compiler: str = LATEX_COMPILER,
+        max_passes: int = LATEX_MAX_PASSES,
+        precompile_preamble: bool = LATEX_PRECOMPILE_PREAMBLE,
+        timeout_seconds: float = LATEX_COMPILE_TIMEOUT_SECONDS,
+        memory_limit_mb: Optional[int] = LATEX_COMPILE_MEMORY_LIMIT_MB
+    ):
+        self.build_root = build_root
+        self.compiler = compiler
+        self.max_passes = max_passes
+        self.precompile_preamble = precompile_preamble
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_mb = memory_limit_mb
+
+    def build_dir(self, name: str, namespace: str) -> str:
+        return os.path.join(self.build_root, namespace, safe_document_name(name))
+
+    def _dir_lock(self, build_dir: str) -> threading.Lock:
+        with _dir_locks_lock:
+            return _dir_locks.setdefault(os.path.abspath(build_dir), threading.Lock())
+
+    def _forget_dir_lock(self, build_dir: str) -> None:
+        with _dir_locks_lock:
+            _dir_locks.pop(os.path.abspath(build_dir), None)
+
+    def _run(self, args: List[str], cwd: str) -> subprocess.CompletedProcess:
+        if shutil.which(args[0]) is None:
+            raise FileNotFoundError(args[0])
+        if self.memory_limit_mb and os.name == "posix":
+            # Limite de memória virtual aplicado pelo shell antes de executar o compilador
+            args = ["/bin/sh", "-c", f'ulimit -v {self.memory_limit_mb * 1024} && exec "$0" "$@"', *args]
+        try:
+            # A saída padrão repete o .log, que é lido depois linha a linha; só stderr é capturado
+            return subprocess.run(
+                args, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, encoding="utf-8",
+                errors="replace", timeout=self.timeout_seconds
+            )
+        except subprocess.TimeoutExpired:
+            raise CompileTimeoutError(f"A compilação excedeu o limite de {self.timeout_seconds:.0f}s e foi interrompida.")
+
+    def _aux_snapshot(self, build_dir: str, name: str) -> Dict[str, str]:
+        snapshot = {}
+        for extension in _AUX_EXTENSIONS:
+            path = os.path.join(build_dir, name + extension)
+            if os.path.exists(path):
+                snapshot[extension] = _hash_file(path)
+        return snapshot
+
+    def _diagnostics(self, directory: str, name: str) -> Optional[ParsedLog]:
+        log_path = os.path.join(directory, f"{name}.log")
+        return parse_log_file(log_path) if os.path.exists(log_path) else None
+
+    def _load_state(self, build_dir: str) -> Dict[str, str]:
+        try:
+            with open(os.path.join(build_dir, _STATE_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, build_dir: str, state: Dict[str, str]) -> None:
+        with open(os.path.join(build_dir, _STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def _ensure_format(self, build_dir: str, name: str, source: str, state: Dict[str, str]) -> Optional[str]:
+        """
+        Retorna o nome do formato com o preâmbulo pré-compilado, gerando-o se o preâmbulo mudou.
+        Retorna None se o documento não tiver preâmbulo ou se o preâmbulo não puder ser dumpado,
+        inclusive por exceder o tempo limite (nesse caso a falha é lembrada até o preâmbulo mudar).
+        """
+        if _BEGIN_DOCUMENT not in source:
+            return None
+        preamble_hash = _hash_text(source[:source.index(_BEGIN_DOCUMENT)])
+        format_name = f"{name}_preambulo"
+        if state.get("format") == preamble_hash and os.path.exists(os.path.join(build_dir, format_name + ".fmt")):
+            return format_name
+        if state.get("format_failed") == preamble_hash:
+            return None
+
+        try:
+            result = self._run(
+                [self.compiler, "-ini", "-interaction=nonstopmode", f"-jobname={format_name}",
+                 f"&{self.compiler}", "mylatexformat.ltx", f"{name}.tex"],
+                build_dir
+            )
+        except CompileTimeoutError as e:
+            # O documento ainda pode compilar sem o formato dentro do limite de tempo
+            logger.warning(f"Geração do formato de '{name}' interrompida: {e}")
+            result = None
+        if result is not None and result.returncode == 0 and os.path.exists(os.path.join(build_dir, format_name + ".fmt")):
+            state["format"] = preamble_hash
+            state.pop("format_failed", None)
+            logger.info(f"Preâmbulo de '{name}' pré-compilado em {format_name}.fmt.")
+            return format_name
+        state["format_failed"] = preamble_hash
+        state.pop("format", None)
+        logger.warning(f"Não foi possível pré-compilar o preâmbulo de '{name}'; compilando sem formato.")
+        return None
+
+    def compile(self, source: str, name: str) -> CompileResult:
+        """Compila o código LaTeX do documento 'name', reaproveitando o build anterior sempre que possível."""
+        start = time.perf_counter()
+        name = safe_document_name(name)
+        build_dir = self.build_dir(name, document_namespace(source))
+        pdf_path = os.path.join(build_dir, f"{name}.pdf")
+        source_hash = _hash_text(source)
+        lock = self._dir_lock(build_dir)
+
+        # O lock do build cobre apenas a leitura e a atualização dele; as passadas do compilador
+        # rodam sem lock, no diretório de trabalho privado
+        with lock:
+            os.makedirs(build_dir, exist_ok=True)
+            state = self._load_state(build_dir)
+            if state.get("source") == source_hash and state.get("ok") and os.path.exists(pdf_path):
+                logger.info(f"'{name}' não mudou desde a última compilação; PDF reaproveitado.")
+                # Conta como uso recente para prune_builds
+                os.utime(os.path.join(build_dir, _STATE_FILE))
+                with open(pdf_path, "rb") as f:
+                    pdf_data = f.read()
+                return CompileResult(
+                    True, pdf_path, "Sem alterações desde a última compilação.", 0, time.perf_counter() - start,
+                    self._diagnostics(build_dir, name), pdf_data
+                )
+            work_root = os.path.join(self.build_root, _WORK_DIRECTORY)
+            os.makedirs(work_root, exist_ok=True)
+            work_dir = tempfile.mkdtemp(prefix=f"{name}_", dir=work_root)
+            with _dir_locks_lock:
+                _active_work_dirs.add(os.path.abspath(work_dir))
+            shutil.copytree(build_dir, work_dir, dirs_exist_ok=True)
+            # copytree copia a data de modificação do build; a do diretório de trabalho é a do início
+            os.utime(work_dir)
+
+        state.update({"source": source_hash, "ok": False})
+        passes = 0
+        try:
+            # O PDF anterior não pode sobreviver a uma execução que não gere páginas ("No pages of
+            # output") ou não consiga gravar o arquivo: sem ele, só um PDF novo conta como sucesso
+            work_pdf_path = os.path.join(work_dir, f"{name}.pdf")
+            if os.path.exists(work_pdf_path):
+                os.remove(work_pdf_path)
+            with open(os.path.join(work_dir, f"{name}.tex"), "w", encoding="utf-8") as f:
+                f.write(source)
+
+            format_name = self._ensure_format(work_dir, name, source, state) if self.precompile_preamble else None
+            command = [self.compiler, "-interaction=nonstopmode", "-file-line-error", f"-jobname={name}"]
+            if format_name:
+                command.append(f"-fmt={format_name}")
+            command.append(f"{name}.tex")
+
+            before = self._aux_snapshot(work_dir, name)
+            while passes < self.max_passes:
+                result = self._run(command, work_dir)
+                passes += 1
+                if result.returncode != 0:
+                    diagnostics = self._diagnostics(work_dir, name)
+                    message = diagnostics.to_text() if diagnostics and diagnostics.records else "\n".join(diagnostics.tail if diagnostics else [])
+                    if result.stderr:
+                        message += f"\n{result.stderr[-2000:]}"
+                    logger.error(
+                        f"Erro de compilação LaTeX em '{name}' (passo {passes}): "
+                        f"{diagnostics.summary() if diagnostics else 'sem .log'}"
+                    )
+                    return CompileResult(
+                        False, None, f"Erro na compilação:\n{message}", passes, time.perf_counter() - start, diagnostics
+                    )
+                after = self._aux_snapshot(work_dir, name)
+                if after == before:
+                    break
+                before = after
+
+            diagnostics = self._diagnostics(work_dir, name)
+            if not os.path.exists(work_pdf_path) or os.path.getsize(work_pdf_path) == 0:
+                logger.error(f"PDF de '{name}' não encontrado após a compilação ({diagnostics.summary() if diagnostics else 'sem .log'}).")
+                return CompileResult(
+                    False, None, "PDF não encontrado após a compilação. Verifique as mensagens do compilador.",
+                    passes, time.perf_counter() - start, diagnostics
+                )
+            with open(work_pdf_path, "rb") as f:
+                pdf_data = f.read()
+
+            # Sucesso: o resultado substitui o build persistente (recriado se tiver sido removido)
+            with lock:
+                os.makedirs(build_dir, exist_ok=True)
+                for entry in os.listdir(work_dir):
+                    os.replace(os.path.join(work_dir, entry), os.path.join(build_dir, entry))
+                state["ok"] = True
+                self._save_state(build_dir, state)
+        except FileNotFoundError:
+            return CompileResult(
+                False, None,
+                f"Erro Crítico: '{self.compiler}' não foi encontrado. Instale uma distribuição LaTeX (ex: TeX Live, MiKTeX).",
+                passes, time.perf_counter() - start
+            )
+        except CompileTimeoutError as e:
+            logger.error(f"Compilação de '{name}' interrompida: {e}")
+            return CompileResult(False, None, str(e), passes, time.perf_counter() - start)
+        finally:
+            if not state["ok"]:
+                with lock:
+                    os.makedirs(build_dir, exist_ok=True)
+                    self._save_state(build_dir, state)
+            shutil.rmtree(work_dir, ignore_errors=True)
+            with _dir_locks_lock:
+                _active_work_dirs.discard(os.path.abspath(work_dir))
+
+        elapsed = time.perf_counter() - start
+        summary = diagnostics.summary() if diagnostics else "sem .log"
+        logger.info(f"'{name}' compilado em {passes} passada(s), {elapsed:.2f}s ({summary}): {pdf_path}")
+        return CompileResult(True, pdf_path, summary, passes, elapsed, diagnostics, pdf_data)
+
+    def prune_builds(
+        self,
+        max_age_seconds: float = LATEX_BUILD_MAX_AGE_SECONDS,
+        max_bytes: int = LATEX_BUILD_MAX_BYTES
+    ) -> int:
+        """
+        Remove os builds sem compilação há mais de max_age_seconds e, se o total passar de
+        max_bytes, os menos usados recentemente; apaga também diretórios de trabalho abandonados
+        (de um processo interrompido) em build_root/.work. Builds sendo atualizados neste momento
+        são mantidos.
+        Retorna os bytes liberados.
+        """
+        if not os.path.isdir(self.build_root):
+            return 0
+        now = time.time()
+        builds = []
+        freed = 0
+        for namespace in os.listdir(self.build_root):
+            namespace_dir = os.path.join(self.build_root, namespace)
+            if namespace == _WORK_DIRECTORY or not os.path.isdir(namespace_dir):
+                continue
+            for entry in os.listdir(namespace_dir):
+                path = os.path.join(namespace_dir, entry)
+                if os.path.isdir(path):
+                    state_path = os.path.join(path, _STATE_FILE)
+                    last_used = os.path.getmtime(state_path if os.path.exists(state_path) else path)
+                    builds.append((last_used, _directory_size(path), path))
+
+        # Diretórios de trabalho só sobram de um processo interrompido; os de outro processo em
+        # andamento são recentes (a data de modificação é a do início da compilação)
+        work_root = os.path.join(self.build_root, _WORK_DIRECTORY)
+        if os.path.isdir(work_root):
+            with _dir_locks_lock:
+                active = set(_active_work_dirs)
+            for entry in os.listdir(work_root):
+                path = os.path.join(work_root, entry)
+                if os.path.abspath(path) in active:
+                    continue
+                if os.path.isdir(path) and now - os.path.getmtime(path) > max_age_seconds:
+                    size = _directory_size(path)
+                    shutil.rmtree(path, ignore_errors=True)
+                    freed += size
+
+        total = sum(size for _, size, _ in builds)
+        for last_used, size, path in sorted(builds):
+            if now - last_used <= max_age_seconds and total <= max_bytes:
+                break
+            lock = self._dir_lock(path)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+                self._forget_dir_lock(path)
+            finally:
+                lock.release()
+            total -= size
+            freed += size
+
+        for namespace in os.listdir(self.build_root):
+            namespace_dir = os.path.join(self.build_root, namespace)
+            if namespace != _WORK_DIRECTORY and os.path.isdir(namespace_dir) and not os.listdir(namespace_dir):
+                try:
+                    os.rmdir(namespace_dir)
+                except OSError:
+                    pass # um build acabou de ser criado nele
+        if freed:
+            logger.info(f"Builds LaTeX antigos removidos: {freed / 1024 ** 2:.1f} MB liberados.")
+        return freed
+
+@dataclass
+class CompileJob:
+    job_id: str
+    name: str
+    state: str = "pendente" # pendente, compilando ou concluído
+    result: Optional[CompileResult] = None
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+class CompilePool:
+    """
+    Pool limitado de compilações em segundo plano. submit() enfileira um trabalho e retorna seu ID
+    imediatamente (ou levanta CompileQueueFullError se houver max_queue trabalhos por concluir);
+    poll() informa o andamento e entrega o resultado quando pronto. Trabalhos concluídos que
+    ninguém consulta em job_ttl_seconds (uma aba fechada) são descartados, e os builds antigos são
+    podados a cada LATEX_BUILD_PRUNE_INTERVAL_SECONDS.
+    """
+
+    def __init__(
+        self,
+        compiler: Optional[LatexCompiler] = None,
+        workers: int = LATEX_COMPILE_WORKERS,
+        max_queue: int = LATEX_COMPILE_MAX_QUEUE,
+        job_ttl_seconds: float = LATEX_COMPILE_JOB_TTL_SECONDS
+    ):
+        self.compiler = compiler if compiler is not None else LatexCompiler()
+        self.max_queue = max_queue
+        self.job_ttl_seconds = job_ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="latex-compile")
+        self._jobs: Dict[str, CompileJob] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _expire(self) -> None:
+        """Descarta os trabalhos concluídos há mais de job_ttl_seconds. Requer o lock."""
+        now = time.time()
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.job_ttl_seconds
+        ]:
+            del self._jobs[job_id]
+
+    def _outstanding(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.state != "concluído")
+
+    def submit(self, source: str, name: str) -> str:
+        with self._lock:
+            self._expire()
+            if self._outstanding() >= self.max_queue:
+                raise CompileQueueFullError(f"Há {self.max_queue} compilações na fila. Tente novamente em instantes.")
+            job = CompileJob(uuid.uuid4().hex, name)
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._execute, job, source)
+        return job.job_id
+
+    def _execute(self, job: CompileJob, source: str) -> None:
+        job.state = "compilando"
+        try:
+            result = self.compiler.compile(source, job.name)
+        except Exception as e:
+            logger.error(f"Falha inesperada na compilação de '{job.name}': {e}", exc_info=True)
+            result = CompileResult(False, None, f"Falha inesperada na compilação: {e}", 0, time.time() - job.submitted_at)
+        job.result = result
+        job.finished_at = time.time()
+        job.state = "concluído"
+        self._maybe_prune()
+
+    def _maybe_prune(self) -> None:
+        with self._lock:
+            if time.time() - self._last_prune < LATEX_BUILD_PRUNE_INTERVAL_SECONDS:
+                return
+            self._last_prune = time.time()
+        try:
+            self.compiler.prune_builds()
+        except OSError as e:
+            logger.warning(f"Falha ao remover builds LaTeX antigos: {e}")
+
+    def poll(self, job_id: str) -> CompileJob:
+        """Retorna o trabalho; após concluído, ele é retirado do pool na primeira consulta."""
+        with self._lock:
+            self._expire()
+            job = self._jobs[job_id]
+            if job.state == "concluído":
+                del self._jobs[job_id]
+            return job
+
+_pool_lock = threading.Lock()
+_shared_pool: Optional[CompilePool] = None
+
+def get_compile_pool() -> CompilePool:
+    """Retorna o pool de compilação compartilhado pelo processo (criado sob demanda)."""
+    global _shared_pool
+    with _pool_lock:
+        if _shared_pool is None:
+            _shared_pool = CompilePool()
+        return _shared_pool
@@ -0,0 +1,184 @@
+# Leitura estruturada do .log do pdflatex: erros, avisos, caixas mal ajustadas e referências indefinidas
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from config import LATEX_LOG_MAX_RECORDS, LATEX_LOG_TAIL_LINES
+
+ERROR = "erro"
+WARNING = "aviso"
+BAD_BOX = "caixa"
+UNDEFINED_REFERENCE = "referência indefinida"
+
+_FILE_LINE_ERROR_RE = re.compile(r"^(?P<file>[^:\s]+\.\w+):(?P<line>\d+): (?P<message>.*)$")
+_ERROR_RE = re.compile(r"^! (?P<message>.*)$")
+_ERROR_LINE_RE = re.compile(r"^l\.(?P<line>\d+)")
+_WARNING_RE = re.compile(
+    r"^(?:LaTeX(?: Font)?|Package [\w.-]+|Class [\w.-]+|pdfTeX) warning(?: \([^)]*\))?:? (?P<message>.*)$", re.IGNORECASE
+)
+_BAD_BOX_RE = re.compile(r"^(?P<message>(?:Overfull|Underfull) \\[hv]box .*?)(?: (?:in paragraph|in alignment|detected) at lines? (?P<line>\d+)(?:--\d+)?)?$")
+_INPUT_LINE_RE = re.compile(r"on input line (?P<line>\d+)")
+_OPENED_FILE_RE = re.compile(r"\((?P<file>(?:\.{0,2}/)?[^\s()]+\.[A-Za-z]\w*)")
+# O TeX escreve "(arquivo" ao abrir um arquivo e ")" ao fechá-lo; os demais parênteses são
+# empilhados sem arquivo, para que o fechamento correspondente não desempilhe um arquivo
+_PAREN_RE = re.compile(r"\((?P<file>(?:\.{0,2}/)?[^\s()]+\.[A-Za-z]\w*)?|\)")
+# O TeX quebra as linhas do log nesta largura (max_print_line)
+_MAX_PRINT_LINE = 79
+_UNDEFINED_RE = re.compile(r"(Reference|Citation) .* undefined|There were undefined (references|citations)")
+
+@dataclass
+class LogRecord:
+    kind: str # ERROR, WARNING, BAD_BOX ou UNDEFINED_REFERENCE
+    message: str
+    file: Optional[str] = None
+    line: Optional[int] = None
+
+    def location(self) -> str:
+        if self.file and self.line:
+            return f"{self.file}:{self.line}"
+        return f"linha {self.line}" if self.line else (self.file or "")
+
+@dataclass
+class ParsedLog:
+    records: List[LogRecord] = field(default_factory=list) # no máximo LATEX_LOG_MAX_RECORDS, erros primeiro
+    counts: Dict[str, int] = field(default_factory=dict) # totais por tipo, inclusive os descartados
+    tail: List[str] = field(default_factory=list) # últimas LATEX_LOG_TAIL_LINES linhas do log
+
+    @property
+    def errors(self) -> List[LogRecord]:
+        return [record for record in self.records if record.kind == ERROR]
+
+    def summary(self) -> str:
+        """Resumo de uma linha, adequado para o log da aplicação."""
+        parts = [f"{self.counts.get(kind, 0)} {kind}(s)" for kind in (ERROR, UNDEFINED_REFERENCE, WARNING, BAD_BOX) if self.counts.get(kind)]
+        return ", ".join(parts) or "sem mensagens"
+
+    def to_text(self) -> str:
+        """Lista compacta das mensagens, uma por linha."""
+        return "\n".join(
+            f"[{record.kind}] {record.location() + ': ' if record.location() else ''}{record.message}" for record in self.records
+        )
+
+class LatexLogParser:
+    """
+    Analisador incremental: recebe o log linha a linha (feed) sem guardá-lo inteiro e produz
+    registros estruturados, limitados a max_records, mais as últimas tail_lines linhas brutas.
+    """
+
+    def __init__(self, max_records: int = LATEX_LOG_MAX_RECORDS, tail_lines: int = LATEX_LOG_TAIL_LINES):
+        self.max_records = max_records
+        self._records: List[LogRecord] = []
+        self._counts: Dict[str, int] = {}
+        self._tail = deque(maxlen=tail_lines)
+        self._files: List[Optional[str]] = [] # pilha dos parênteses abertos (arquivo ou None)
+        self._in_excerpt = False # trecho do documento citado após um erro ou caixa, até a próxima linha em branco
+        self._pending_error: Optional[LogRecord] = None # erro "! ..." aguardando a linha "l.N"
+        self._pending_warning: Optional[LogRecord] = None # aviso que pode continuar nas linhas seguintes
+        self._previous_wrapped = False
+
+    @property
+    def _current_file(self) -> Optional[str]:
+        """Arquivo aberto mais interno, a que as mensagens se referem."""
+        return next((file for file in reversed(self._files) if file), None)
+
+    def _track_files(self, line: str) -> None:
+        for match in _PAREN_RE.finditer(line):
+            if match.group(0) == ")":
+                if self._files:
+                    self._files.pop()
+            else:
+                self._files.append(match.group("file"))
+
+    def _add(self, record: LogRecord) -> None:
+        self._counts[record.kind] = self._counts.get(record.kind, 0) + 1
+        if len(self._records) < self.max_records:
+            self._records.append(record)
+        elif record.kind == ERROR:
+            # Erros têm prioridade sobre os demais registros quando o limite é atingido
+            for index in range(len(self._records) - 1, -1, -1):
+                if self._records[index].kind != ERROR:
+                    self._records[index] = record
+                    break
+
+    def _finish_warning(self) -> None:
+        warning = self._pending_warning
+        if warning is None:
+            return
+        self._pending_warning = None
+        match = _INPUT_LINE_RE.search(warning.message)
+        if match:
+            warning.line = int(match.group("line"))
+        if _UNDEFINED_RE.search(warning.message):
+            warning.kind = UNDEFINED_REFERENCE
+        self._add(warning)
+
+    def feed(self, line: str) -> None:
+        line = line.rstrip("\r\n")
+        self._tail.append(line)
+        wrapped, self._previous_wrapped = self._previous_wrapped, len(line) == _MAX_PRINT_LINE
+
+        if self._pending_warning is not None:
+            # Continuações de avisos são quebras de linha do TeX, indentadas ou começam com "(pacote)"
+            if wrapped:
+                self._pending_warning.message += line
+                return
+            if line.strip() and (line.startswith(" ") or line.startswith("(")) and not _OPENED_FILE_RE.match(line):
+                self._pending_warning.message += " " + re.sub(r"^\([\w.-]+\)\s*", "", line.strip())
+                return
+            self._finish_warning()
+
+        if self._pending_error is not None:
+            match = _ERROR_LINE_RE.match(line)
+            if match:
+                self._pending_error.line = int(match.group("line"))
+                self._add(self._pending_error)
+                self._pending_error = None
+                return
+
+        match = _FILE_LINE_ERROR_RE.match(line)
+        if match:
+            self._add(LogRecord(ERROR, match.group("message"), match.group("file"), int(match.group("line"))))
+            self._in_excerpt = True
+            return
+        match = _ERROR_RE.match(line)
+        if match:
+            if self._pending_error is not None:
+                self._add(self._pending_error)
+            self._pending_error = LogRecord(ERROR, match.group("message"), self._current_file)
+            self._in_excerpt = True
+            return
+        match = _WARNING_RE.match(line)
+        if match:
+            self._pending_warning = LogRecord(WARNING, match.group("message").strip(), self._current_file)
+            return
+        match = _BAD_BOX_RE.match(line)
+        if match:
+            line_number = match.group("line")
+            self._add(LogRecord(BAD_BOX, match.group("message"), self._current_file, int(line_number) if line_number else None))
+            self._in_excerpt = True
+            return
+        if self._in_excerpt:
+            # O trecho citado do documento pode ter parênteses desbalanceados
+            self._in_excerpt = bool(line.strip())
+            return
+        self._track_files(line)
+
+    def close(self) -> ParsedLog:
+        self._finish_warning()
+        if self._pending_error is not None:
+            self._add(self._pending_error)
+            self._pending_error = None
+        records = sorted(self._records, key=lambda record: record.kind != ERROR)
+        return ParsedLog(records, dict(self._counts), list(self._tail))
+
+def parse_log_lines(lines: Iterable[str]) -> ParsedLog:
+    parser = LatexLogParser()
+    for line in lines:
+        parser.feed(line)
+    return parser.close()
+
+def parse_log_file(path: str) -> ParsedLog:
+    """Analisa um arquivo .log lendo-o linha a linha."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return parse_log_lines(f)
@@ -0,0 +1,140 @@
+# União local dos blocos de LaTeX convertidos, com o LLM apenas nas fronteiras entre blocos
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import logger
+
+BOUNDARY_SEPARATOR = "%%% FRONTEIRA %%%"
+# Pacotes que o prompt de conversão manda presumir, mesmo que um bloco não os declare
+REQUIRED_PACKAGES = ("amsmath", "amssymb", "graphicx")
+
+_FENCE_RE = re.compile(r"^\s*```[\w-]*\s*$", re.MULTILINE)
+_PAGE_BREAK_RE = re.compile(r"\\(?:newpage|clearpage)\b\s*")
+_USEPACKAGE_RE = re.compile(r"^\s*\\usepackage\s*(?:\[(?P<options>[^\]]*)\])?\s*\{(?P<packages>[^}]*)\}\s*(?P<rest>%.*)?$")
+_DEFINITION_RE = re.compile(
+    r"^\s*\\(?:(?:re)?newcommand\*?|providecommand\*?|DeclareMathOperator\*?|newenvironment|newtheorem)\s*\{?\s*(?P<name>\\?[A-Za-z@]+)"
+)
+_SINGLETON_RE = re.compile(r"^\s*\\(?P<command>documentclass|title|author|date)\b")
+
+@dataclass
+class _Block:
+    preamble: List[str] = field(default_factory=list)
+    body: List[str] = field(default_factory=list)
+
+def _split_block(text: str) -> _Block:
+    """Separa um bloco em preâmbulo e corpo, removendo cercas de código e quebras de página."""
+    text = _PAGE_BREAK_RE.sub("", _FENCE_RE.sub("", text))
+    begin = text.find("\\begin{document}")
+    if begin < 0:
+        return _Block([], text.strip("\n").splitlines())
+    end = text.find("\\end{document}", begin)
+    body = text[begin + len("\\begin{document}"):end if end >= 0 else len(text)]
+    return _Block(text[:begin].strip("\n").splitlines(), body.strip("\n").splitlines())
+
+def merge_preambles(preambles: List[List[str]], required_packages: Tuple[str, ...] = REQUIRED_PACKAGES) -> List[str]:
+    """
+    Une os preâmbulos dos blocos: \\documentclass, \\title, \\author e \\date vêm do primeiro bloco que
+    os define, cada pacote é carregado uma única vez (com as opções da primeira ocorrência) e cada
+    comando ou ambiente é definido uma única vez. As demais linhas são mantidas sem repetição.
+    """
+    merged: List[str] = []
+    packages_seen = set()
+    definitions_seen = set()
+    singletons_seen = set()
+    lines_seen = set()
+    for preamble in preambles:
+        for line in preamble:
+            usepackage = _USEPACKAGE_RE.match(line)
+            if usepackage:
+                packages = [name.strip() for name in usepackage.group("packages").split(",") if name.strip()]
+                new = [name for name in packages if name not in packages_seen]
+                packages_seen.update(new)
+                if new:
+                    options = f"[{usepackage.group('options')}]" if usepackage.group("options") else ""
+                    merged.append(f"\\usepackage{options}{{{','.join(new)}}}")
+                continue
+            singleton = _SINGLETON_RE.match(line)
+            if singleton:
+                if singleton.group("command") in singletons_seen:
+                    continue
+                singletons_seen.add(singleton.group("command"))
+            definition = _DEFINITION_RE.match(line)
+            if definition:
+                if definition.group("name") in definitions_seen:
+                    continue
+                definitions_seen.add(definition.group("name"))
+            if line.strip() and line in lines_seen:
+                continue
+            lines_seen.add(line)
+            merged.append(line)
+    if "documentclass" not in singletons_seen:
+        merged.insert(0, "\\documentclass{article}")
+    missing = [name for name in required_packages if name not in packages_seen]
+    if missing:
+        class_line = next(index for index, line in enumerate(merged) if _SINGLETON_RE.match(line) and "documentclass" in line)
+        merged.insert(class_line + 1, f"\\usepackage{{{','.join(missing)}}}")
+    return merged
+
+def _boundary_windows(bodies: List[List[str]], window_lines: int) -> List[Tuple[int, int]]:
+    """
+    Tamanho (linhas do final, linhas do início) de cada janela de fronteira entre os blocos i e i+1.
+    Um bloco curto é dividido entre as duas fronteiras que o tocam, sem sobreposição.
+    """
+    windows = []
+    for index in range(len(bodies) - 1):
+        left, right = bodies[index], bodies[index + 1]
+        left_limit = len(left) if index == 0 else len(left) - min(window_lines, len(left) // 2)
+        right_limit = len(right) if index + 1 == len(bodies) - 1 else len(right) // 2
+        windows.append((min(window_lines, left_limit), min(window_lines, right_limit)))
+    return windows
+
+def merge_latex_blocks(
+    parts: List[str],
+    resolve_boundary: Optional[Callable[[str], str]],
+    window_lines: int,
+    max_workers: int
+) -> str:
+    """
+    Une os blocos convertidos em um único documento. Preâmbulos, quebras de página e o corpo são
+    tratados localmente; resolve_boundary (se houver) recebe apenas a janela de fronteira entre
+    dois blocos vizinhos (final de um, BOUNDARY_SEPARATOR, início do outro) e devolve o trecho
+    unido. As fronteiras são resolvidas em paralelo; se uma falhar, os trechos são apenas justapostos.
+    """
+    blocks = [_split_block(part) for part in parts]
+    bodies = [block.body for block in blocks]
+    for body in bodies[1:]:
+        body[:] = [line for line in body if line.strip() != "\\maketitle"]
+    windows = _boundary_windows(bodies, window_lines)
+
+    joined: Dict[int, List[str]] = {}
+    if resolve_boundary is not None and windows:
+        def resolve(index: int) -> List[str]:
+            tail_size, head_size = windows[index]
+            tail = bodies[index][len(bodies[index]) - tail_size:]
+            head = bodies[index + 1][:head_size]
+            if not any(line.strip() for line in tail + head):
+                return tail + head
+            try:
+                merged = _FENCE_RE.sub("", resolve_boundary("\n".join(tail + [BOUNDARY_SEPARATOR] + head)))
+                return merged.strip("\n").splitlines()
+            except Exception as e:
+                logger.warning(f"Fronteira entre os blocos {index + 1} e {index + 2} não resolvida ({e}); trechos justapostos.")
+                return tail + head
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="latex-merge") as executor:
+            joined = dict(zip(range(len(windows)), executor.map(resolve, range(len(windows)))))
+
+    body: List[str] = []
+    for index, block_body in enumerate(bodies):
+        start = windows[index - 1][1] if index > 0 and index - 1 in joined else 0
+        end = len(block_body) - windows[index][0] if index in joined else len(block_body)
+        body.extend(block_body[start:end])
+        if index in joined:
+            body.extend(joined[index])
+        elif index < len(bodies) - 1:
+            body.append("")
+
+    preamble = merge_preambles([block.preamble for block in blocks])
+    return "\n".join(preamble + ["", "\\begin{document}", ""] + body + ["", "\\end{document}", ""])
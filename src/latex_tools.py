@@ -1,96 +1,199 @@
 # Ferramentas para manipulação e melhoria de LaTeX
+import io
 import os
-import subprocess
-import tempfile
+import re
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
-import google.generativeai as genai
-from typing import Tuple
+from typing import Callable, List, Optional, Tuple, TypeVar
 import PyPDF2
+from google.api_core import exceptions as google_exceptions
 
 from config import (
     logger,
     GEMINI_MODEL_NAME,
     LATEX_CONVERSION_PROMPT,
     LATEX_IMPROVEMENT_PROMPT,
-    LATEX_CONCATENATE_PROMPT
+    LATEX_CONCATENATE_PROMPT,
+    LATEX_BOUNDARY_PROMPT,
+    LATEX_MERGE_MODE,
+    LATEX_MERGE_BOUNDARY_LINES,
+    LATEX_PAGES_PER_BLOCK,
+    LATEX_CONVERSION_MAX_WORKERS,
+    LATEX_CONVERSION_MAX_RETRIES,
+    LATEX_CONVERSION_RETRY_BASE_DELAY
 )
-from utils import recortar_pdf_em_blocos
+from conversion_jobs import ConversionJob, PageRange
+from disk_cache import SQLiteLRUCache
+from latex_merge import merge_latex_blocks
+from latex_compiler import CompileJob, LatexCompiler, get_compile_pool
+from llm_gateway import KeyedLLMGateway, get_llm_gateway
+from render_cache import content_hash
+from utils import iter_pdf_blocks
+
+T = TypeVar("T")
+
+# Erros do Gemini que costumam passar sozinhos: limite de requisições, falhas do servidor e tempo esgotado
+_TRANSIENT_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServerError,
+    google_exceptions.RetryError,
+    TimeoutError,
+    ConnectionError,
+)
+_TRANSIENT_MESSAGE = re.compile(r"\b(429|5\d\d)\b|rate limit|resource exhausted|unavailable|deadline exceeded|timed? ?out", re.IGNORECASE)
+
+def _is_transient(error: Exception) -> bool:
+    """Indica se vale repetir a operação; erros de requisição (chave inválida, 400, 403...) falham de imediato."""
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    if isinstance(error, google_exceptions.GoogleAPICallError):
+        return False
+    return bool(_TRANSIENT_MESSAGE.search(str(error)))
+
+def _with_retry(operation: Callable[[], T], description: str) -> T:
+    """
+    Executa a operação com até LATEX_CONVERSION_MAX_RETRIES novas tentativas e backoff exponencial com jitter.
+    Só erros transitórios são repetidos; os demais são relançados na hora.
+    """
+    for attempt in range(LATEX_CONVERSION_MAX_RETRIES + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt == LATEX_CONVERSION_MAX_RETRIES or not _is_transient(e):
+                raise
+            delay = LATEX_CONVERSION_RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random())
+            logger.warning(f"{description} falhou (tentativa {attempt + 1}): {e}. Repetindo em {delay:.1f}s.")
+            time.sleep(delay)
 
 class LatexTools:
     """Gerencia operações relacionadas a LaTeX."""
 
-    def __init__(self, llm_model_name: str = GEMINI_MODEL_NAME):
+    def __init__(self, llm_model_name: str = GEMINI_MODEL_NAME, gateway: Optional[KeyedLLMGateway] = None, checkpoints: Optional[SQLiteLRUCache] = None):
         self.llm_model_name = llm_model_name
+        # Chamadas ao Gemini com a chave da sessão (None usa o gateway compartilhado com a chave do ambiente)
+        self.gateway = gateway if gateway is not None else get_llm_gateway().bind(None)
+        self.compiler = LatexCompiler()
+        # Armazenamento de checkpoints das conversões (None usa o compartilhado pelo processo)
+        self.checkpoints = checkpoints
+
+    def _convert_block(self, data: bytes, display_name: str) -> str:
+        """Envia um PDF (ou bloco) ao Gemini e retorna o LaTeX transcrito, removendo o arquivo remoto ao final."""
+        client = self.gateway.client
+        pdf_file = client.upload_file(path=io.BytesIO(data), display_name=display_name, mime_type="application/pdf")
+        try:
+            response = self.gateway.model(self.llm_model_name).generate_content([LATEX_CONVERSION_PROMPT, pdf_file])
+            return response.text
+        finally:
+            client.delete_file(pdf_file.name) # Deleta o arquivo temporário do Gemini
+
+    def _convert_blocks(self, job: ConversionJob, blocks: List[Tuple[str, PageRange, bytes]]) -> List[str]:
+        """
+        Converte os blocos (nome, intervalo de páginas, bytes) concorrentemente (até
+        LATEX_CONVERSION_MAX_WORKERS por vez), com novas tentativas por bloco, e retorna os
+        resultados na ordem das páginas. Blocos já gravados no checkpoint do job não são reenviados,
+        e cada bloco concluído é gravado imediatamente, mesmo que outro bloco falhe.
+        """
+        done_blocks = job.completed_blocks(page_range for _, page_range, _ in blocks)
+        pending = [block for block in blocks if block[1] not in done_blocks]
+        progress = st.progress(
+            len(done_blocks) / len(blocks),
+            text=f"Convertendo {len(pending)} de {len(blocks)} blocos ({len(done_blocks)} retomados)..."
+        )
+        first_error = None
+        with ThreadPoolExecutor(max_workers=LATEX_CONVERSION_MAX_WORKERS, thread_name_prefix="latex-block") as executor:
+            futures = {
+                executor.submit(
+                    _with_retry,
+                    lambda name=name, data=data: self._convert_block(data, name),
+                    f"Conversão do bloco {name}"
+                ): page_range
+                for name, page_range, data in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    done_blocks[futures[future]] = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                job.save_block(futures[future], done_blocks[futures[future]])
+                progress.progress(len(done_blocks) / len(blocks), text=f"{len(done_blocks)}/{len(blocks)} blocos convertidos")
+        progress.empty()
+        if first_error is not None:
+            raise first_error
+        return [done_blocks[page_range] for _, page_range, _ in blocks]
+
+    def _merge_parts(self, blocks: List[Tuple[str, PageRange, bytes]], parts: List[str]) -> str:
+        """
+        Une o LaTeX dos blocos. No modo "hierarchical", a união é feita localmente e o LLM recebe apenas
+        as janelas de fronteira entre blocos vizinhos, em paralelo; no modo "llm", todas as partes vão
+        em um único prompt de concatenação.
+        """
+        if LATEX_MERGE_MODE == "llm":
+            latex_final_parts = "".join(
+                f"% --- Parte: {name} ---\n" + part + "\n\n"
+                for (name, _, _), part in zip(blocks, parts)
+            )
+            return self.gateway.generate(self.llm_model_name, LATEX_CONCATENATE_PROMPT, latex_final_parts)
+        return merge_latex_blocks(
+            parts,
+            lambda window: self.gateway.generate(self.llm_model_name, LATEX_BOUNDARY_PROMPT, window),
+            LATEX_MERGE_BOUNDARY_LINES,
+            LATEX_CONVERSION_MAX_WORKERS
+        )
 
     def convert_pdf_to_latex(self, uploaded_file: st.runtime.uploaded_file_manager.UploadedFile) -> str:
         """
         Converte um PDF manuscrito em código LaTeX usando o modelo Gemini.
-        Divide PDFs grandes em blocos se necessário.
+        Divide PDFs grandes em blocos em memória, convertidos em paralelo, se necessário.
+        O progresso fica registrado no armazenamento de checkpoints: uma nova tentativa refaz
+        apenas os blocos que faltaram, e um PDF já convertido é devolvido sem chamar o modelo.
         """
         latex_code = ""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(uploaded_file.getbuffer())
-            caminho_do_pdf = tmp.name
-
         try:
-            with open(caminho_do_pdf, "rb") as f_in:
-                leitor = PyPDF2.PdfReader(f_in)
-                total_paginas = len(leitor.pages)
-
-            if total_paginas > 30:
-                st.warning(f"O PDF possui {total_paginas} páginas. Ele será dividido em blocos de 30 páginas para processamento. Isso pode levar um tempo.")
-                recortar_pdf_em_blocos(caminho_do_pdf, paginas_por_bloco=30, prefixo_saida=os.path.splitext(os.path.basename(caminho_do_pdf))[0] + "_parte")
-                st.info("PDF recortado em blocos. Processando cada parte...")
-                
-                latex_final_parts = ""
-                for file in sorted(os.listdir(".")): # Garante a ordem dos arquivos
-                    if file.startswith(os.path.splitext(os.path.basename(caminho_do_pdf))[0] + "_parte") and file.endswith(".pdf"):
-                        with st.spinner(f"Processando parte: {file}"):
-                            with open(file, "rb") as f:
-                                pdf_file = genai.upload_file(
-                                    path=f,
-                                    display_name=file,
-                                    mime_type="application/pdf"
-                                )
-                                model = genai.GenerativeModel(model_name=self.llm_model_name)
-                                response = model.generate_content([LATEX_CONVERSION_PROMPT, pdf_file])
-                                latex_final_parts += f"% --- Parte: {file} ---\n" + response.text + "\n\n"
-                                genai.delete_file(pdf_file.name) # Deleta o arquivo temporário do Gemini
-                                os.remove(file) # Limpa o arquivo local do bloco
+            data = uploaded_file.getvalue()
+            job = ConversionJob(content_hash(data), self.llm_model_name, LATEX_PAGES_PER_BLOCK, self.checkpoints)
+            cached_result = job.result()
+            if cached_result is not None:
+                st.info("Este PDF já foi convertido; reutilizando o resultado salvo.")
+                return cached_result
 
+            total_paginas = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+            if total_paginas > LATEX_PAGES_PER_BLOCK:
+                st.warning(f"O PDF possui {total_paginas} páginas. Ele será dividido em blocos de {LATEX_PAGES_PER_BLOCK} páginas para processamento. Isso pode levar um tempo.")
+                base_name = os.path.splitext(uploaded_file.name)[0]
+                blocks = [
+                    (f"{base_name}_pags_{inicio}_a_{fim}.pdf", (inicio, fim), block_data)
+                    for inicio, fim, block_data in iter_pdf_blocks(data, LATEX_PAGES_PER_BLOCK)
+                ]
+                st.info("PDF recortado em blocos. Processando as partes em paralelo...")
+
+                parts = self._convert_blocks(job, blocks)
                 with st.spinner("Concatenando e finalizando o LaTeX..."):
-                    model = genai.GenerativeModel(model_name=self.llm_model_name)
-                    response = model.generate_content([LATEX_CONCATENATE_PROMPT, latex_final_parts])
-                    latex_code = response.text
+                    latex_code = self._merge_parts(blocks, parts)
 
             else:
                 with st.spinner("Enviando PDF para Gemini..."):
-                    pdf_file = genai.upload_file(
-                        path=uploaded_file,
-                        display_name=uploaded_file.name,
-                        mime_type="application/pdf"
+                    latex_code = _with_retry(
+                        lambda: self._convert_block(data, uploaded_file.name),
+                        f"Conversão de {uploaded_file.name}"
                     )
-                    model = genai.GenerativeModel(model_name=self.llm_model_name)
-                    response = model.generate_content([LATEX_CONVERSION_PROMPT, pdf_file])
-                    latex_code = response.text
-                    genai.delete_file(pdf_file.name) # Deleta o arquivo temporário do Gemini
 
+            job.save_result(latex_code)
             return latex_code
 
         except Exception as e:
             logger.error(f"Erro na conversão PDF para LaTeX: {e}", exc_info=True)
-            st.error(f"Ocorreu um erro durante a conversão: {e}")
+            st.error(f"Ocorreu um erro durante a conversão: {e}. Os blocos já convertidos foram salvos e não serão refeitos na próxima tentativa.")
             return ""
-        finally:
-            if os.path.exists(caminho_do_pdf):
-                os.remove(caminho_do_pdf) # Limpa o arquivo PDF temporário
 
     def improve_latex_code(self, latex_code: str) -> str:
         """Melhora um código LaTeX existente usando o modelo Gemini."""
         try:
-            model = genai.GenerativeModel(model_name=self.llm_model_name)
-            response = model.generate_content([LATEX_IMPROVEMENT_PROMPT, latex_code])
-            return response.text
+            return self.gateway.generate(self.llm_model_name, LATEX_IMPROVEMENT_PROMPT, latex_code)
         except Exception as e:
             logger.error(f"Erro na melhoria do LaTeX: {e}", exc_info=True)
             st.error(f"Ocorreu um erro durante a melhoria: {e}")
@@ -98,32 +201,16 @@ class LatexTools:
 
     def compile_latex_to_pdf(self, codigo_tex: str, nome_base_arquivo: str) -> Tuple[bool, str]:
         """
-        Compila código LaTeX para PDF.
+        Compila código LaTeX para PDF no diretório de build persistente do documento.
         Retorna (sucesso, caminho_do_pdf ou mensagem_de_erro).
         """
-        nome_arquivo_tex = f"{nome_base_arquivo}.tex"
-        with open(nome_arquivo_tex, "w", encoding="utf-8") as f:
-            f.write(codigo_tex)
-        
-        comando = ["pdflatex", "-interaction=nonstopmode", f"-jobname={nome_base_arquivo}", nome_arquivo_tex]
-        
-        # Tenta compilar 2 vezes para resolver referências
-        for i in range(2):
-            try:
-                result = subprocess.run(comando, check=True, capture_output=True, text=True, encoding='utf-8')
-                logger.info(f"Compilação LaTeX (passo {i+1}) stdout:\n{result.stdout}")
-                if result.stderr:
-                    logger.warning(f"Compilação LaTeX (passo {i+1}) stderr:\n{result.stderr}")
-            except FileNotFoundError:
-                return False, "Erro Crítico: 'pdflatex' não foi encontrado. Instale uma distribuição LaTeX (ex: TeX Live, MiKTeX)."
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Erro de compilação LaTeX:\n{e.stdout}\n{e.stderr}", exc_info=True)
-                return False, f"Erro na compilação:\n{e.stdout}\n{e.stderr}"
-        
-        caminho_pdf = f"{nome_base_arquivo}.pdf"
-        if os.path.exists(caminho_pdf):
-            logger.info(f"PDF compilado com sucesso em: {caminho_pdf}")
-            return True, caminho_pdf
-        else:
-            logger.error(f"PDF não encontrado após a compilação. Arquivos gerados: {os.listdir('.')}")
-            return False, "PDF não encontrado após a compilação. Verifique os logs para mais detalhes."
\ No newline at end of file
+        result = self.compiler.compile(codigo_tex, nome_base_arquivo)
+        return (True, result.pdf_path) if result.success else (False, result.log)
+
+    def submit_compilation(self, codigo_tex: str, nome_base_arquivo: str) -> str:
+        """Enfileira a compilação no pool compartilhado e retorna o ID do trabalho, sem bloquear."""
+        return get_compile_pool().submit(codigo_tex, nome_base_arquivo)
+
+    def poll_compilation(self, job_id: str) -> CompileJob:
+        """Consulta um trabalho de compilação; o resultado fica em job.result quando concluído."""
+        return get_compile_pool().poll(job_id)
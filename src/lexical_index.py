@@ -0,0 +1,205 @@
+# Índice invertido BM25 em processo, persistido ao lado do banco vetorial
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import logger, LEXICAL_INDEX_DIRECTORY, BM25_K1, BM25_B
+
+_INDEX_VERSION = 1
+
+# Comandos LaTeX (\hbar), rótulos (eq:energia, sec:intro) e palavras
+_TOKEN_RE = re.compile(r"\\[A-Za-z]+|[A-Za-z]+(?::[\w\-]+)+|\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Divide o texto em termos, preservando comandos LaTeX e rótulos de equações como termos únicos."""
+    return [token if token.startswith("\\") else token.lower() for token in _TOKEN_RE.findall(text)]
+
+class LexicalHit(NamedTuple):
+    doc_id: str
+    score: float # BM25 bruto (comparável apenas dentro de uma mesma consulta)
+    coverage: float # fração do IDF da consulta coberta pelos termos presentes no documento, em [0, 1]
+
+class LexicalIndex:
+    """
+    Índice invertido com pontuação BM25. As listas de postings são arrays compactos
+    (números dos documentos em ordem crescente e frequências do termo). O índice é compartilhado
+    pelas sessões: add, search e save são serializados pelo lock do índice.
+    """
+
+    def __init__(self):
+        self.doc_ids: List[str] = []
+        self.doc_lengths = array("I")
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._known_ids = set()
+        self._total_length = 0
+        self._lock = threading.Lock()
+        # Se o índice já foi carregado do disco e sincronizado com a coleção (ver sync_lexical_index)
+        self.synced = False
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._known_ids
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Indexa um documento (ignorado se o ID já estiver no índice)."""
+        with self._lock:
+            self._add(doc_id, text)
+
+    def _add(self, doc_id: str, text: str) -> None:
+        if doc_id in self._known_ids:
+            return
+        doc_number = len(self.doc_ids)
+        tokens = tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for term, frequency in frequencies.items():
+            doc_numbers, term_frequencies = self.postings.setdefault(term, (array("I"), array("I")))
+            doc_numbers.append(doc_number)
+            term_frequencies.append(frequency)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(len(tokens))
+        self._known_ids.add(doc_id)
+        self._total_length += len(tokens)
+
+    def _idf(self, document_frequency: int) -> float:
+        total = len(self.doc_ids)
+        return math.log(1.0 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, top_k: int) -> List[LexicalHit]:
+        """
+        Retorna até top_k resultados em ordem decrescente de BM25. A cobertura de cada um pondera os
+        termos da consulta pelo IDF: um termo raro (\\hbar, eq:energia) pesa muito mais do que
+        palavras comuns ("o", "que"), de modo que um documento que contém os termos discriminativos
+        da consulta tem cobertura próxima de 1 mesmo sem repeti-los.
+        """
+        with self._lock:
+            return self._search(query, top_k)
+
+    def _search(self, query: str, top_k: int) -> List[LexicalHit]:
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not self.doc_ids or not any(term in self.postings for term in query_terms):
+            return []
+        average_length = self._total_length / len(self.doc_ids)
+        scores: Dict[int, float] = {}
+        matched_idf: Dict[int, float] = {}
+        query_idf = 0.0
+        for term in query_terms:
+            postings = self.postings.get(term)
+            if not postings:
+                # Termos ausentes do índice não distinguem documento algum e ficam fora da cobertura
+                continue
+            idf = self._idf(len(postings[0]))
+            query_idf += idf
+            for doc_number, frequency in zip(*postings):
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_number] / average_length
+                score = idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                scores[doc_number] = scores.get(doc_number, 0.0) + score
+                matched_idf[doc_number] = matched_idf.get(doc_number, 0.0) + idf
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            LexicalHit(self.doc_ids[doc_number], score, matched_idf[doc_number] / query_idf)
+            for doc_number, score in best
+        ]
+
+    def save(self, path: str) -> None:
+        """Grava o índice em disco (escrita atômica)."""
+        with self._lock:
+            self._save(path)
+
+    def _save(self, path: str) -> None:
+        """Requer o lock."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(
+                {"version": _INDEX_VERSION, "doc_ids": self.doc_ids, "doc_lengths": self.doc_lengths, "postings": self.postings},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        """Carrega um índice gravado, ou retorna None se não existir ou for de outra versão."""
+        index = cls()
+        return index if index._load(path) else None
+
+    def _load(self, path: str) -> bool:
+        """Substitui o conteúdo pelo índice gravado em path, se existir e for desta versão. Requer o lock."""
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != _INDEX_VERSION:
+            return False
+        self.doc_ids = data["doc_ids"]
+        self.doc_lengths = data["doc_lengths"]
+        self.postings = data["postings"]
+        self._known_ids = set(self.doc_ids)
+        self._total_length = sum(self.doc_lengths)
+        return True
+
+def index_path(collection_name: str) -> str:
+    return os.path.join(LEXICAL_INDEX_DIRECTORY, f"{collection_name}.bm25")
+
+# Índices carregados, compartilhados pelas sessões do processo
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+def sync_lexical_index(vector_db) -> LexicalIndex:
+    """
+    Garante que o índice lexical da coleção contenha todos os seus chunks, indexando apenas os
+    ausentes (lidos do Chroma, sem chamadas de embedding) e gravando o resultado em disco.
+    O lock global protege apenas o registro dos índices; a leitura do disco e do Chroma, a
+    tokenização e a gravação ocorrem sob o lock do próprio índice, sem bloquear as demais coleções.
+    """
+    collection = vector_db._collection
+    with _indexes_lock:
+        index = _indexes.get(collection.name)
+        if index is None:
+            index = _indexes[collection.name] = LexicalIndex()
+    with index._lock:
+        path = index_path(collection.name)
+        if not index.synced:
+            index._load(path)
+        all_ids = collection.get(include=[])["ids"]
+        missing = [doc_id for doc_id in all_ids if doc_id not in index]
+        if missing:
+            for start in range(0, len(missing), 500):
+                stored = collection.get(ids=missing[start:start + 500], include=["documents"])
+                for doc_id, text in zip(stored["ids"], stored["documents"]):
+                    index._add(doc_id, text or "")
+            with _indexes_lock:
+                # Um índice removido durante a sincronização (drop_lexical_index) não volta ao disco
+                registered = _indexes.get(collection.name) is index
+            if registered:
+                index._save(path)
+            logger.info(f"Índice lexical de {collection.name}: {len(missing)} chunks indexados ({len(index)} no total).")
+        index.synced = True
+    return index
+
+def get_lexical_index(vector_db) -> LexicalIndex:
+    """Retorna o índice da coleção já carregado em memória, sincronizando-o apenas na primeira vez."""
+    with _indexes_lock:
+        index = _indexes.get(vector_db._collection.name)
+    return index if index is not None and index.synced else sync_lexical_index(vector_db)
+
+def unload_lexical_index(collection_name: str) -> None:
+    """Libera o índice lexical da coleção da memória, mantendo-o em disco."""
+    with _indexes_lock:
+        _indexes.pop(collection_name, None)
+
+def drop_lexical_index(collection_name: str) -> None:
+    """Remove o índice lexical de uma coleção da memória e do disco."""
+    with _indexes_lock:
+        _indexes.pop(collection_name, None)
+        path = index_path(collection_name)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,175 @@
+# Camada compartilhada de chamadas ao Gemini: clientes reutilizados, cache de respostas e coalescência
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client, protos
+from google.generativeai.types import file_types
+
+from config import logger, LLM_RESPONSE_CACHE_PATH, LLM_RESPONSE_CACHE_MAX_ENTRIES, LLM_GATEWAY_MAX_CLIENTS
+from disk_cache import SQLiteLRUCache
+
+def response_key(model_name: str, prompt: str, content: str) -> str:
+    """Chave endereçada por conteúdo: modelo + hash do prompt + hash da entrada."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return f"{model_name}:{prompt_hash}:{content_hash}"
+
+def api_key_hash(api_key: Optional[str]) -> str:
+    """Identidade de uma chave da API sem guardá-la em claro ("" para a chave do ambiente)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else ""
+
+class GenAIClient:
+    """
+    Cliente google.generativeai preso a uma chave da API. genai.configure altera a chave do
+    processo inteiro; aqui cada chave tem os seus próprios clientes de serviço, de modo que
+    sessões com chaves diferentes (ou uma chave digitada errada e depois corrigida) não
+    interferem umas nas outras. Sem chave, vale a do ambiente (GEMINI_API_KEY ou GOOGLE_API_KEY).
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        self._clients = genai_client._ClientManager()
+        self._clients.configure(api_key=api_key or None)
+
+    def GenerativeModel(self, model_name: str) -> Any:
+        model = genai.GenerativeModel(model_name=model_name)
+        model._client = self._clients.get_default_client("generative")
+        return model
+
+    def upload_file(self, path, display_name: str, mime_type: str) -> Any:
+        response = self._clients.get_default_client("file").create_file(
+            path=path, mime_type=mime_type, name=None, display_name=display_name, resumable=True
+        )
+        return file_types.File(response)
+
+    def delete_file(self, name: str) -> None:
+        self._clients.get_default_client("file").delete_file(request=protos.DeleteFileRequest(name=name))
+
+class LLMGateway:
+    """
+    Ponto único de chamada ao Gemini para LatexTools e WebGenerator. Mantém um cliente por chave da
+    API e um GenerativeModel por (chave, modelo), guarda as respostas de texto em um cache
+    persistente (SQLite, LRU) e faz com que pedidos idênticos simultâneos compartilhem uma única
+    chamada em andamento. O cache e a coalescência são endereçados apenas pelo conteúdo, então
+    valem entre sessões com chaves diferentes; cada sessão usa o gateway por meio de bind(chave).
+    """
+
+    def __init__(self, client_factory: Callable[[Optional[str]], Any] = GenAIClient, cache: Optional[SQLiteLRUCache] = None):
+        # Cria o cliente de uma chave (GenAIClient ou um substituto com a mesma interface)
+        self.client_factory = client_factory
+        self.cache = cache if cache is not None else SQLiteLRUCache(
+            LLM_RESPONSE_CACHE_PATH, LLM_RESPONSE_CACHE_MAX_ENTRIES, table="llm_responses"
+        )
+        self.calls = 0
+        self.coalesced = 0
+        # hash da chave -> (cliente, GenerativeModels por nome), em ordem de uso
+        self._clients: "OrderedDict[str, Tuple[Any, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, api_key: Optional[str]) -> Tuple[Any, Dict[str, Any]]:
+        """Cliente e modelos da chave, criados na primeira vez. Requer o lock."""
+        key_hash = api_key_hash(api_key)
+        entry = self._clients.get(key_hash)
+        if entry is None:
+            entry = self._clients[key_hash] = (self.client_factory(api_key), {})
+            while len(self._clients) > LLM_GATEWAY_MAX_CLIENTS:
+                self._clients.popitem(last=False)
+            logger.info(f"Cliente Gemini criado para a chave {key_hash or '(ambiente)'}.")
+        self._clients.move_to_end(key_hash)
+        return entry
+
+    def client(self, api_key: Optional[str]) -> Any:
+        """Retorna o cliente da chave (upload e remoção de arquivos, modelos)."""
+        with self._lock:
+            return self._entry(api_key)[0]
+
+    def model(self, api_key: Optional[str], model_name: str) -> Any:
+        """Retorna o GenerativeModel da chave e do modelo, criado uma única vez."""
+        with self._lock:
+            client, models = self._entry(api_key)
+            if model_name not in models:
+                models[model_name] = client.GenerativeModel(model_name=model_name)
+            return models[model_name]
+
+    def bind(self, api_key: Optional[str]) -> "KeyedLLMGateway":
+        """Visão do gateway presa à chave de uma sessão."""
+        return KeyedLLMGateway(self, api_key)
+
+    def generate(self, api_key: Optional[str], model_name: str, prompt: str, content: str) -> str:
+        """
+        Gera a resposta de texto para [prompt, content] com a chave informada. Respostas já obtidas
+        vêm do cache; se um pedido idêntico estiver em andamento (de qualquer sessão), aguarda o
+        resultado dele em vez de repetir a chamada.
+        """
+        key = response_key(model_name, prompt, content)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached.decode("utf-8")
+                future = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+                self.coalesced += 1
+        if not owner:
+            logger.info(f"Pedido idêntico ao {model_name} em andamento; aguardando a mesma resposta.")
+            return future.result()
+
+        try:
+            response = self.model(api_key, model_name).generate_content([prompt, content])
+            text = response.text
+            self.cache.set(key, text.encode("utf-8"))
+            with self._lock:
+                self.calls += 1
+            future.set_result(text)
+            return text
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        """Retorna as métricas do cache de respostas e das chamadas efetivamente feitas."""
+        stats = self.cache.stats()
+        stats.update({"calls": self.calls, "coalesced": self.coalesced})
+        return stats
+
+class KeyedLLMGateway:
+    """Gateway compartilhado usado com a chave da API de uma sessão."""
+
+    def __init__(self, gateway: LLMGateway, api_key: Optional[str]):
+        self.gateway = gateway
+        self.api_key = api_key
+
+    @property
+    def client(self) -> Any:
+        return self.gateway.client(self.api_key)
+
+    def model(self, model_name: str) -> Any:
+        return self.gateway.model(self.api_key, model_name)
+
+    def generate(self, model_name: str, prompt: str, content: str) -> str:
+        return self.gateway.generate(self.api_key, model_name, prompt, content)
+
+    def stats(self) -> Dict[str, float]:
+        return self.gateway.stats()
+
+_gateway_lock = threading.Lock()
+_shared_gateway: Optional[LLMGateway] = None
+
+def get_llm_gateway() -> LLMGateway:
+    """Retorna o gateway compartilhado pelo processo (criado sob demanda)."""
+    global _shared_gateway
+    with _gateway_lock:
+        if _shared_gateway is None:
+            _shared_gateway = LLMGateway()
+            logger.info(f"Cache de respostas do LLM aberto em {LLM_RESPONSE_CACHE_PATH}.")
+        return _shared_gateway
@@ -0,0 +1,118 @@
+# Backend do visualizador de PDF: renderização de páginas sob demanda
+import io
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple, Union
+
+import pdfplumber
+
+from config import (
+    logger,
+    PDF_VIEWER_MIN_DPI,
+    PDF_VIEWER_MAX_DPI,
+    PDF_VIEWER_DPI_STEP,
+    PDF_VIEWER_PIXEL_RATIO,
+    PDF_VIEWER_PLACEHOLDER_DPI,
+    PDF_VIEWER_CACHE_PAGES
+)
+from render_cache import content_hash, get_render_cache, page_content_hashes
+
+def dpi_for_width(page_width_points: float, width_px: int) -> int:
+    """
+    Calcula a resolução necessária para exibir a página com width_px pixels de largura.
+    O valor é arredondado para cima em múltiplos de PDF_VIEWER_DPI_STEP para aumentar os acertos de cache.
+    """
+    dpi = width_px * PDF_VIEWER_PIXEL_RATIO * 72 / page_width_points
+    dpi = math.ceil(dpi / PDF_VIEWER_DPI_STEP) * PDF_VIEWER_DPI_STEP
+    return int(min(max(dpi, PDF_VIEWER_MIN_DPI), PDF_VIEWER_MAX_DPI))
+
+class LazyPDFDocument:
+    """
+    Documento exibido no visualizador. Guarda apenas os bytes do PDF e renderiza somente as
+    páginas visíveis, na resolução exigida pelo zoom, mantendo um pequeno LRU de páginas prontas
+    (cache_pages=None guarda uma imagem por página do documento). Páginas ausentes do LRU vêm do cache em disco compartilhado
+    entre sessões, e o intervalo seguinte é renderizado antecipadamente em segundo plano.
+    Com track_page_changes, as páginas são identificadas pelo hash do seu conteúdo: uma nova versão
+    do documento (após recompilar) herda as imagens das páginas inalteradas da versão anterior
+    (previous) e renderiza apenas as que mudaram.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        data: bytes,
+        cache_pages: Optional[int] = PDF_VIEWER_CACHE_PAGES,
+        track_page_changes: bool = False,
+        previous: Optional["LazyPDFDocument"] = None
+    ):
+        self.name = name
+        self.data = data
+        self.cache_pages = cache_pages
+        self._cache: "OrderedDict[Tuple[Union[int, str], int], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.content_hash = content_hash(data)
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            self.page_widths = [float(page.width) for page in pdf.pages]
+        self.page_count = len(self.page_widths)
+        self.page_hashes = page_content_hashes(data) if track_page_changes else None
+        if self.page_hashes is not None and previous is not None and previous.page_hashes is not None:
+            current = set(self.page_hashes)
+            with previous._lock:
+                inherited = [(key, image) for key, image in previous._cache.items() if key[0] in current]
+            self._cache.update(inherited)
+            logger.info(f"'{name}': {len(inherited)} imagens de páginas inalteradas reaproveitadas da versão anterior.")
+
+    def _requests(self, start: int, end: int, width_px: int) -> List[Tuple[int, int]]:
+        return [
+            (page_index, dpi_for_width(self.page_widths[page_index], width_px))
+            for page_index in range(max(start, 0), min(end, self.page_count))
+        ]
+
+    def _memory_key(self, request: Tuple[int, int]) -> Tuple[Union[int, str], int]:
+        page_index, dpi = request
+        return (self.page_hashes[page_index], dpi) if self.page_hashes is not None else request
+
+    def render_pages(self, start: int, end: int, width_px: int, placeholder: bool = False) -> List[Any]:
+        """
+        Retorna as imagens das páginas [start, end), renderizando apenas as que não estão em cache.
+        Com placeholder, não espera a rasterização: as páginas ausentes voltam em
+        PDF_VIEWER_PLACEHOLDER_DPI enquanto são renderizadas em segundo plano (ver pending).
+        """
+        requests = self._requests(start, end, width_px)
+        keys = [self._memory_key(request) for request in requests]
+        render_cache = get_render_cache()
+        provisional = {}
+        with self._lock:
+            missing = [request for request, key in zip(requests, keys) if key not in self._cache]
+            if missing:
+                if placeholder:
+                    rendered = render_cache.get_or_placeholder(
+                        self.data, self.content_hash, missing, self.page_hashes, PDF_VIEWER_PLACEHOLDER_DPI
+                    )
+                else:
+                    rendered = [(image, True) for image in render_cache.get_or_render(self.data, self.content_hash, missing, self.page_hashes)]
+                # As imagens provisórias não entram no LRU: a próxima chamada busca as definitivas
+                for request, (image, final) in zip(missing, rendered):
+                    if final:
+                        self._cache[self._memory_key(request)] = image
+                    else:
+                        provisional[self._memory_key(request)] = image
+                logger.info(f"{len(missing)} páginas de '{self.name}' carregadas sob demanda ({len(provisional)} provisórias).")
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+            images = [provisional[key] if key in provisional else self._cache[key] for key in keys]
+            limit = self.cache_pages if self.cache_pages is not None else self.page_count
+            while len(self._cache) > limit:
+                self._cache.popitem(last=False)
+        render_cache.prefetch(self.data, self.content_hash, self._requests(end, 2 * end - start, width_px), self.page_hashes)
+        return images
+
+    def pending(self, start: int, end: int, width_px: int) -> bool:
+        """Indica se alguma página de [start, end) exibida como provisória ainda está sendo renderizada."""
+        with self._lock:
+            missing = [
+                request for request in self._requests(start, end, width_px) if self._memory_key(request) not in self._cache
+            ]
+        return bool(missing) and get_render_cache().rendering(self.content_hash, missing, self.page_hashes)
@@ -1,98 +1,442 @@
 # Núcleo de lógica RAG para PDFs
 import os
+import shutil
+import hashlib
 import tempfile
+import time
 import logging
-from typing import List, Optional
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 import streamlit as st
 
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain.prompts import ChatPromptTemplate, PromptTemplate
+from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain.retrievers.multi_query import MultiQueryRetriever
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnablePassthrough
 import google.generativeai as genai
 
 from config import (
     logger,
-    PERSIST_DIRECTORY,
     GEMINI_MODEL_NAME,
     EMBEDDING_MODEL,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
-    RAG_QUERY_PROMPT_TEMPLATE,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_PENDING_BATCHES,
+    INGESTION_PAGE_WINDOW,
+    PDF_EXTRACTION_WORKERS,
+    RAG_CHAIN_CACHE_MAX_ENTRIES,
+    RAG_RETRIEVAL_MODE,
+    RAG_RETRIEVAL_TOP_K,
     RAG_ANSWER_PROMPT_TEMPLATE
 )
+from answer_cache import get_answer_cache
+from embedding_cache import CachedEmbeddings
+from ingestion import (
+    Chunk,
+    embed_batches,
+    extraction_executor,
+    iter_batches,
+    iter_pdf_page_windows,
+    upsert_embedded
+)
+from lexical_index import drop_lexical_index, get_lexical_index, sync_lexical_index, unload_lexical_index
+from pdf_extraction import count_pages
+from retrieval import build_retriever, takes_lexical_fast_path
+from vector_store import VectorStoreLease, VectorStoreManager, get_vector_store_manager
+from vector_gc import start_background_gc
+
+# Callback de progresso da ingestão: (páginas processadas, total de páginas)
+ProgressCallback = Callable[[int, int], None]
+
+# Cache de cadeias RAG compartilhado por todas as sessões do processo, chaveado por
+# (nome da coleção, configuração do LLM, credencial do LLM, modo de recuperação), com despejo LRU
+_chain_cache: "OrderedDict[Tuple[str, tuple, str, str], Runnable]" = OrderedDict()
+_chain_cache_lock = threading.Lock()
+
+def _llm_config_key(llm) -> tuple:
+    """Identifica a configuração do LLM que influencia a cadeia (classe, modelo e temperatura)."""
+    return (type(llm).__name__, getattr(llm, "model", None), getattr(llm, "temperature", None))
+
+def _llm_credential_key(llm) -> str:
+    """
+    Hash da chave da API do LLM. A cadeia guarda a instância do LLM que a construiu; sem a
+    credencial na chave do cache, a sessão de um usuário responderia com a chave de outro.
+    """
+    api_key = getattr(llm, "google_api_key", None)
+    if api_key is None:
+        return ""
+    if hasattr(api_key, "get_secret_value"):
+        api_key = api_key.get_secret_value()
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+def invalidate_chain_cache(collection_name: Optional[str] = None) -> None:
+    """Descarta as cadeias em cache de uma coleção (ou de todas, se nenhuma for informada)."""
+    with _chain_cache_lock:
+        for key in [key for key in _chain_cache if collection_name is None or key[0] == collection_name]:
+            del _chain_cache[key]
+    logger.info(f"Cache de cadeias RAG invalidado ({collection_name or 'todas as coleções'}).")
+
+def _unload_collection(collection_name: str) -> None:
+    """Libera da memória as cadeias e o índice lexical de uma coleção fechada pelo gerenciador."""
+    invalidate_chain_cache(collection_name)
+    unload_lexical_index(collection_name)
+
+def _ingestion_fingerprint() -> str:
+    """Impressão digital das configurações que afetam o conteúdo e os embeddings dos chunks."""
+    settings = f"{EMBEDDING_MODEL}|{CHUNK_SIZE}|{CHUNK_OVERLAP}"
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()[:16]
+
+def _file_content_hash(file_upload) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo enviado, preservando a posição de leitura."""
+    file_upload.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: file_upload.read(1 << 20), b""):
+        digest.update(block)
+    file_upload.seek(0)
+    return digest.hexdigest()
+
+def _collection_name_for(file_hashes: Iterable[str], fingerprint: str) -> str:
+    """Gera um nome de coleção determinístico (estável entre processos) para um conjunto de arquivos."""
+    digest = hashlib.sha256(fingerprint.encode("utf-8"))
+    for file_hash in sorted(set(file_hashes)):
+        digest.update(file_hash.encode("utf-8"))
+    return f"pdfs_{digest.hexdigest()[:32]}"
+
+def _chunk_id(file_hash: str, fingerprint: str, index: int, content: str) -> str:
+    """ID endereçado por conteúdo de um chunk: o mesmo arquivo com as mesmas configurações gera os mesmos IDs."""
+    key = f"{file_hash}:{fingerprint}:{index}:{content}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def _collection_has_file(vector_db: Chroma, file_hash: str) -> bool:
+    """Verifica se os chunks de um arquivo já estão armazenados na coleção."""
+    result = vector_db.get(where={"file_hash": file_hash}, limit=1, include=["metadatas"])
+    return bool(result["ids"])
+
+def _copy_file_from_other_collections(
+    vector_stores: VectorStoreManager,
+    vector_db: Chroma,
+    file_hash: str,
+    fingerprint: str
+) -> bool:
+    """
+    Reaproveita os embeddings de um arquivo já ingerido em outra coleção de PERSIST_DIRECTORY. A
+    coleção de origem vem do catálogo (hash do arquivo -> coleção), de modo que só é lida uma coleção
+    que contém o arquivo, e só os chunks dele, que a sessão também enviou. Coleções anteriores ao
+    catálogo não são consultadas. Retorna True se os chunks foram copiados, evitando a leitura do PDF
+    e novas chamadas de embedding.
+    """
+    client = vector_db._client
+    where = {"$and": [{"file_hash": file_hash}, {"ingest_fingerprint": fingerprint}]}
+    for name in vector_stores.collections_with_file(file_hash, fingerprint):
+        if name == vector_db._collection.name:
+            continue
+        try:
+            source = client.get_collection(name)
+        except Exception as e:
+            # Coleção removida desde o registro: a linha do catálogo deixa de valer
+            logger.warning(f"Coleção {name} do catálogo indisponível ({e}); ignorando.")
+            vector_stores.catalog.forget(name)
+            continue
+        stored = source.get(where=where, include=["embeddings", "documents", "metadatas"])
+        if stored["ids"]:
+            vector_db._collection.upsert(
+                ids=stored["ids"],
+                embeddings=stored["embeddings"],
+                documents=stored["documents"],
+                metadatas=stored["metadatas"],
+            )
+            logger.info(f"{len(stored['ids'])} chunks do arquivo {file_hash[:12]} reaproveitados da coleção {name}.")
+            return True
+    return False
 
 class RAGCore:
     """Encapsula a lógica de RAG (Retrieval Augmented Generation)."""
 
     def __init__(self, llm: ChatGoogleGenerativeAI):
         self.llm = llm
+        # Embedder com cache em disco, usado tanto na ingestão quanto no retriever
+        self.embeddings = CachedEmbeddings(OllamaEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
+        # Cliente Chroma e coleções compartilhados por todas as sessões do processo
+        self.vector_stores = get_vector_store_manager()
+        self.vector_stores.add_eviction_listener(_unload_collection)
+        # Remoção periódica de coleções antigas e segmentos órfãos em data/vectors
+        start_background_gc()
+
+    def create_vector_db_from_files(
+        self,
+        file_uploads: List[st.runtime.uploaded_file_manager.UploadedFile],
+        progress_callback: Optional[ProgressCallback] = None,
+        tenant: str = ""
+    ) -> Optional[VectorStoreLease]:
+        """
+        Cria ou reutiliza um banco de dados vetorial a partir dos arquivos PDF enviados e registra o
+        inquilino (tenant) como dono da coleção. Retorna o uso da coleção: lease.vector_db é o banco
+        vetorial, compartilhado com as demais sessões e inquilinos que enviarem os mesmos arquivos.
 
-    def create_vector_db_from_files(self, file_uploads: List[st.runtime.uploaded_file_manager.UploadedFile]) -> Optional[Chroma]:
-        """Cria ou carrega um banco de dados vetorial a partir dos arquivos PDF enviados."""
+        A ingestão é endereçada por conteúdo: o nome da coleção e os IDs dos chunks derivam do
+        SHA-256 dos arquivos e das configurações de chunking/embedding. Arquivos já ingeridos em
+        PERSIST_DIRECTORY não são lidos novamente e apenas chunks novos são embedados.
+        """
         logger.info("Iniciando a criação do banco de dados vetorial.")
-        all_docs = []
+        fingerprint = _ingestion_fingerprint()
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                for file_upload in file_uploads:
-                    temp_path = os.path.join(temp_dir, file_upload.name)
-                    with open(temp_path, "wb") as f:
-                        f.write(file_upload.read())
-                    loader = PyPDFLoader(temp_path)
-                    all_docs.extend(loader.load())
-
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-                chunks = text_splitter.split_documents(all_docs)
-
-                if not chunks:
-                    st.warning("Nenhum texto pôde ser extraído dos PDFs. Verifique os arquivos.")
-                    return None
-
-                embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-                
-                # Criar um nome de coleção único baseado nos nomes e tamanhos dos arquivos
-                collection_name = f"pdfs_{hash(tuple((f.name, f.size) for f in file_uploads))}"
-
-                vector_db = Chroma.from_documents(
-                    documents=chunks,
-                    embedding=embeddings,
-                    persist_directory=PERSIST_DIRECTORY,
-                    collection_name=collection_name
-                )
-                logger.info("Banco de dados vetorial criado com sucesso.")
-                return vector_db
+            file_hashes = [_file_content_hash(file_upload) for file_upload in file_uploads]
+            lease = self.vector_stores.open(_collection_name_for(file_hashes, fingerprint), self.embeddings, tenant)
+            vector_db = lease.vector_db
+            collection_name = lease.name
+
+            pending_files = []
+            seen_hashes = set()
+            for file_upload, file_hash in zip(file_uploads, file_hashes):
+                if file_hash in seen_hashes:
+                    continue
+                seen_hashes.add(file_hash)
+                if _collection_has_file(vector_db, file_hash):
+                    logger.info(f"Arquivo '{file_upload.name}' já ingerido na coleção {collection_name}.")
+                elif not _copy_file_from_other_collections(self.vector_stores, vector_db, file_hash, fingerprint):
+                    pending_files.append((file_upload, file_hash))
+
+            if pending_files:
+                self._ingest_files(vector_db, pending_files, fingerprint, progress_callback)
+
+            if vector_db._collection.count() == 0:
+                lease.release()
+                self.delete_vector_db(vector_db)
+                st.warning("Nenhum texto pôde ser extraído dos PDFs. Verifique os arquivos.")
+                return None
+
+            # Inclui os arquivos que já estavam na coleção, para as coleções anteriores ao catálogo
+            self.vector_stores.record_files(collection_name, seen_hashes, fingerprint)
+            sync_lexical_index(vector_db)
+
+            logger.info(f"Banco de dados vetorial pronto (coleção {collection_name}).")
+            return lease
         except Exception as e:
             st.error(f"Erro ao criar o banco de dados vetorial: {e}")
             logger.error(f"Falha na criação do Vector DB: {e}", exc_info=True)
             return None
 
-    def process_question(self, question: str) -> str:
-        """Processa uma pergunta usando a cadeia RAG."""
-        if st.session_state.vector_db is None:
-            return "O sistema não está pronto. Por favor, faça o upload de PDFs e verifique a API Key."
-        
-        logger.info(f"Processando pergunta: {question}")
-        
-        query_prompt = PromptTemplate(input_variables=["question"], template=RAG_QUERY_PROMPT_TEMPLATE)
-        
-        retriever = MultiQueryRetriever.from_llm(
-            st.session_state.vector_db.as_retriever(), self.llm, prompt=query_prompt
+    def _ingest_files(
+        self,
+        vector_db: Chroma,
+        pending_files: List[tuple],
+        fingerprint: str,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> None:
+        """
+        Extrai, divide e embeda apenas os chunks ainda ausentes na coleção, em fluxo contínuo:
+        página -> chunks -> embeddings -> upsert, uma janela de INGESTION_PAGE_WINDOW páginas por vez.
+        A extração de texto é distribuída entre PDF_EXTRACTION_WORKERS processos.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_paths = []
+            for file_upload, file_hash in pending_files:
+                temp_path = os.path.join(temp_dir, f"{file_hash}.pdf")
+                file_upload.seek(0)
+                with open(temp_path, "wb") as f:
+                    shutil.copyfileobj(file_upload, f, 1 << 20)
+                file_upload.seek(0)
+                pdf_paths.append(temp_path)
+            total_pages = sum(count_pages(pdf_path) for pdf_path in pdf_paths)
+
+            with extraction_executor(PDF_EXTRACTION_WORKERS) as executor:
+                chunks = self._iter_new_chunks(
+                    vector_db, pending_files, pdf_paths, fingerprint, executor, total_pages, progress_callback
+                )
+                written = self._embed_and_upsert(vector_db, chunks)
+        logger.info(f"{written} chunks novos embedados e gravados ({total_pages} páginas lidas).")
+
+    def _iter_new_chunks(
+        self,
+        vector_db: Chroma,
+        pending_files: List[tuple],
+        pdf_paths: List[str],
+        fingerprint: str,
+        executor,
+        total_pages: int,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Iterator[Chunk]:
+        """Gera (id, chunk) dos arquivos pendentes, pulando os chunks que já estão na coleção."""
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        pages_done = 0
+        chunk_index = {}
+        windows = iter_pdf_page_windows(
+            pdf_paths, INGESTION_PAGE_WINDOW, executor, max_pending=2 * max(PDF_EXTRACTION_WORKERS, 1)
+        )
+        for file_index, pages in windows:
+            file_upload, file_hash = pending_files[file_index]
+            window = []
+            # split_documents divide cada página isoladamente, então o resultado por janela
+            # é idêntico ao de dividir o documento inteiro de uma vez
+            for chunk in text_splitter.split_documents(pages):
+                chunk.metadata.update(
+                    source=file_upload.name,
+                    file_hash=file_hash,
+                    ingest_fingerprint=fingerprint
+                )
+                index = chunk_index.get(file_index, 0)
+                window.append((_chunk_id(file_hash, fingerprint, index, chunk.page_content), chunk))
+                chunk_index[file_index] = index + 1
+
+            if window:
+                existing_ids = set(vector_db.get(ids=[chunk_id for chunk_id, _ in window], include=["metadatas"])["ids"])
+                yield from (item for item in window if item[0] not in existing_ids)
+
+            pages_done += len(pages)
+            if progress_callback:
+                progress_callback(pages_done, total_pages)
+
+    def _embed_and_upsert(self, vector_db: Chroma, chunks: Iterable[Chunk]) -> int:
+        """
+        Estágio de embedding da ingestão: embeda (id, chunk) em lotes de EMBEDDING_BATCH_SIZE com
+        até EMBEDDING_MAX_CONCURRENCY requisições simultâneas e grava cada lote assim que fica pronto.
+        Os chunks são consumidos sob demanda, então a memória fica limitada aos lotes em voo.
+        """
+        written = 0
+        batches = iter_batches(chunks, EMBEDDING_BATCH_SIZE)
+        for batch, vectors in embed_batches(
+            self.embeddings, batches, EMBEDDING_MAX_CONCURRENCY, EMBEDDING_MAX_PENDING_BATCHES
+        ):
+            upsert_embedded(vector_db, batch, vectors)
+            written += len(batch)
+        return written
+
+    def delete_vector_db(self, vector_db: Chroma) -> bool:
+        """
+        Remove a coleção do banco vetorial, seu índice lexical e as cadeias e respostas que dependiam
+        dela, se nenhuma outra sessão a estiver usando. Retorna True se ela foi removida.
+        """
+        return self._delete_collection(vector_db._collection.name)
+
+    def _delete_collection(self, collection_name: str) -> bool:
+        if not self.vector_stores.delete_if_unused(collection_name):
+            logger.info(f"Coleção {collection_name} ainda em uso; fica para a coleta de lixo.")
+            return False
+        invalidate_chain_cache(collection_name)
+        get_answer_cache().invalidate(collection_name)
+        drop_lexical_index(collection_name)
+        return True
+
+    def delete_tenant_data(self, tenant: str) -> int:
+        """
+        Retira o inquilino de todas as suas coleções e remove (com o que depende delas) as que
+        ficaram sem dono e sem sessões abertas; as usadas por outros inquilinos ficam intactas.
+        """
+        removed = sum(self._delete_collection(name) for name in self.vector_stores.release_tenant(tenant))
+        logger.info(f"Base de dados do inquilino liberada: {removed} coleções removidas.")
+        return removed
+
+    def _collection_fingerprint(self, vector_db: Chroma) -> str:
+        """
+        Identifica o conteúdo da coleção e o LLM que responde. O nome da coleção já é endereçado
+        por conteúdo; a contagem de chunks muda se documentos forem adicionados a ela.
+        """
+        collection = vector_db._collection
+        llm_key = hashlib.sha256(repr(_llm_config_key(self.llm)).encode("utf-8")).hexdigest()[:12]
+        return f"{collection.name}:{collection.count()}:{llm_key}"
+
+    def _get_chain(self, vector_db: Chroma) -> Runnable:
+        """Retorna a cadeia RAG compilada para a coleção, construindo-a apenas na primeira vez."""
+        key = (
+            vector_db._collection.name, _llm_config_key(self.llm), _llm_credential_key(self.llm), RAG_RETRIEVAL_MODE
         )
-        
+        with _chain_cache_lock:
+            chain = _chain_cache.get(key)
+            if chain is not None:
+                _chain_cache.move_to_end(key)
+                return chain
+
+        # Construída fora do lock: o retriever híbrido sincroniza o índice lexical, e uma construção
+        # lenta não pode bloquear as demais sessões. Se outra sessão terminar antes, vale a dela
+        retriever = build_retriever(vector_db, self.llm, RAG_RETRIEVAL_MODE)
         answer_prompt = ChatPromptTemplate.from_template(RAG_ANSWER_PROMPT_TEMPLATE)
-        
         chain = (
             {"context": retriever, "question": RunnablePassthrough()}
             | answer_prompt
             | self.llm
             | StrOutputParser()
         )
-        
-        response = chain.invoke(question)
+
+        with _chain_cache_lock:
+            existing = _chain_cache.get(key)
+            if existing is not None:
+                _chain_cache.move_to_end(key)
+                return existing
+            _chain_cache[key] = chain
+            while len(_chain_cache) > RAG_CHAIN_CACHE_MAX_ENTRIES:
+                _chain_cache.popitem(last=False)
+        logger.info(f"Cadeia RAG compilada para a coleção {key[0]} (recuperação '{RAG_RETRIEVAL_MODE}').")
+        return chain
+
+    def _answer_cache_embedding(self, vector_db: Chroma, question: str) -> Optional[List[float]]:
+        """
+        Embedding da pergunta para o cache de respostas. Quando a recuperação híbrida vai responder
+        pelo caminho rápido lexical, retorna None: o cache compara só o texto da pergunta e a
+        pergunta inteira é respondida sem nenhuma chamada de embedding.
+        """
+        if RAG_RETRIEVAL_MODE == "hybrid":
+            hits = get_lexical_index(vector_db).search(question, RAG_RETRIEVAL_TOP_K)
+            if takes_lexical_fast_path(hits):
+                return None
+        return self.embeddings.embed_query(question)
+
+    def process_question(self, question: str, vector_db: Optional[Chroma] = None) -> str:
+        """Processa uma pergunta usando a cadeia RAG (compilada uma vez por coleção e compartilhada entre sessões)."""
+        if vector_db is None:
+            vector_db = st.session_state.get("vector_db")
+        if vector_db is None:
+            return "O sistema não está pronto. Por favor, faça o upload de PDFs e verifique a API Key."
+
+        logger.info(f"Processando pergunta: {question}")
+        fingerprint = self._collection_fingerprint(vector_db)
+        question_embedding = self._answer_cache_embedding(vector_db, question)
+        cached = get_answer_cache().lookup(fingerprint, question, question_embedding)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        response = self._get_chain(vector_db).invoke(question)
+        get_answer_cache().store(fingerprint, question, question_embedding, response, time.perf_counter() - start)
         logger.info("Resposta gerada pela cadeia RAG.")
-        return response
\ No newline at end of file
+        return response
+
+    def stream_question(self, question: str, vector_db: Optional[Chroma] = None) -> Iterator[str]:
+        """
+        Versão em streaming de process_question: gera os tokens da resposta à medida que o LLM os produz.
+        Registra separadamente o tempo até o primeiro token e a latência total.
+        """
+        if vector_db is None:
+            vector_db = st.session_state.get("vector_db")
+        if vector_db is None:
+            yield "O sistema não está pronto. Por favor, faça o upload de PDFs e verifique a API Key."
+            return
+
+        logger.info(f"Processando pergunta (streaming): {question}")
+        fingerprint = self._collection_fingerprint(vector_db)
+        question_embedding = self._answer_cache_embedding(vector_db, question)
+        cached = get_answer_cache().lookup(fingerprint, question, question_embedding)
+        if cached is not None:
+            yield cached
+            return
+
+        start = time.perf_counter()
+        time_to_first_token = None
+        tokens = []
+        for token in self._get_chain(vector_db).stream(question):
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+                logger.info(f"Primeiro token da resposta em {time_to_first_token:.2f}s.")
+            tokens.append(token)
+            yield token
+        total_latency = time.perf_counter() - start
+        get_answer_cache().store(fingerprint, question, question_embedding, "".join(tokens), total_latency)
+        logger.info(
+            f"Resposta transmitida pela cadeia RAG em {total_latency:.2f}s "
+            f"(primeiro token em {time_to_first_token or 0:.2f}s)."
+        )
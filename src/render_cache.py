@@ -0,0 +1,287 @@
+# Cache em disco de páginas de PDF renderizadas, compartilhado entre sessões
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import pdfplumber
+import PyPDF2
+from PIL import Image
+
+from config import (
+    logger,
+    RENDER_CACHE_DIRECTORY,
+    RENDER_CACHE_MAX_BYTES,
+    RENDER_CACHE_FORMAT,
+    RENDER_CACHE_QUALITY,
+    RENDER_CACHE_WORKERS
+)
+
+# Origem do PDF: bytes em memória ou caminho em disco
+PDFSource = Union[bytes, str]
+# Pedido de renderização: (índice da página, DPI)
+PageRequest = Tuple[int, int]
+
+# O PDFium (usado pelo pdfplumber para rasterizar) não é thread-safe
+_pdfium_lock = threading.Lock()
+
+def content_hash(source: PDFSource) -> str:
+    """SHA-256 do conteúdo de um PDF em memória ou em disco."""
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _page_fingerprint(page) -> str:
+    """
+    Hash do que determina a aparência de uma página: fluxo de conteúdo, dimensões, rotação, fontes
+    (sem o prefixo de subconjunto, que muda quando qualquer página usa um glifo novo) e imagens.
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    digest.update(repr(([float(value) for value in page.mediabox], page.get("/Rotate", 0))).encode())
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else {}
+    fonts = resources.get("/Font")
+    for font_name, font in sorted((fonts.get_object() if fonts is not None else {}).items()):
+        base_font = str(font.get_object().get("/BaseFont", ""))
+        digest.update(f"{font_name}={base_font.split('+')[-1]};".encode())
+    xobjects = resources.get("/XObject")
+    for xobject_name, xobject in sorted((xobjects.get_object() if xobjects is not None else {}).items()):
+        digest.update(xobject_name.encode())
+        digest.update(xobject.get_object().get_data())
+    return digest.hexdigest()
+
+def page_content_hashes(source: PDFSource) -> List[str]:
+    """Hash do conteúdo de cada página; páginas que não mudaram entre duas compilações mantêm o hash."""
+    reader = PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    return [_page_fingerprint(page) for page in reader.pages]
+
+def render_pages(source: PDFSource, requests: Sequence[PageRequest]) -> List[Any]:
+    """
+    Rasteriza as páginas pedidas abrindo o PDF uma única vez. O lock do PDFium é tomado a cada
+    página, para que uma renderização em segundo plano não segure as demais por um lote inteiro.
+    """
+    images = []
+    with pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source) as pdf:
+        for page_index, dpi in requests:
+            with _pdfium_lock:
+                images.append(pdf.pages[page_index].to_image(resolution=dpi).original)
+    return images
+
+class RenderCache:
+    """
+    Armazena páginas renderizadas como imagens comprimidas em disco, chaveadas por
+    (hash do conteúdo do PDF, página, DPI), com orçamento de tamanho e despejo LRU pela data
+    de último acesso. A codificação e gravação das imagens, a renderização de páginas
+    antecipadas e o despejo rodam em um pool de threads em segundo plano.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, image_format: str = "WEBP", quality: int = 90, workers: int = 2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.image_format = image_format.upper()
+        self.quality = quality
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, int, int], Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, pdf_hash: str, page_index: int, dpi: int) -> str:
+        extension = "webp" if self.image_format == "WEBP" else "png"
+        return os.path.join(self.directory, pdf_hash[:2], f"{pdf_hash}_{page_index}_{dpi}.{extension}")
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, pdf_hash: str, page_index: int, dpi: int) -> Optional[Any]:
+        """Lê uma página do cache em disco, marcando-a como usada recentemente."""
+        path = self._path(pdf_hash, page_index, dpi)
+        try:
+            with Image.open(path) as image:
+                image.load()
+            os.utime(path)
+        except (FileNotFoundError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return image
+
+    def _put(self, pdf_hash: str, page_index: int, dpi: int, image: Any) -> None:
+        path = self._path(pdf_hash, page_index, dpi)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        buffer = io.BytesIO()
+        try:
+            image.save(buffer, format=self.image_format, quality=self.quality)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Página {page_index} não pôde ser gravada no cache de renderização: {e}")
+            return
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temp_path, path)
+        with self._lock:
+            self._total_bytes += buffer.tell()
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove as imagens acessadas há mais tempo até ficar em 90% do orçamento."""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._total_bytes = total
+        logger.info(f"Cache de renderização: {removed} imagens despejadas ({total / 2**20:.1f} MiB em uso).")
+
+    @staticmethod
+    def _key(pdf_hash: str, request: PageRequest, page_hashes: Optional[Sequence[str]]) -> Tuple[str, int, int]:
+        """Identidade da imagem no cache: pela página do PDF ou, com page_hashes, pelo conteúdo da página."""
+        page_index, dpi = request
+        return (page_hashes[page_index], 0, dpi) if page_hashes is not None else (pdf_hash, page_index, dpi)
+
+    def get_or_render(
+        self, source: PDFSource, pdf_hash: str, requests: Sequence[PageRequest], page_hashes: Optional[Sequence[str]] = None
+    ) -> List[Any]:
+        """
+        Retorna as páginas pedidas, lendo do disco quando possível e renderizando as ausentes.
+        As páginas novas são gravadas no cache em segundo plano. Com page_hashes (ver
+        page_content_hashes), páginas inalteradas de uma nova versão do PDF reaproveitam as imagens da anterior.
+        Bloqueia até todas as páginas estarem prontas; o visualizador usa get_or_placeholder.
+        """
+        images: Dict[PageRequest, Any] = {}
+        missing = []
+        for request in requests:
+            image = self.get(*self._key(pdf_hash, request, page_hashes))
+            if image is None:
+                missing.append(request)
+            else:
+                images[request] = image
+        if missing:
+            for request, image in zip(missing, render_pages(source, missing)):
+                images[request] = image
+                self._executor.submit(self._put, *self._key(pdf_hash, request, page_hashes), image)
+        return [images[request] for request in requests]
+
+    def _render_and_put(
+        self, source: PDFSource, pdf_hash: str, requests: Sequence[PageRequest], page_hashes: Optional[Sequence[str]]
+    ) -> None:
+        # Grava na própria thread: a imagem já está em disco quando a página deixa de constar em _inflight
+        for request, image in zip(requests, render_pages(source, requests)):
+            self._put(*self._key(pdf_hash, request, page_hashes), image)
+
+    def get_or_placeholder(
+        self,
+        source: PDFSource,
+        pdf_hash: str,
+        requests: Sequence[PageRequest],
+        page_hashes: Optional[Sequence[str]] = None,
+        placeholder_dpi: int = 48
+    ) -> List[Tuple[Any, bool]]:
+        """
+        Versão não bloqueante de get_or_render: as páginas ausentes do disco são renderizadas no
+        pool e, enquanto isso, retornadas em placeholder_dpi (uma fração do custo da resolução pedida).
+        Retorna (imagem, definitiva) para cada página; rendering() informa quando as definitivas ficam prontas.
+        """
+        images: Dict[PageRequest, Tuple[Any, bool]] = {}
+        missing = []
+        for request in requests:
+            image = self.get(*self._key(pdf_hash, request, page_hashes))
+            if image is not None:
+                images[request] = (image, True)
+            elif request[1] <= placeholder_dpi:
+                images[request] = (self.get_or_render(source, pdf_hash, [request], page_hashes)[0], True)
+            else:
+                missing.append(request)
+        if missing:
+            placeholders = [(page_index, placeholder_dpi) for page_index, _ in missing]
+            for request, image in zip(missing, self.get_or_render(source, pdf_hash, placeholders, page_hashes)):
+                images[request] = (image, False)
+            self.prefetch(source, pdf_hash, missing, page_hashes)
+        return [images[request] for request in requests]
+
+    def rendering(self, pdf_hash: str, requests: Sequence[PageRequest], page_hashes: Optional[Sequence[str]] = None) -> bool:
+        """Indica se alguma das páginas ainda está sendo renderizada em segundo plano."""
+        with self._lock:
+            return any(self._key(pdf_hash, request, page_hashes) in self._inflight for request in requests)
+
+    def prefetch(
+        self, source: PDFSource, pdf_hash: str, requests: Sequence[PageRequest], page_hashes: Optional[Sequence[str]] = None
+    ) -> None:
+        """Renderiza e grava em segundo plano páginas que provavelmente serão exibidas em seguida."""
+        with self._lock:
+            pending = [
+                request for request in requests
+                if self._key(pdf_hash, request, page_hashes) not in self._inflight
+                and not os.path.exists(self._path(*self._key(pdf_hash, request, page_hashes)))
+            ]
+            if not pending:
+                return
+            keys = [self._key(pdf_hash, request, page_hashes) for request in pending]
+            future = self._executor.submit(self._render_and_put, source, pdf_hash, pending, page_hashes)
+            for key in keys:
+                self._inflight[key] = future
+        future.add_done_callback(lambda _: self._forget(keys))
+
+    def _forget(self, keys: List[Tuple[str, int, int]]) -> None:
+        with self._lock:
+            for key in keys:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        """Retorna contadores de uso do cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "bytes": self._total_bytes,
+        }
+
+_cache_lock = threading.Lock()
+_shared_cache: Optional[RenderCache] = None
+
+def get_render_cache() -> RenderCache:
+    """Retorna o cache de renderização compartilhado pelo processo."""
+    global _shared_cache
+    with _cache_lock:
+        if _shared_cache is None:
+            _shared_cache = RenderCache(
+                RENDER_CACHE_DIRECTORY, RENDER_CACHE_MAX_BYTES, RENDER_CACHE_FORMAT, RENDER_CACHE_QUALITY, RENDER_CACHE_WORKERS
+            )
+        return _shared_cache
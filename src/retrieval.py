@@ -0,0 +1,201 @@
+# Estratégias de recuperação de documentos para a cadeia RAG
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from langchain.prompts import PromptTemplate
+from langchain.retrievers.multi_query import MultiQueryRetriever
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from config import (
+    logger,
+    RAG_QUERY_PROMPT_TEMPLATE,
+    RAG_RETRIEVAL_TOP_K,
+    RAG_ADAPTIVE_MIN_SCORE,
+    RAG_RRF_K,
+    RAG_RETRIEVAL_MAX_WORKERS,
+    RAG_HYBRID_LEXICAL_WEIGHT,
+    RAG_LEXICAL_FAST_PATH_COVERAGE,
+    RAG_LEXICAL_FAST_PATH_MARGIN
+)
+from lexical_index import LexicalHit, sync_lexical_index
+
+RETRIEVAL_MODES = ("multi", "direct", "parallel-multi", "adaptive", "hybrid")
+
+# Pool compartilhado para as buscas e a reescrita concorrentes
+_executor = ThreadPoolExecutor(max_workers=RAG_RETRIEVAL_MAX_WORKERS, thread_name_prefix="retrieval")
+
+def _doc_key(doc: Document) -> Tuple[str, str, str]:
+    return (doc.page_content, str(doc.metadata.get("source")), str(doc.metadata.get("page")))
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], top_k: int, k: int = RAG_RRF_K) -> List[Document]:
+    """Combina várias listas ordenadas de documentos pela fusão de posto recíproco (RRF)."""
+    scores: Dict[Tuple[str, str, str], float] = {}
+    docs: Dict[Tuple[str, str, str], Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ordered[:top_k]]
+
+def takes_lexical_fast_path(hits: List[LexicalHit]) -> bool:
+    """
+    Indica se os resultados lexicais bastam para responder sem busca vetorial: o melhor documento
+    cobre os termos discriminativos da consulta e está isolado (consultas por um identificador raro,
+    como \\hbar ou eq:energia). Frases comuns a muitos chunks empatam e seguem para a busca híbrida.
+    """
+    if not hits:
+        return False
+    best = hits[0]
+    runner_up = hits[1].score if len(hits) > 1 else 0.0
+    margin = 1 - runner_up / best.score if best.score > 0 else 0.0
+    return best.coverage >= RAG_LEXICAL_FAST_PATH_COVERAGE and margin >= RAG_LEXICAL_FAST_PATH_MARGIN
+
+class _StageTimer:
+    """Acumula a duração de cada estágio da recuperação para registro no log."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def record(self, stage: str, started_at: float) -> None:
+        self.stages[stage] = time.perf_counter() - started_at
+
+    def log(self) -> None:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages.items())
+        logger.info(f"Recuperação ({self.mode}) em {time.perf_counter() - self.start:.2f}s: {stages}.")
+
+class QueryRetriever:
+    """Implementa os modos de recuperação 'direct', 'parallel-multi', 'adaptive' e 'hybrid'."""
+
+    def __init__(self, vector_db, llm, mode: str, top_k: int = RAG_RETRIEVAL_TOP_K):
+        self.vector_db = vector_db
+        self.mode = mode
+        self.top_k = top_k
+        self.lexical_index = sync_lexical_index(vector_db) if mode == "hybrid" else None
+        query_prompt = PromptTemplate(input_variables=["question"], template=RAG_QUERY_PROMPT_TEMPLATE)
+        self.rewrite_chain = query_prompt | llm | StrOutputParser()
+
+    def _rewrite(self, question: str) -> Tuple[List[str], float]:
+        started_at = time.perf_counter()
+        output = self.rewrite_chain.invoke({"question": question})
+        variants = [line.strip() for line in output.split("\n") if line.strip()]
+        return variants, started_at
+
+    def _search(self, query: str) -> Tuple[List[Tuple[Document, float]], float]:
+        return self._search_with_k(query, self.top_k)
+
+    def _search_with_k(self, query: str, k: int) -> Tuple[List[Tuple[Document, float]], float]:
+        started_at = time.perf_counter()
+        return self.vector_db.similarity_search_with_relevance_scores(query, k=k), started_at
+
+    def _search_variants(self, variants: List[str], timer: _StageTimer) -> List[List[Document]]:
+        started_at = time.perf_counter()
+        futures = [_executor.submit(self._search, variant) for variant in variants]
+        rankings = [[doc for doc, _ in future.result()[0]] for future in futures]
+        timer.record("buscas das variantes", started_at)
+        return rankings
+
+    def _fuse(self, rankings: List[List[Document]], timer: _StageTimer) -> List[Document]:
+        started_at = time.perf_counter()
+        docs = reciprocal_rank_fusion(rankings, self.top_k)
+        timer.record("fusão RRF", started_at)
+        return docs
+
+    def _load_documents(self, doc_ids: List[str]) -> Dict[str, Document]:
+        """Lê os chunks do Chroma pelos IDs (sem calcular embeddings)."""
+        if not doc_ids:
+            return {}
+        stored = self.vector_db.get(ids=doc_ids, include=["documents", "metadatas"])
+        return {
+            doc_id: Document(page_content=text, metadata=metadata or {})
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        }
+
+    def _hybrid(self, question: str, timer: _StageTimer) -> List[Document]:
+        """
+        Combina BM25 e similaridade vetorial por soma ponderada das pontuações normalizadas (o BM25
+        relativo ao melhor resultado, multiplicado pela cobertura da consulta). Se o caminho rápido
+        lexical se aplicar, responde só com o índice lexical, sem nenhuma chamada de embedding.
+        """
+        started_at = time.perf_counter()
+        lexical = self.lexical_index.search(question, 2 * self.top_k)
+        timer.record("busca lexical", started_at)
+
+        if takes_lexical_fast_path(lexical):
+            logger.info(f"Caminho rápido lexical (cobertura {lexical[0].coverage:.2f}).")
+            top_ids = [hit.doc_id for hit in lexical[:self.top_k]]
+            documents = self._load_documents(top_ids)
+            return [documents[doc_id] for doc_id in top_ids if doc_id in documents]
+
+        vector_results, started_at = self._search_with_k(question, 2 * self.top_k)
+        timer.record("busca vetorial", started_at)
+
+        started_at = time.perf_counter()
+        scores: Dict[Tuple[str, str, str], float] = {}
+        docs: Dict[Tuple[str, str, str], Document] = {}
+        for doc, relevance in vector_results:
+            key = _doc_key(doc)
+            docs[key] = doc
+            scores[key] = (1 - RAG_HYBRID_LEXICAL_WEIGHT) * min(max(relevance, 0.0), 1.0)
+        lexical_docs = self._load_documents([hit.doc_id for hit in lexical])
+        for hit in lexical:
+            if hit.doc_id not in lexical_docs:
+                continue
+            key = _doc_key(lexical_docs[hit.doc_id])
+            docs.setdefault(key, lexical_docs[hit.doc_id])
+            lexical_score = hit.score / lexical[0].score * hit.coverage
+            scores[key] = scores.get(key, 0.0) + RAG_HYBRID_LEXICAL_WEIGHT * lexical_score
+        ordered = sorted(scores, key=scores.get, reverse=True)[:self.top_k]
+        timer.record("fusão híbrida", started_at)
+        return [docs[key] for key in ordered]
+
+    def invoke(self, question: str) -> List[Document]:
+        timer = _StageTimer(self.mode)
+        if self.mode == "hybrid":
+            docs = self._hybrid(question, timer)
+
+        elif self.mode == "direct":
+            results, started_at = self._search(question)
+            timer.record("busca direta", started_at)
+            docs = [doc for doc, _ in results]
+
+        elif self.mode == "parallel-multi":
+            rewrite_future = _executor.submit(self._rewrite, question)
+            direct_future = _executor.submit(self._search, question)
+            results, started_at = direct_future.result()
+            timer.record("busca direta", started_at)
+            variants, started_at = rewrite_future.result()
+            timer.record("reescrita", started_at)
+            rankings = [[doc for doc, _ in results]] + self._search_variants(variants, timer)
+            docs = self._fuse(rankings, timer)
+
+        else:  # adaptive
+            results, started_at = self._search(question)
+            timer.record("busca direta", started_at)
+            top_score = results[0][1] if results else 0.0
+            if top_score >= RAG_ADAPTIVE_MIN_SCORE:
+                docs = [doc for doc, _ in results]
+            else:
+                logger.info(f"Melhor pontuação direta {top_score:.2f} abaixo de {RAG_ADAPTIVE_MIN_SCORE}; reescrevendo a pergunta.")
+                variants, started_at = self._rewrite(question)
+                timer.record("reescrita", started_at)
+                rankings = [[doc for doc, _ in results]] + self._search_variants(variants, timer)
+                docs = self._fuse(rankings, timer)
+
+        timer.log()
+        return docs
+
+def build_retriever(vector_db, llm, mode: str) -> Runnable:
+    """Constrói o retriever da cadeia RAG para o modo de recuperação configurado."""
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Modo de recuperação desconhecido: {mode}. Use um de {RETRIEVAL_MODES}.")
+    if mode == "multi":
+        query_prompt = PromptTemplate(input_variables=["question"], template=RAG_QUERY_PROMPT_TEMPLATE)
+        return MultiQueryRetriever.from_llm(vector_db.as_retriever(), llm, prompt=query_prompt)
+    return RunnableLambda(QueryRetriever(vector_db, llm, mode).invoke)
@@ -1,63 +1,47 @@
-import os
+import io
 import tempfile
 import logging
 import PyPDF2
-import pdfplumber
-from typing import List, Any
+from typing import Iterator, List, Tuple, Union
 import base64
 
 from config import logger
 
-def extract_all_pages_as_images(file_uploads: List[Any]) -> List[Any]:
-    """Extrai todas as páginas dos PDFs enviados como imagens para exibição."""
-    logger.info(f"Extraindo páginas como imagens de {len(file_uploads)} arquivos.")
-    pdf_pages = []
-    for file_upload in file_uploads:
-        # O file_uploader reseta a posição do ponteiro, então é preciso resetá-lo
-        file_upload.seek(0)
-        with pdfplumber.open(file_upload) as pdf:
-            pdf_pages.extend([page.to_image(resolution=1080).original for page in pdf.pages])
-    logger.info("Extração de imagens concluída.")
-    return pdf_pages
-
-def extract_pages_as_images_from_path(pdf_path: str) -> List[Any]:
-    """Extrai todas as páginas de um PDF em um caminho local como imagens."""
-    if not os.path.exists(pdf_path):
-        logger.error(f"Arquivo PDF não encontrado em: {pdf_path}")
-        return []
-    
-    logger.info(f"Extraindo páginas como imagens de {pdf_path}")
-    pdf_pages = []
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # Usamos uma resolução um pouco menor para a visualização dinâmica
-            # para que a renderização seja mais rápida.
-            pdf_pages.extend([page.to_image(resolution=1080).original for page in pdf.pages])
-        logger.info("Extração de imagens do PDF compilado concluída.")
-    except Exception as e:
-        logger.error(f"Erro ao abrir PDF compilado com pdfplumber: {e}")
-
-    return pdf_pages
+def iter_pdf_blocks(source: Union[bytes, str], paginas_por_bloco: int = 30) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Divide um PDF em blocos de até 'paginas_por_bloco' páginas, sem gravar arquivos.
+    O PDF é lido uma única vez e cada página é copiada apenas para o seu bloco.
+    :param source: Bytes do PDF ou caminho do arquivo.
+    :param paginas_por_bloco: Número de páginas por bloco.
+    :return: Tuplas (primeira página, última página, bytes do bloco), numeradas a partir de 1 e em ordem.
+    """
+    leitor = PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    total_paginas = len(leitor.pages)
+    for inicio in range(0, total_paginas, paginas_por_bloco):
+        escritor = PyPDF2.PdfWriter()
+        fim = min(inicio + paginas_por_bloco, total_paginas)
+        for i in range(inicio, fim):
+            escritor.add_page(leitor.pages[i])
+        buffer = io.BytesIO()
+        escritor.write(buffer)
+        yield inicio + 1, fim, buffer.getvalue()
 
-def recortar_pdf_em_blocos(arquivo_entrada, paginas_por_bloco=30, prefixo_saida="recorte"):
+def recortar_pdf_em_blocos(arquivo_entrada, paginas_por_bloco=30, prefixo_saida="recorte") -> List[str]:
     """
     Divide um PDF em vários arquivos, cada um com até 'paginas_por_bloco' páginas.
     :param arquivo_entrada: Caminho do PDF original.
     :param paginas_por_bloco: Número de páginas por recorte.
     :param prefixo_saida: Prefixo para os arquivos de saída.
+    :return: Caminhos dos arquivos criados, na ordem das páginas.
     """
-    with open(arquivo_entrada, "rb") as f_in:
-        leitor = PyPDF2.PdfReader(f_in)
-        total_paginas = len(leitor.pages)
-        for inicio in range(0, total_paginas, paginas_por_bloco):
-            escritor = PyPDF2.PdfWriter()
-            fim = min(inicio + paginas_por_bloco, total_paginas)
-            for i in range(inicio, fim):
-                escritor.add_page(leitor.pages[i])
-            nome_saida = f"{prefixo_saida}_pags_{inicio+1}_a_{fim}.pdf"
-            with open(nome_saida, "wb") as f_out:
-                escritor.write(f_out)
-            logger.info(f"Criado arquivo de bloco PDF: {nome_saida}")
+    arquivos_criados = []
+    for inicio, fim, dados in iter_pdf_blocks(arquivo_entrada, paginas_por_bloco):
+        nome_saida = f"{prefixo_saida}_pags_{inicio}_a_{fim}.pdf"
+        with open(nome_saida, "wb") as f_out:
+            f_out.write(dados)
+        logger.info(f"Criado arquivo de bloco PDF: {nome_saida}")
+        arquivos_criados.append(nome_saida)
+    return arquivos_criados
 
 def get_base64_download_link(data: str, filename: str, text: str):
     """Gera um link de download base64 para um arquivo."""
@@ -0,0 +1,364 @@
+"""
+Coleta de lixo do banco vetorial (PERSIST_DIRECTORY) e dos índices lexicais.
+
+Remove as coleções sem acesso há mais de VECTOR_GC_MAX_AGE_DAYS e, se o espaço ocupado passar de
+VECTOR_GC_MAX_BYTES, as menos usadas recentemente; depois apaga os diretórios de segmentos HNSW
+órfãos (que o Chroma deixa para trás ao remover coleções) e os índices lexicais sem coleção, e
+compacta o SQLite do Chroma (VACUUM). Coleções em uso por sessões deste processo nunca são removidas.
+A linha de comando se recusa a rodar com a aplicação aberta (trava em VECTOR_STORE_LOCK_PATH); a
+simulação (--dry-run) apenas lê os SQLite do Chroma e do registro de acessos, sem criar nem alterar
+arquivos.
+
+Roda em segundo plano na aplicação (start_background_gc) e pela linha de comando, a partir da raiz
+do projeto: python src/vector_gc.py [--max-age-days 30] [--max-mb 2048] [--dry-run]
+"""
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    logger,
+    LEXICAL_INDEX_DIRECTORY,
+    PERSIST_DIRECTORY,
+    VECTOR_ACCESS_LOG_PATH,
+    VECTOR_GC_MAX_AGE_DAYS,
+    VECTOR_GC_MAX_BYTES,
+    VECTOR_GC_INTERVAL_SECONDS
+)
+from lexical_index import drop_lexical_index, index_path
+from vector_store import VectorStoreBusyError, VectorStoreManager, get_vector_store_manager
+
+_SEGMENT_DIR_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+_LEXICAL_SUFFIX = ".bm25"
+
+def _path_size(path: str) -> int:
+    """Tamanho em bytes de um arquivo ou da árvore de um diretório (0 se não existir)."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+@dataclass
+class _ChromaCatalog:
+    """O que o SQLite do Chroma diz sobre as coleções: segmentos de cada uma e linhas que ocupam."""
+    segments: Dict[str, str] = field(default_factory=dict) # id do segmento -> coleção
+    rows: Dict[str, int] = field(default_factory=dict) # coleção -> embeddings no SQLite
+
+def _read_catalog(sqlite_path: str) -> Optional[_ChromaCatalog]:
+    """
+    Lê o catálogo diretamente do chroma.sqlite3 (somente leitura). O esquema é interno ao Chroma;
+    se não for o esperado, retorna None e a coleta não remove segmentos nem estima tamanhos.
+    """
+    if not os.path.exists(sqlite_path):
+        return None
+    try:
+        with sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True, timeout=5) as conn:
+            catalog = _ChromaCatalog()
+            for segment_id, name in conn.execute(
+                "SELECT s.id, c.name FROM segments s JOIN collections c ON s.collection = c.id"
+            ):
+                catalog.segments[segment_id] = name
+            for name, rows in conn.execute(
+                "SELECT c.name, COUNT(e.id) FROM collections c JOIN segments s ON s.collection = c.id "
+                "LEFT JOIN embeddings e ON e.segment_id = s.id GROUP BY c.name"
+            ):
+                catalog.rows[name] = rows
+            return catalog
+    except sqlite3.Error as e:
+        logger.warning(f"Catálogo do Chroma ilegível ({e}); segmentos órfãos não serão removidos.")
+        return None
+
+def _read_only_query(sqlite_path: str, query: str) -> List[tuple]:
+    """Executa uma consulta em um SQLite aberto somente para leitura; [] se ele não existir."""
+    if not os.path.exists(sqlite_path):
+        return []
+    with sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True, timeout=5) as conn:
+        return conn.execute(query).fetchall()
+
+class _ReadOnlyVectorStore:
+    """
+    Visão somente leitura do banco vetorial para a simulação (--dry-run): lê as coleções do
+    chroma.sqlite3 e o registro de acessos sem abrir o cliente Chroma nem criar os arquivos do
+    catálogo, do registro ou da trava. Sem a trava, coleções abertas pela aplicação não aparecem
+    como em uso.
+    """
+
+    def __init__(self, persist_directory: str = PERSIST_DIRECTORY, access_log_path: str = VECTOR_ACCESS_LOG_PATH):
+        self.persist_directory = persist_directory
+        self.access_log_path = access_log_path
+
+    @property
+    def access_log(self) -> "_ReadOnlyVectorStore":
+        return self
+
+    def items_by_access(self) -> List[Tuple[str, float]]:
+        return _read_only_query(
+            self.access_log_path, "SELECT key, last_access FROM collection_access ORDER BY last_access ASC"
+        )
+
+    def in_use(self, name: str) -> bool:
+        return False
+
+    def collection_names(self) -> List[str]:
+        return [
+            name for name, in
+            _read_only_query(os.path.join(self.persist_directory, "chroma.sqlite3"), "SELECT name FROM collections")
+        ]
+
+@dataclass
+class GCReport:
+    evicted: List[str] = field(default_factory=list)
+    orphan_segments: List[str] = field(default_factory=list)
+    orphan_lexical: List[str] = field(default_factory=list)
+    bytes_before: int = 0
+    bytes_after: int = 0
+    vacuumed: bool = False
+    dry_run: bool = False
+
+    @property
+    def reclaimed(self) -> int:
+        return max(self.bytes_before - self.bytes_after, 0)
+
+    def summary(self) -> str:
+        action = "seriam liberados" if self.dry_run else "liberados"
+        return (
+            f"{len(self.evicted)} coleções removidas, {len(self.orphan_segments)} segmentos órfãos, "
+            f"{len(self.orphan_lexical)} índices lexicais órfãos; {_format_bytes(self.reclaimed)} {action} "
+            f"({_format_bytes(self.bytes_before)} -> {_format_bytes(self.bytes_after)})"
+        )
+
+class VectorStoreGC:
+    """Coleta de lixo do banco vetorial, por idade do último acesso e por orçamento de disco."""
+
+    def __init__(
+        self,
+        manager: Optional[VectorStoreManager] = None,
+        lexical_directory: str = LEXICAL_INDEX_DIRECTORY,
+        max_age_seconds: Optional[float] = VECTOR_GC_MAX_AGE_DAYS * 86400 if VECTOR_GC_MAX_AGE_DAYS else None,
+        max_bytes: Optional[int] = VECTOR_GC_MAX_BYTES
+    ):
+        self.manager = manager if manager is not None else get_vector_store_manager()
+        self.lexical_directory = lexical_directory
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def _sqlite_path(self) -> str:
+        return os.path.join(self.manager.persist_directory, "chroma.sqlite3")
+
+    def _disk_usage(self) -> int:
+        return _path_size(self.manager.persist_directory) + _path_size(self.lexical_directory)
+
+    def _collection_sizes(self, names: List[str], catalog: Optional[_ChromaCatalog]) -> Dict[str, int]:
+        """
+        Estimativa do espaço de cada coleção: seus diretórios de segmento, seu índice lexical e a
+        fração do SQLite do Chroma proporcional às linhas de embeddings que ela ocupa.
+        """
+        sizes = {name: _path_size(index_path(name)) for name in names}
+        if catalog is None:
+            return sizes
+        for segment_id, name in catalog.segments.items():
+            if name in sizes:
+                sizes[name] += _path_size(os.path.join(self.manager.persist_directory, segment_id))
+        total_rows = sum(catalog.rows.values())
+        if total_rows:
+            sqlite_size = _path_size(self._sqlite_path)
+            for name in sizes:
+                sizes[name] += sqlite_size * catalog.rows.get(name, 0) // total_rows
+        return sizes
+
+    def _last_access(self, names: List[str], catalog: Optional[_ChromaCatalog], record: bool) -> Dict[str, float]:
+        """
+        Último acesso de cada coleção. Coleções anteriores ao registro de acessos usam a data de
+        modificação dos seus segmentos; as que não têm nem isso passam a contar a partir de agora,
+        o que fica gravado no registro se record for verdadeiro.
+        """
+        recorded = dict(self.manager.access_log.items_by_access())
+        last_access = {}
+        for name in names:
+            if name in recorded:
+                last_access[name] = recorded[name]
+                continue
+            segment_dirs = [
+                os.path.join(self.manager.persist_directory, segment_id)
+                for segment_id, owner in (catalog.segments.items() if catalog else [])
+                if owner == name and os.path.isdir(os.path.join(self.manager.persist_directory, segment_id))
+            ]
+            if segment_dirs:
+                last_access[name] = max(os.path.getmtime(path) for path in segment_dirs)
+                continue
+            last_access[name] = time.time()
+            if record:
+                self.manager.access_log.set(name, b"")
+        return last_access
+
+    def _select_evictions(
+        self,
+        names: List[str],
+        catalog: Optional[_ChromaCatalog],
+        now: float,
+        dry_run: bool
+    ) -> Tuple[List[str], int]:
+        """Escolhe as coleções a remover (por idade e, depois, LRU até caber no orçamento)."""
+        candidates = [name for name in names if not self.manager.in_use(name)]
+        last_access = self._last_access(candidates, catalog, record=not dry_run)
+        sizes = self._collection_sizes(candidates, catalog)
+        by_age = sorted(candidates, key=lambda name: last_access[name])
+
+        evicted = [
+            name for name in by_age
+            if self.max_age_seconds is not None and now - last_access[name] > self.max_age_seconds
+        ]
+        estimated = self._disk_usage() - sum(sizes[name] for name in evicted)
+        if self.max_bytes is not None:
+            for name in by_age:
+                if estimated <= self.max_bytes:
+                    break
+                if name not in evicted:
+                    evicted.append(name)
+                    estimated -= sizes[name]
+        return evicted, sum(sizes[name] for name in evicted)
+
+    def _orphan_segments(self, catalog: Optional[_ChromaCatalog], directories: List[str]) -> List[str]:
+        if catalog is None:
+            return []
+        return [name for name in directories if name not in catalog.segments]
+
+    def _orphan_lexical(self) -> List[str]:
+        """Índices lexicais sem coleção (os arquivos são listados antes das coleções, pelo mesmo motivo dos segmentos)."""
+        if not os.path.isdir(self.lexical_directory):
+            return []
+        names = [
+            file_name[:-len(_LEXICAL_SUFFIX)] for file_name in os.listdir(self.lexical_directory)
+            if file_name.endswith(_LEXICAL_SUFFIX)
+        ]
+        live = set(self.manager.collection_names())
+        return [name for name in names if name not in live]
+
+    def _vacuum(self) -> bool:
+        """Compacta o SQLite do Chroma; desiste (sem erro) se ele estiver ocupado."""
+        try:
+            with sqlite3.connect(self._sqlite_path, timeout=5, isolation_level=None) as conn:
+                conn.execute("VACUUM")
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"VACUUM do banco vetorial adiado: {e}")
+            return False
+
+    def collect(self, dry_run: bool = False) -> GCReport:
+        """Executa uma coleta; com dry_run, apenas informa o que seria removido."""
+        with self._lock:
+            report = GCReport(bytes_before=self._disk_usage(), dry_run=dry_run)
+            persist_directory = self.manager.persist_directory
+            # Os diretórios são listados antes do catálogo: um segmento criado entre as duas
+            # leituras já tem sua linha no SQLite e não é tomado por órfão
+            directories = [
+                name for name in (os.listdir(persist_directory) if os.path.isdir(persist_directory) else [])
+                if _SEGMENT_DIR_RE.fullmatch(name) and os.path.isdir(os.path.join(persist_directory, name))
+            ]
+            names = self.manager.collection_names()
+            catalog = _read_catalog(self._sqlite_path)
+
+            report.evicted, evicted_bytes = self._select_evictions(names, catalog, time.time(), dry_run)
+            if dry_run:
+                # Os segmentos das coleções removidas já estão em evicted_bytes
+                report.orphan_segments = self._orphan_segments(catalog, directories)
+                report.orphan_lexical = self._orphan_lexical()
+                report.bytes_after = report.bytes_before - evicted_bytes - sum(
+                    _path_size(os.path.join(persist_directory, name)) for name in report.orphan_segments
+                ) - sum(_path_size(index_path(name)) for name in report.orphan_lexical)
+                return report
+
+            # A coleção pode ter sido aberta desde a seleção; delete_if_unused confere de novo sob o lock
+            report.evicted = [name for name in report.evicted if self.manager.delete_if_unused(name)]
+            for name in report.evicted:
+                drop_lexical_index(name)
+            catalog = _read_catalog(self._sqlite_path)
+            report.orphan_segments = self._orphan_segments(catalog, directories)
+            for name in report.orphan_segments:
+                shutil.rmtree(os.path.join(persist_directory, name), ignore_errors=True)
+            report.orphan_lexical = self._orphan_lexical()
+            for name in report.orphan_lexical:
+                drop_lexical_index(name)
+            report.vacuumed = self._vacuum()
+            report.bytes_after = self._disk_usage()
+            logger.info(f"Coleta de lixo do banco vetorial: {report.summary()}.")
+            return report
+
+_background_lock = threading.Lock()
+_background_thread: Optional[threading.Thread] = None
+
+def start_background_gc(interval_seconds: Optional[float] = VECTOR_GC_INTERVAL_SECONDS) -> None:
+    """Inicia (uma única vez por processo) a coleta periódica em uma thread de fundo, a primeira após um intervalo."""
+    global _background_thread
+    if not interval_seconds:
+        return
+    with _background_lock:
+        if _background_thread is not None:
+            return
+
+        def run() -> None:
+            collector = VectorStoreGC()
+            while True:
+                # A primeira coleta espera um intervalo: o VACUUM trava o SQLite do Chroma, e na
+                # partida da aplicação as primeiras sessões estão ingerindo
+                time.sleep(interval_seconds)
+                try:
+                    collector.collect()
+                except Exception as e:
+                    logger.error(f"Falha na coleta de lixo do banco vetorial: {e}", exc_info=True)
+
+        _background_thread = threading.Thread(target=run, name="vector-gc", daemon=True)
+        _background_thread.start()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-age-days", type=float, default=VECTOR_GC_MAX_AGE_DAYS)
+    parser.add_argument("--max-mb", type=float, default=VECTOR_GC_MAX_BYTES / 1024 ** 2 if VECTOR_GC_MAX_BYTES else None)
+    parser.add_argument("--dry-run", action="store_true", help="apenas lista o que seria removido")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        # A simulação não escreve nada: nem o cliente Chroma nem a trava são abertos
+        manager = _ReadOnlyVectorStore()
+    else:
+        try:
+            manager = VectorStoreManager(exclusive=True)
+        except VectorStoreBusyError as e:
+            raise SystemExit(f"{e} Encerre a aplicação antes de rodar a coleta pela linha de comando.")
+    collector = VectorStoreGC(
+        manager,
+        max_age_seconds=args.max_age_days * 86400 if args.max_age_days else None,
+        max_bytes=int(args.max_mb * 1024 ** 2) if args.max_mb else None
+    )
+    report = collector.collect(dry_run=args.dry_run)
+    for name in report.evicted:
+        print(f"coleção: {name}")
+    for name in report.orphan_segments:
+        print(f"segmento órfão: {name}")
+    for name in report.orphan_lexical:
+        print(f"índice lexical órfão: {name}")
+    print(report.summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+# Serviço de banco vetorial do processo: um único cliente Chroma e coleções compartilhadas entre inquilinos
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import chromadb
+from langchain_community.vectorstores import Chroma
+
+from config import (
+    logger,
+    PERSIST_DIRECTORY,
+    VECTOR_STORE_IDLE_SECONDS,
+    VECTOR_ACCESS_LOG_PATH,
+    VECTOR_CATALOG_PATH,
+    VECTOR_STORE_LOCK_PATH
+)
+from disk_cache import SQLiteLRUCache
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Limite do Chroma para nomes de coleção (versões anteriores à 1.0; mantido por compatibilidade)
+MAX_COLLECTION_NAME_LENGTH = 63
+# Entradas do registro de acessos (uma por coleção)
+_ACCESS_LOG_MAX_ENTRIES = 1_000_000
+PDF_COLLECTION_PREFIX = "pdfs_"
+# Aceita também as coleções antigas, com prefixo de inquilino (t<hash>_pdfs_...)
+_PDF_COLLECTION_RE = re.compile(rf"(?:t[0-9a-f]{{12}}_)?{PDF_COLLECTION_PREFIX}\w+")
+
+def is_pdf_collection(name: str) -> bool:
+    """Indica se a coleção guarda chunks de PDFs."""
+    return _PDF_COLLECTION_RE.fullmatch(name) is not None
+
+class VectorStoreBusyError(RuntimeError):
+    """O banco vetorial está em uso por outro processo (a aplicação ou outra coleta de lixo)."""
+
+def _lock_file(path: str, exclusive: bool, blocking: bool):
+    """
+    Trava consultiva entre processos sobre o arquivo path; retorna o arquivo aberto (a trava dura
+    enquanto ele não for fechado) ou None se não puder ser obtida. No Windows toda trava é exclusiva.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handle = open(path, "a+b")
+    try:
+        if sys.platform == "win32":
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        else:
+            mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            fcntl.flock(handle, mode if blocking else mode | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+class CollectionCatalog:
+    """
+    Catálogo (SQLite) das coleções, com duas tabelas:
+    - collection_owners: quais inquilinos usam cada coleção. As coleções são endereçadas por
+      conteúdo e armazenadas uma única vez; cada inquilino que as abre passa a ser um dos seus
+      donos, e uma coleção só é removida a pedido de um inquilino quando não lhe resta nenhum dono;
+    - collection_files: em quais coleções estão os chunks de cada arquivo (hash do conteúdo e
+      impressão digital da ingestão), para reaproveitá-los sem percorrer as demais coleções.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS collection_owners ("
+            "tenant TEXT NOT NULL, collection TEXT NOT NULL, PRIMARY KEY (tenant, collection))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS collection_owners_collection ON collection_owners(collection)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS collection_files ("
+            "file_hash TEXT NOT NULL, fingerprint TEXT NOT NULL, collection TEXT NOT NULL, "
+            "PRIMARY KEY (file_hash, fingerprint, collection))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS collection_files_collection ON collection_files(collection)")
+
+    def add(self, tenant: str, collection: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO collection_owners (tenant, collection) VALUES (?, ?)", (tenant, collection)
+            )
+
+    def collections(self, tenant: str) -> List[str]:
+        """Coleções de que o inquilino é dono."""
+        with self._lock:
+            rows = self._conn.execute("SELECT collection FROM collection_owners WHERE tenant = ?", (tenant,))
+            return [collection for collection, in rows.fetchall()]
+
+    def release_tenant(self, tenant: str) -> List[str]:
+        """Retira o inquilino de todas as suas coleções; retorna as que ficaram sem nenhum dono."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            owned = [
+                collection for collection, in
+                self._conn.execute("SELECT collection FROM collection_owners WHERE tenant = ?", (tenant,)).fetchall()
+            ]
+            self._conn.execute("DELETE FROM collection_owners WHERE tenant = ?", (tenant,))
+            orphaned = [
+                collection for collection in owned
+                if self._conn.execute(
+                    "SELECT 1 FROM collection_owners WHERE collection = ? LIMIT 1", (collection,)
+                ).fetchone() is None
+            ]
+            self._conn.execute("COMMIT")
+            return orphaned
+
+    def add_files(self, collection: str, file_hashes: Iterable[str], fingerprint: str) -> None:
+        """Registra que a coleção contém os chunks dos arquivos informados."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO collection_files (file_hash, fingerprint, collection) VALUES (?, ?, ?)",
+                [(file_hash, fingerprint, collection) for file_hash in file_hashes]
+            )
+
+    def collections_with_file(self, file_hash: str, fingerprint: str) -> List[str]:
+        """Coleções que contêm os chunks do arquivo, ingeridos com a impressão digital informada."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT collection FROM collection_files WHERE file_hash = ? AND fingerprint = ?", (file_hash, fingerprint)
+            )
+            return [collection for collection, in rows.fetchall()]
+
+    def forget(self, collection: str) -> None:
+        """Remove os donos e os arquivos de uma coleção apagada."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM collection_owners WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM collection_files WHERE collection = ?", (collection,))
+            self._conn.execute("COMMIT")
+
+@dataclass
+class _OpenCollection:
+    vector_db: Chroma
+    refcount: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+class VectorStoreLease:
+    """
+    Uso de uma coleção por uma sessão. É devolvido com release() ou, automaticamente, quando o
+    objeto deixa de ser referenciado (por exemplo, quando o Streamlit descarta o estado da sessão).
+    """
+
+    def __init__(self, manager: "VectorStoreManager", name: str, vector_db: Chroma):
+        self.name = name
+        self.vector_db = vector_db
+        self._finalizer = weakref.finalize(self, manager._release, name)
+
+    def release(self) -> None:
+        self._finalizer()
+
+class VectorStoreManager:
+    """
+    Compartilha um cliente Chroma (e, com ele, o SQLite e os índices HNSW carregados) entre todas
+    as sessões do processo. Cada coleção é armazenada uma única vez, qualquer que seja o número de
+    inquilinos que a usam (os donos ficam em catalog), e cada coleção aberta tem um único objeto
+    Chroma com contagem de referências; coleções sem sessões ativas há mais de idle_seconds são
+    fechadas, e os ouvintes de despejo liberam o que mantinham em memória para elas (cadeias,
+    índices lexicais). O último acesso de cada coleção fica registrado em access_log, usado pela
+    coleta de lixo.
+
+    Enquanto existir, o gerenciador mantém uma trava compartilhada em lock_path; com exclusive=True
+    (coleta de lixo pela linha de comando) exige a trava exclusiva e levanta VectorStoreBusyError se
+    a aplicação estiver aberta, já que as sessões de outro processo não aparecem em in_use.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = PERSIST_DIRECTORY,
+        idle_seconds: float = VECTOR_STORE_IDLE_SECONDS,
+        access_log_path: str = VECTOR_ACCESS_LOG_PATH,
+        catalog_path: str = VECTOR_CATALOG_PATH,
+        lock_path: str = VECTOR_STORE_LOCK_PATH,
+        exclusive: bool = False
+    ):
+        # Sem espera no modo exclusivo; no compartilhado, aguarda o fim de uma coleta em andamento
+        self._process_lock = _lock_file(lock_path, exclusive, blocking=not exclusive)
+        if self._process_lock is None:
+            if exclusive:
+                raise VectorStoreBusyError(f"Banco vetorial em uso por outro processo ({lock_path}).")
+            logger.warning(f"Trava do banco vetorial indisponível ({lock_path}); outro processo a detém.")
+        self.persist_directory = persist_directory
+        self.idle_seconds = idle_seconds
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.access_log = SQLiteLRUCache(access_log_path, _ACCESS_LOG_MAX_ENTRIES, table="collection_access")
+        self.catalog = CollectionCatalog(catalog_path)
+        self._open: Dict[str, _OpenCollection] = {}
+        self._eviction_listeners: Set[Callable[[str], None]] = set()
+        self._lock = threading.Lock()
+
+    def add_eviction_listener(self, listener: Callable[[str], None]) -> None:
+        """Registra uma função chamada com o nome de cada coleção fechada ou removida."""
+        with self._lock:
+            self._eviction_listeners.add(listener)
+
+    def open(self, name: str, embedding_function, tenant: str = "") -> VectorStoreLease:
+        """Abre (ou reaproveita) a coleção, registra o inquilino como um de seus donos e retorna um uso dela."""
+        if len(name) > MAX_COLLECTION_NAME_LENGTH:
+            raise ValueError(f"Nome de coleção com mais de {MAX_COLLECTION_NAME_LENGTH} caracteres: {name}")
+        with self._lock:
+            entry = self._open.get(name)
+            if entry is None:
+                vector_db = Chroma(collection_name=name, embedding_function=embedding_function, client=self.client)
+                entry = self._open[name] = _OpenCollection(vector_db)
+            entry.refcount += 1
+            entry.last_used = time.monotonic()
+            lease = VectorStoreLease(self, name, entry.vector_db)
+        if tenant:
+            self.catalog.add(tenant, name)
+        self.access_log.set(name, b"")
+        self.evict_idle()
+        return lease
+
+    def _release(self, name: str) -> None:
+        with self._lock:
+            entry = self._open.get(name)
+            if entry is not None:
+                entry.refcount = max(entry.refcount - 1, 0)
+                entry.last_used = time.monotonic()
+        self.access_log.set(name, b"")
+
+    def _notify(self, names: List[str]) -> None:
+        for name in names:
+            for listener in list(self._eviction_listeners):
+                try:
+                    listener(name)
+                except Exception as e:
+                    logger.warning(f"Falha ao liberar recursos da coleção {name}: {e}")
+
+    def evict_idle(self) -> List[str]:
+        """Fecha as coleções sem sessões ativas há mais de idle_seconds; retorna os nomes fechados."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                name for name, entry in self._open.items()
+                if entry.refcount == 0 and now - entry.last_used > self.idle_seconds
+            ]
+            for name in idle:
+                del self._open[name]
+        if idle:
+            logger.info(f"{len(idle)} coleções ociosas fechadas: {', '.join(idle)}.")
+            self._notify(idle)
+        return idle
+
+    def delete_if_unused(self, name: str) -> bool:
+        """
+        Remove uma coleção do banco vetorial se nenhuma sessão deste processo a estiver usando. A
+        verificação e a remoção acontecem sob o mesmo lock, de modo que um open() concorrente ou
+        encontra a coleção intacta, ou a recria vazia depois. Retorna True se ela foi removida.
+        """
+        with self._lock:
+            entry = self._open.get(name)
+            if entry is not None and entry.refcount > 0:
+                return False
+            self._open.pop(name, None)
+            try:
+                self.client.delete_collection(name)
+            except Exception as e:
+                # Coleção já removida (por outra sessão ou pela coleta de lixo)
+                logger.debug(f"Coleção {name} não removida: {e}")
+        self.access_log.delete_many([name])
+        self.catalog.forget(name)
+        self._notify([name])
+        return True
+
+    def record_files(self, name: str, file_hashes: Iterable[str], fingerprint: str) -> None:
+        """Registra os arquivos cujos chunks estão na coleção."""
+        self.catalog.add_files(name, file_hashes, fingerprint)
+
+    def collections_with_file(self, file_hash: str, fingerprint: str) -> List[str]:
+        """Coleções que já contêm os chunks do arquivo (consulta ao catálogo, sem abrir nenhuma delas)."""
+        return self.catalog.collections_with_file(file_hash, fingerprint)
+
+    def in_use(self, name: str) -> bool:
+        """Indica se alguma sessão deste processo está usando a coleção."""
+        with self._lock:
+            entry = self._open.get(name)
+            return entry is not None and entry.refcount > 0
+
+    def collection_names(self) -> List[str]:
+        return [getattr(collection, "name", collection) for collection in self.client.list_collections()]
+
+    def tenant_collections(self, tenant: str) -> List[str]:
+        """Nomes das coleções de que o inquilino é dono."""
+        return self.catalog.collections(tenant) if tenant else []
+
+    def release_tenant(self, tenant: str) -> List[str]:
+        """Retira o inquilino de todas as suas coleções; retorna as que ficaram sem dono."""
+        return self.catalog.release_tenant(tenant) if tenant else []
+
+    def stats(self) -> Dict[str, int]:
+        """Coleções abertas e sessões que as usam."""
+        with self._lock:
+            return {
+                "open_collections": len(self._open),
+                "leases": sum(entry.refcount for entry in self._open.values()),
+            }
+
+_manager_lock = threading.Lock()
+_shared_manager: Optional[VectorStoreManager] = None
+
+def get_vector_store_manager() -> VectorStoreManager:
+    """Retorna o gerenciador de banco vetorial compartilhado pelo processo (criado sob demanda)."""
+    global _shared_manager
+    with _manager_lock:
+        if _shared_manager is None:
+            _shared_manager = VectorStoreManager()
+            logger.info(f"Cliente Chroma compartilhado aberto em {PERSIST_DIRECTORY}.")
+        return _shared_manager
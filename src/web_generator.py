@@ -1,22 +1,553 @@
 # Geração de páginas web interativas a partir de LaTeX
+import html
+import re
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
 import streamlit as st
-import google.generativeai as genai
 
-from config import logger, GEMINI_MODEL_NAME, LATEX_INSIGHTS_PROMPT
+from config import (
+    logger,
+    GEMINI_MODEL_NAME,
+    LATEX_INSIGHTS_PROMPT,
+    WEB_SECTION_PROMPT,
+    WEB_SECTION_SEPARATOR,
+    WEB_SECTION_MAX_WORKERS,
+    WEB_SIDEBAR_PROMPT,
+    WEB_SIDEBAR_MAX_INPUT_CHARS
+)
+from llm_gateway import KeyedLLMGateway, get_llm_gateway
+
+_SECTION_RE = re.compile(r"\\section\*?\s*\{")
+_FENCE_RE = re.compile(r"^\s*```[\w-]*\s*$", re.MULTILINE)
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="pt-BR" class="dark">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<script src="https://cdn.tailwindcss.com"></script>
+<link rel="preconnect" href="https://fonts.googleapis.com">
+<link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/katex.min.css">
+<script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/katex.min.js"></script>
+<script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/contrib/auto-render.min.js"
+        onload="renderMathInElement(document.body, {{delimiters: [{{left: '\\\\[', right: '\\\\]', display: true}}, {{left: '\\\\(', right: '\\\\)', display: false}}], throwOnError: false}});"></script>
+<script src="https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.min.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/d3@7.9.0/dist/d3.min.js"></script>
+<style>
+body {{ font-family: 'Inter', sans-serif; }}
+.pendente {{ animation: pulse 1.5s ease-in-out infinite; }}
+@keyframes pulse {{ 50% {{ opacity: .4; }} }}
+</style>
+</head>
+<body class="bg-gray-900 text-gray-200">
+<div class="max-w-7xl mx-auto p-6 lg:grid lg:grid-cols-4 lg:gap-8">
+<main class="lg:col-span-3 space-y-10">
+"""
+
+PAGE_TAIL = """</main>
+<aside class="mt-10 lg:mt-0 space-y-6">
+{sidebar}<nav class="lg:sticky lg:top-6 bg-gray-800 rounded-lg p-4">
+<h2 class="text-lg font-semibold mb-3">Índice</h2>
+<ol class="space-y-1 text-sm list-decimal list-inside">
+{toc}
+</ol>
+</nav>
+</aside>
+</div>
+</body>
+</html>
+"""
+
+SIDEBAR_TEMPLATE = '<div class="bg-gray-800 rounded-lg p-4">\n{content}\n</div>\n'
+
+SECTION_TEMPLATE = """<section id="secao-{index}" class="space-y-4">
+<h2 class="text-2xl font-bold text-white border-b border-gray-700 pb-2">{title}</h2>
+{content}
+</section>
+"""
+
+PENDING_NOTE = '<p class="pendente text-sm text-gray-500">Gerando a versão interativa desta seção...</p>'
+
+@dataclass
+class LatexSection:
+    title: str # Título em LaTeX ("" para o texto anterior à primeira seção)
+    body: str
+
+@dataclass
+class PageUpdate:
+    """Estado da página após a chegada de uma seção (ou do esqueleto, com completed = 0)."""
+    html: str
+    completed: int
+    total: int
+    elapsed: float # segundos desde o início da geração
+
+def _read_group(text: str, start: int) -> Tuple[str, int]:
+    """Lê o conteúdo de um grupo {...} cuja chave de abertura precede start, respeitando chaves aninhadas."""
+    depth = 1
+    index = start
+    while index < len(text) and depth:
+        if text[index] == "\\":
+            index += 2
+            continue
+        depth += {"{": 1, "}": -1}.get(text[index], 0)
+        index += 1
+    return text[start:index - 1 if depth == 0 else index], index
+
+def latex_preamble(latex: str) -> str:
+    """Preâmbulo do documento (o que precede \\begin{document}), ou "" se não houver."""
+    begin = latex.find("\\begin{document}")
+    return latex[:begin].strip() if begin >= 0 else ""
+
+def split_latex_sections(latex: str) -> List[LatexSection]:
+    """
+    Divide o LaTeX em seções pelo comando \\section (ou \\section*). O texto anterior à primeira
+    seção, se houver, vira uma seção sem título. O preâmbulo (ver latex_preamble) e o ambiente
+    document ficam de fora das seções.
+    """
+    begin = latex.find("\\begin{document}")
+    if begin >= 0:
+        latex = latex[begin + len("\\begin{document}"):]
+    end = latex.find("\\end{document}")
+    if end >= 0:
+        latex = latex[:end]
+
+    sections = []
+    matches = list(_SECTION_RE.finditer(latex))
+    introduction = latex[:matches[0].start() if matches else len(latex)].replace("\\maketitle", "").strip()
+    if introduction:
+        sections.append(LatexSection("", introduction))
+    for position, match in enumerate(matches):
+        title, body_start = _read_group(latex, match.end())
+        body_end = matches[position + 1].start() if position + 1 < len(matches) else len(latex)
+        sections.append(LatexSection(title.strip(), latex[body_start:body_end].strip()))
+    return sections
+
+# --- Conversão local LaTeX -> HTML ---------------------------------------------------------------
+
+_COMMENT_RE = re.compile(r"(?<!\\)%.*")
+_VERBATIM_RE = re.compile(r"\\begin\{verbatim\*?\}\n?(.*?)\\end\{verbatim\*?\}", re.DOTALL)
+_MATH_RE = re.compile(
+    r"\$\$(?P<dollars>.+?)\$\$"
+    r"|\\\[(?P<brackets>.+?)\\\]"
+    r"|\\begin\{(?P<env>equation|align|alignat|gather|multline|eqnarray|displaymath|math)(?P<star>\*?)\}(?P<env_body>.*?)\\end\{(?P=env)(?P=star)\}"
+    r"|(?<!\\)\$(?P<dollar>.+?)(?<!\\)\$"
+    r"|\\\((?P<parens>.+?)\\\)",
+    re.DOTALL
+)
+_MATH_CLEANUP_RE = re.compile(r"\\(?:label\{[^}]*\}|nonumber\b|notag\b)")
+# Ambientes numerados viram o equivalente sem numeração aceito pelo KaTeX dentro de \[...\]
+_DISPLAY_ENVIRONMENTS = {"align": "aligned", "alignat": "alignedat", "eqnarray": "aligned", "gather": "gathered", "multline": "gathered"}
+_PLACEHOLDER_RE = re.compile("\x00(\\d+)\x00")
+_BLOCK_PLACEHOLDER_RE = re.compile("\x01(\\d+)\x01") # blocos verbatim, fora de <p>
+_BLOCK_RE = re.compile(r"\\begin\{(?P<env>[A-Za-z*]+)\}|\\(?P<heading>section|subsection|subsubsection|paragraph)\*?\s*\{|\n[ \t]*\n")
+_ENV_TOKEN_RE = re.compile(r"\\(begin|end)\{([A-Za-z*]+)\}")
+_ITEM_RE = re.compile(r"\\(begin|end)\{[A-Za-z*]+\}|\\item\b")
+_INLINE_RE = re.compile(r"\\(?:[A-Za-z]+\*?|.)|[{}~]|---|--|``|''", re.DOTALL)
+
+_HEADING_TAGS = {
+    "section": '<h2 class="text-2xl font-bold text-white">{}</h2>',
+    "subsection": '<h3 class="text-xl font-semibold text-white mt-6">{}</h3>',
+    "subsubsection": '<h4 class="text-lg font-semibold text-white mt-4">{}</h4>',
+    "paragraph": '<h5 class="font-semibold text-white mt-3">{}</h5>',
+}
+_INLINE_TAGS = {
+    "textbf": "<strong>{}</strong>", "mathbf": "<strong>{}</strong>",
+    "textit": "<em>{}</em>", "emph": "<em>{}</em>", "textsl": "<em>{}</em>",
+    "underline": "<u>{}</u>", "texttt": '<code class="text-pink-300">{}</code>',
+    "textsc": '<span class="uppercase text-sm">{}</span>',
+    "footnote": ' <span class="text-sm text-gray-400">({})</span>',
+    "caption": '<figcaption class="text-sm text-gray-400 mt-2">{}</figcaption>',
+    "cite": '<span class="text-gray-400">[{}]</span>',
+    "ref": '<span class="text-gray-400">[{}]</span>', "eqref": '<span class="text-gray-400">({})</span>',
+    "autoref": '<span class="text-gray-400">[{}]</span>',
+    "includegraphics": '<div class="italic text-gray-500">[Figura: {}]</div>',
+}
+_LINK_TAG = '<a class="text-blue-400 underline" href="{}">{}</a>'
+# Esquemas aceitos em \url e \href; os demais (javascript:, data:, ...) viram texto sem link
+_SAFE_URL_SCHEMES = {"http", "https", "mailto", "ftp"}
+_URL_SCHEME_RE = re.compile(r"([A-Za-z][A-Za-z0-9+.-]*):")
+# Caracteres que o navegador ignora ao interpretar o esquema ("java\tscript:")
+_URL_IGNORED_RE = re.compile(r"[\x00-\x20\x7f]")
+# Comandos removidos junto com o número indicado de argumentos obrigatórios
+_DROPPED_COMMANDS = {
+    "label": 1, "vspace": 1, "hspace": 1, "pagestyle": 1, "thispagestyle": 1, "bibliographystyle": 1,
+    "bibliography": 1, "setlength": 2, "setcounter": 2, "addcontentsline": 3, "newcommand": 2, "renewcommand": 2,
+}
+_SYMBOLS = {
+    "\\": "<br>", ",": "&#8201;", ";": " ", ":": " ", " ": " ", "!": "", "/": "", "-": "",
+    "%": "%", "_": "_", "#": "#", "$": "$", "{": "{", "}": "}",
+    "LaTeX": "LaTeX", "TeX": "TeX", "ldots": "…", "dots": "…", "textbackslash": "\\",
+    "quad": "&emsp;", "qquad": "&emsp;&emsp;", "S": "§", "copyright": "©", "ss": "ß",
+}
+_ACCENTS = {"'": "\u0301", "`": "\u0300", "^": "\u0302", '"': "\u0308", "~": "\u0303", "c": "\u0327", "=": "\u0304"}
+_LIST_TAGS = {
+    "itemize": ('<ul class="list-disc ml-6 space-y-1">', "</ul>"),
+    "enumerate": ('<ol class="list-decimal ml-6 space-y-1">', "</ol>"),
+    "description": ('<ul class="ml-6 space-y-1">', "</ul>"),
+}
+_THEOREM_NAMES = {
+    "theorem": "Teorema", "lemma": "Lema", "proposition": "Proposição", "corollary": "Corolário",
+    "definition": "Definição", "example": "Exemplo", "remark": "Observação", "proof": "Demonstração",
+    "abstract": "Resumo",
+}
+# Ambientes cujo primeiro grupo {...} é um parâmetro, não conteúdo
+_ENVIRONMENTS_WITH_ARGUMENT = {"tabular", "minipage", "multicols", "wrapfigure"}
+
+def _take_optional(text: str, position: int) -> Tuple[Optional[str], int]:
+    """Lê um argumento opcional [...] em position, se houver."""
+    if position < len(text) and text[position] == "[":
+        end = text.find("]", position)
+        if end >= 0:
+            return text[position + 1:end], end + 1
+    return None, position
+
+def _take_group(text: str, position: int) -> Tuple[Optional[str], int]:
+    """Lê um argumento obrigatório {...} em position (após espaços), se houver."""
+    probe = position
+    while probe < len(text) and text[probe] in " \t":
+        probe += 1
+    if probe < len(text) and text[probe] == "{":
+        return _read_group(text, probe + 1)
+    return None, position
+
+def _protect_math(text: str, fragments: List[str]) -> str:
+    """Troca cada fórmula por um marcador e guarda a fórmula já nos delimitadores do KaTeX."""
+    def replace(match: re.Match) -> str:
+        if match.group("dollar") is not None or match.group("parens") is not None:
+            formula = match.group("dollar") if match.group("dollar") is not None else match.group("parens")
+            rendered = f"\\({formula}\\)"
+        elif match.group("env") is not None:
+            formula = match.group("env_body")
+            environment = _DISPLAY_ENVIRONMENTS.get(match.group("env"))
+            if environment:
+                formula = f"\\begin{{{environment}}}{formula}\\end{{{environment}}}"
+            rendered = f"\\[{formula}\\]"
+        else:
+            formula = match.group("dollars") if match.group("dollars") is not None else match.group("brackets")
+            rendered = f"\\[{formula}\\]"
+        fragments.append(html.escape(_MATH_CLEANUP_RE.sub("", rendered), quote=False))
+        return f"\x00{len(fragments) - 1}\x00"
+    return _MATH_RE.sub(replace, text)
+
+def _render_link(url: str, label: Optional[str]) -> str:
+    """
+    Link de \\url/\\href. A URL chega escapada sem aspas (_prepare); é escapada de novo com aspas
+    para o atributo href, e links com esquema fora de _SAFE_URL_SCHEMES são mostrados só como texto.
+    """
+    url = html.unescape(url).strip()
+    label = _render_inline(label) if label is not None else html.escape(url, quote=False)
+    scheme = _URL_SCHEME_RE.match(_URL_IGNORED_RE.sub("", url))
+    if scheme is not None and scheme.group(1).lower() not in _SAFE_URL_SCHEMES:
+        logger.warning(f"Link com esquema não permitido removido: {scheme.group(1)}:")
+        return label
+    return _LINK_TAG.format(html.escape(url, quote=True), label)
+
+def _render_inline(text: str) -> str:
+    """Converte comandos de texto (negrito, itálico, citações, acentos, símbolos) em HTML."""
+    output = []
+    position = 0
+    while True:
+        match = _INLINE_RE.search(text, position)
+        if match is None:
+            output.append(text[position:])
+            break
+        output.append(text[position:match.start()])
+        token = match.group(0)
+        position = match.end()
+        if token in "{}":
+            continue
+        if token == "~":
+            output.append("&nbsp;")
+        elif token in ("---", "--"):
+            output.append("—" if token == "---" else "–")
+        elif token in ("``", "''"):
+            output.append("“" if token == "``" else "”")
+        else:
+            name = token[1:].rstrip("*") or token[1:]
+            if name in _ACCENTS:
+                letter, position = _take_group(text, position)
+                if letter is None and position < len(text):
+                    letter, position = text[position], position + 1
+                output.append(unicodedata.normalize("NFC", (letter or "") + _ACCENTS[name]))
+            elif name == "&":
+                # "\&" chega aqui já escapado como "\&amp;"
+                output.append("&amp;")
+                position += 4 if text.startswith("amp;", position) else 0
+            elif name in _SYMBOLS:
+                if name == "\\":
+                    _, position = _take_optional(text, position)
+                output.append(_SYMBOLS[name])
+            elif name in _DROPPED_COMMANDS:
+                _, position = _take_optional(text, position)
+                for _ in range(_DROPPED_COMMANDS[name]):
+                    _, position = _take_group(text, position)
+            elif name in _HEADING_TAGS or name in _INLINE_TAGS:
+                _, position = _take_optional(text, position)
+                argument, position = _take_group(text, position)
+                if argument is not None:
+                    template = _HEADING_TAGS.get(name) or _INLINE_TAGS[name]
+                    raw = name in ("includegraphics", "cite", "ref", "eqref", "autoref")
+                    output.append(template.format(argument if raw else _render_inline(argument)))
+            elif name == "url":
+                url, position = _take_group(text, position)
+                if url is not None:
+                    output.append(_render_link(url, None))
+            elif name == "href":
+                url, position = _take_group(text, position)
+                label, position = _take_group(text, position)
+                output.append(_render_link(url or "", label))
+            elif name == "textcolor":
+                _, position = _take_group(text, position)
+                argument, position = _take_group(text, position)
+                output.append(_render_inline(argument or ""))
+            else:
+                # Comando desconhecido: mantém o texto do primeiro argumento, se houver
+                _, position = _take_optional(text, position)
+                argument, position = _take_group(text, position)
+                if argument is not None:
+                    output.append(_render_inline(argument))
+    return "".join(output)
+
+def _find_environment_end(text: str, name: str, position: int) -> Tuple[int, int]:
+    """Retorna (início de \\end{name}, posição após ele) correspondente ao \\begin{name} já lido."""
+    depth = 1
+    for match in _ENV_TOKEN_RE.finditer(text, position):
+        if match.group(2) != name:
+            continue
+        depth += 1 if match.group(1) == "begin" else -1
+        if depth == 0:
+            return match.start(), match.end()
+    return len(text), len(text)
+
+def _split_items(body: str) -> List[Tuple[Optional[str], str]]:
+    """Divide o corpo de uma lista nos \\item do nível mais externo: [(rótulo opcional, conteúdo)]."""
+    items = []
+    depth = 0
+    start = None
+    label = None
+    for match in _ITEM_RE.finditer(body):
+        if match.group(1) == "begin":
+            depth += 1
+        elif match.group(1) == "end":
+            depth -= 1
+        elif depth == 0:
+            if start is not None:
+                items.append((label, body[start:match.start()]))
+            label, start = _take_optional(body, match.end())
+    if start is not None:
+        items.append((label, body[start:]))
+    return items
+
+def _render_table(body: str) -> str:
+    rows = []
+    for row in re.split(r"\\\\(?:\[[^\]]*\])?", body):
+        row = re.sub(r"\\(?:hline|toprule|midrule|bottomrule|cline\{[^}]*\})", "", row).strip()
+        if row:
+            cells = "".join(f'<td class="border border-gray-700 px-3 py-1">{_render_inline(cell.strip())}</td>' for cell in row.split("&amp;"))
+            rows.append(f"<tr>{cells}</tr>")
+    return '<table class="table-auto border-collapse my-4">\n' + "\n".join(rows) + "\n</table>"
+
+def _render_environment(name: str, body: str) -> str:
+    base = name.rstrip("*")
+    option, option_end = _take_optional(body, 0)
+    body = body[option_end:]
+    if base in _ENVIRONMENTS_WITH_ARGUMENT:
+        _, argument_end = _take_group(body, 0)
+        body = body[argument_end:]
+    if base in _LIST_TAGS:
+        opening, closing = _LIST_TAGS[base]
+        items = []
+        for label, content in _split_items(body):
+            prefix = f"<strong>{_render_inline(label)}</strong> " if label else ""
+            items.append(f"<li>{prefix}{_render_blocks(content, tight=True)}</li>")
+        return opening + "\n" + "\n".join(items) + "\n" + closing
+    if base == "tabular":
+        return _render_table(body)
+    if base in ("figure", "table"):
+        return f'<figure class="my-4 text-center">\n{_render_blocks(body, tight=True)}\n</figure>'
+    if base in _THEOREM_NAMES:
+        title = _THEOREM_NAMES[base] + (f" ({_render_inline(option)})" if option else "")
+        return (
+            f'<div class="border-l-4 border-blue-500 bg-gray-800 rounded p-4 my-4">'
+            f'<p class="font-semibold text-white">{title}.</p>\n{_render_blocks(body)}\n</div>'
+        )
+    if base in ("quote", "quotation", "verse"):
+        return f'<blockquote class="border-l-4 border-gray-600 pl-4 italic">\n{_render_blocks(body)}\n</blockquote>'
+    if base == "center":
+        return f'<div class="text-center">\n{_render_blocks(body)}\n</div>'
+    return _render_blocks(body)
+
+def _render_blocks(text: str, tight: bool = False) -> str:
+    """
+    Converte o texto em blocos HTML: parágrafos separados por linhas em branco, títulos de
+    subseção e ambientes (listas, tabelas, figuras, teoremas). Com tight, um único parágrafo
+    é devolvido sem <p>, como convém a itens de lista e legendas.
+    """
+    blocks: List[str] = []
+    paragraph: List[str] = []
+    paragraphs = 0
+
+    def flush() -> None:
+        nonlocal paragraphs
+        content = "".join(paragraph).strip()
+        paragraph.clear()
+        if _BLOCK_PLACEHOLDER_RE.fullmatch(content):
+            blocks.append(content)
+            return
+        rendered = _render_inline(content).strip()
+        if rendered.startswith(("<figcaption", "<div")):
+            blocks.append(rendered)
+        elif rendered:
+            paragraphs += 1
+            blocks.append(f'<p class="leading-relaxed">{rendered}</p>')
+
+    position = 0
+    while True:
+        match = _BLOCK_RE.search(text, position)
+        if match is None:
+            paragraph.append(text[position:])
+            break
+        paragraph.append(text[position:match.start()])
+        if match.group("env"):
+            flush()
+            end, position = _find_environment_end(text, match.group("env"), match.end())
+            blocks.append(_render_environment(match.group("env"), text[match.end():end]))
+        elif match.group("heading"):
+            flush()
+            title, position = _read_group(text, match.end())
+            blocks.append(_HEADING_TAGS[match.group("heading")].format(_render_inline(title)))
+        else:
+            flush()
+            position = match.end()
+    flush()
+
+    if tight and paragraphs == 1 and len(blocks) == 1 and blocks[0].startswith('<p class="leading-relaxed">'):
+        return blocks[0][len('<p class="leading-relaxed">'):-len("</p>")]
+    return "\n".join(blocks)
+
+def _prepare(latex: str, fragments: List[str]) -> str:
+    """Remove comentários, separa verbatim e fórmulas em marcadores e escapa o restante para HTML."""
+    def keep_verbatim(match: re.Match) -> str:
+        fragments.append(f'<pre class="bg-gray-800 rounded p-3 text-sm overflow-x-auto">{html.escape(match.group(1), quote=False)}</pre>')
+        return f"\n\n\x01{len(fragments) - 1}\x01\n\n"
+
+    text = _VERBATIM_RE.sub(keep_verbatim, latex)
+    text = _COMMENT_RE.sub("", text)
+    return html.escape(_protect_math(text, fragments), quote=False)
+
+def _restore(rendered: str, fragments: List[str]) -> str:
+    rendered = _BLOCK_PLACEHOLDER_RE.sub("\x00\\1\x00", rendered)
+    return _PLACEHOLDER_RE.sub(lambda match: fragments[int(match.group(1))], rendered)
+
+def render_latex_html(latex: str) -> str:
+    """
+    Converte um trecho de LaTeX (corpo de uma seção) em HTML de forma determinística: títulos,
+    parágrafos, listas, tabelas, figuras e ambientes de teorema; fórmulas ficam nos delimitadores
+    \\(...\\) e \\[...\\] do KaTeX auto-render.
+    """
+    fragments: List[str] = []
+    return _restore(_render_blocks(_prepare(latex, fragments)), fragments)
+
+def render_latex_inline(latex: str) -> str:
+    """Como render_latex_html, para textos curtos sem parágrafos (títulos)."""
+    fragments: List[str] = []
+    return _restore(_render_inline(_prepare(latex, fragments)), fragments)
+
+def iter_page_html(sections: List[LatexSection], sidebar: str = "", contents: Optional[Dict[int, str]] = None) -> Iterator[str]:
+    """
+    Produz a página completa em pedaços: cabeçalho, uma seção por vez e, ao final, a barra
+    lateral (visualização e índice). Seções ausentes de contents são convertidas localmente
+    no momento em que são produzidas.
+    """
+    titles = []
+    for index, section in enumerate(sections):
+        titles.append(render_latex_inline(section.title) if section.title else "Introdução")
+        if index == 0:
+            yield PAGE_HEAD.format(title=re.sub(r"<[^>]+>", "", titles[0]) if section.title else "Página Interativa")
+        content = contents.get(index) if contents is not None else None
+        yield SECTION_TEMPLATE.format(index=index, title=titles[index], content=content or render_latex_html(section.body))
+    if not sections:
+        yield PAGE_HEAD.format(title="Página Interativa")
+    toc = "\n".join(
+        f'<li><a class="hover:text-white" href="#secao-{index}">{title}</a></li>' for index, title in enumerate(titles)
+    )
+    yield PAGE_TAIL.format(sidebar=SIDEBAR_TEMPLATE.format(content=sidebar) if sidebar else "", toc=toc)
 
 class WebGenerator:
     """Classe para gerar páginas web interativas a partir de LaTeX."""
 
-    def __init__(self, llm_model_name: str = GEMINI_MODEL_NAME):
+    def __init__(self, llm_model_name: str = GEMINI_MODEL_NAME, gateway: Optional[KeyedLLMGateway] = None):
         self.llm_model_name = llm_model_name
+        # Chamadas ao Gemini com a chave da sessão (None usa o gateway compartilhado com a chave do ambiente)
+        self.gateway = gateway if gateway is not None else get_llm_gateway().bind(None)
 
     def generate_interactive_page(self, latex_input: str) -> str:
         """Gera uma página HTML interativa a partir do código LaTeX."""
         try:
-            model = genai.GenerativeModel(model_name=self.llm_model_name)
-            response = model.generate_content([LATEX_INSIGHTS_PROMPT, latex_input])
-            return response.text
+            return self.gateway.generate(self.llm_model_name, LATEX_INSIGHTS_PROMPT, latex_input)
         except Exception as e:
             logger.error(f"Erro ao gerar página web interativa: {e}", exc_info=True)
             st.error(f"Ocorreu um erro ao gerar a página interativa: {e}")
-            return ""
\ No newline at end of file
+            return ""
+
+    def generate_sidebar_insight(self, latex_input: str) -> str:
+        """Pede ao LLM apenas a visualização interativa da barra lateral ("" em caso de falha)."""
+        try:
+            fragment = self.gateway.generate(self.llm_model_name, WEB_SIDEBAR_PROMPT, latex_input[:WEB_SIDEBAR_MAX_INPUT_CHARS])
+            return _FENCE_RE.sub("", fragment).strip()
+        except Exception as e:
+            logger.warning(f"Visualização interativa não gerada: {e}")
+            st.warning(f"Não foi possível gerar a visualização interativa ({e}); a página segue sem ela.")
+            return ""
+
+    def render_local_page(self, latex_input: str, with_insights: bool = False) -> str:
+        """
+        Gera a página localmente, sem LLM para o conteúdo: template, índice, títulos, parágrafos e
+        fórmulas (KaTeX). Com with_insights, uma única chamada ao LLM produz a visualização da barra lateral.
+        """
+        sidebar = self.generate_sidebar_insight(latex_input) if with_insights else ""
+        return "".join(iter_page_html(split_latex_sections(latex_input), sidebar))
+
+    def _generate_section(self, section: LatexSection, preamble: str = "") -> str:
+        latex = f"\\section{{{section.title}}}\n{section.body}" if section.title else section.body
+        if preamble:
+            # As macros do preâmbulo (\\newcommand etc.) acompanham cada seção, como na página inteira
+            latex = f"{preamble}\n{WEB_SECTION_SEPARATOR}\n{latex}"
+        fragment = self.gateway.generate(self.llm_model_name, WEB_SECTION_PROMPT, latex)
+        return _FENCE_RE.sub("", fragment).strip()
+
+    def stream_interactive_page(self, latex_input: str, max_workers: int = WEB_SECTION_MAX_WORKERS) -> Iterator[PageUpdate]:
+        """
+        Gera a página seção por seção. O esqueleto (template, índice e o texto de cada seção
+        convertido localmente) é entregue de imediato; a versão interativa de cada seção é pedida
+        ao LLM em paralelo e cada seção concluída produz uma nova versão da página. Uma seção que
+        falhar mantém a conversão local, sem interromper as demais.
+        """
+        start = time.perf_counter()
+        sections = split_latex_sections(latex_input)
+        preamble = latex_preamble(latex_input)
+        local = [render_latex_html(section.body) for section in sections]
+        contents = {index: html_body + "\n" + PENDING_NOTE for index, html_body in enumerate(local)}
+        yield PageUpdate("".join(iter_page_html(sections, contents=contents)), 0, len(sections), time.perf_counter() - start)
+
+        completed = 0
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-section") as executor:
+            futures = {executor.submit(self._generate_section, section, preamble): index for index, section in enumerate(sections)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    contents[index] = future.result()
+                except Exception as e:
+                    logger.warning(f"Falha ao gerar a seção {index + 1} da página interativa: {e}")
+                    contents[index] = local[index]
+                completed += 1
+                yield PageUpdate("".join(iter_page_html(sections, contents=contents)), completed, len(sections), time.perf_counter() - start)
+
+        logger.info(f"Página interativa gerada: {len(sections)} seções em {time.perf_counter() - start:.2f}s.")
@@ -0,0 +1,160 @@
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+# Os módulos da aplicação são importados como no Streamlit, a partir de src/
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(_ROOT, "src"))
+# PDFs sintéticos e clientes falsos dos benchmarks, reaproveitados nos testes
+sys.path.insert(0, os.path.join(_ROOT, "benchmarks"))
+
+# Compilador LaTeX falso: registra os argumentos de cada execução, gera o formato (-ini), o .log,
+# um .aux que muda nas primeiras execuções e o PDF, conforme o arquivo de controle
+_FAKE_LATEX = """\
+#!{python}
+import hashlib, json, os, sys, time
+with open({control!r}) as f:
+    control = json.load(f)
+args = sys.argv[1:]
+if control.get("pid_file"):
+    with open(control["pid_file"], "w") as f:
+        f.write(str(os.getpid()))
+with open(control["calls"], "a") as f:
+    f.write(json.dumps(args) + "\\n")
+jobname = next(arg.split("=", 1)[1] for arg in args if arg.startswith("-jobname="))
+if "-ini" in args:
+    time.sleep(control.get("format_sleep", 0))
+    if control.get("format_fails"):
+        sys.exit(1)
+    with open(jobname + ".fmt", "w") as f:
+        f.write("formato")
+    sys.exit(0)
+with open(args[-1]) as f:
+    source = f.read()
+time.sleep(control.get("sleep", 0))
+aux_path = jobname + ".aux"
+previous = int(open(aux_path).read()) if os.path.exists(aux_path) else 0
+with open(aux_path, "w") as f:
+    f.write(str(min(previous + 1, control.get("aux_changes", 1))))
+with open(jobname + ".log", "w") as f:
+    f.write("This is fakeTeX\\n(./" + jobname + ".tex\\n")
+    if "\\\\erro" in source:
+        f.write("! Undefined control sequence.\\nl.3 \\\\erro\\n\\n)\\n")
+        sys.exit(1)
+    f.write(")\\n")
+if "\\\\semPaginas" not in source:
+    with open(jobname + ".pdf", "w") as f:
+        f.write("%PDF-falso " + hashlib.sha256(source.encode()).hexdigest())
+"""
+
+class FakeLatex:
+    def __init__(self, directory):
+        self.control_path = str(directory / "controle.json")
+        self.calls_path = str(directory / "chamadas.jsonl")
+        self.path = str(directory / "fakelatex")
+        self.set()
+        with open(self.path, "w") as f:
+            f.write(_FAKE_LATEX.format(python=sys.executable, control=self.control_path))
+        os.chmod(self.path, os.stat(self.path).st_mode | stat.S_IEXEC)
+
+    def set(self, **control):
+        with open(self.control_path, "w") as f:
+            json.dump({"calls": self.calls_path, **control}, f)
+
+    def calls(self):
+        if not os.path.exists(self.calls_path):
+            return []
+        with open(self.calls_path) as f:
+            return [json.loads(line) for line in f]
+
+    def runs(self):
+        """Execuções de compilação (sem as de geração do formato)."""
+        return [args for args in self.calls() if "-ini" not in args]
+
+@pytest.fixture
+def fake_latex(tmp_path):
+    directory = tmp_path / "fakelatex"
+    directory.mkdir()
+    return FakeLatex(directory)
+
+class FakeEmbeddings:
+    """Embeddings determinísticos de duas dimensões, sem servidor. Registra os textos embedados."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+@pytest.fixture
+def vector_store_paths(tmp_path, monkeypatch):
+    """Arquivos do banco vetorial e índices lexicais em um diretório temporário."""
+    import lexical_index
+    lexical_directory = tmp_path / "lexical"
+    lexical_directory.mkdir()
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIRECTORY", str(lexical_directory))
+    return {
+        "persist_directory": str(tmp_path / "vectors"),
+        "access_log_path": str(tmp_path / "access.sqlite3"),
+        "catalog_path": str(tmp_path / "catalog.sqlite3"),
+        "lock_path": str(tmp_path / "vector_store.lock"),
+        "lexical_directory": str(lexical_directory),
+    }
+
+@pytest.fixture
+def make_vector_store(vector_store_paths):
+    """Cria VectorStoreManager sobre os arquivos temporários."""
+    from vector_store import VectorStoreManager
+
+    def make(**kwargs):
+        return VectorStoreManager(
+            vector_store_paths["persist_directory"],
+            access_log_path=vector_store_paths["access_log_path"],
+            catalog_path=vector_store_paths["catalog_path"],
+            lock_path=vector_store_paths["lock_path"],
+            **kwargs
+        )
+    return make
+
+class LatexConversion:
+    """Converte PDFs sintéticos com LatexTools contra o cliente Gemini falso dos benchmarks."""
+
+    def __init__(self, tmp_path):
+        self.tmp_path = tmp_path
+        self._stores = 0
+
+    def new_store(self, table="conversion_checkpoints"):
+        from disk_cache import SQLiteLRUCache
+        self._stores += 1
+        return SQLiteLRUCache(str(self.tmp_path / f"{table}_{self._stores}.sqlite3"), 10_000, table=table)
+
+    def tools(self, client, checkpoints):
+        from latex_tools import LatexTools
+        from llm_gateway import LLMGateway
+        return LatexTools("fake-model", gateway=LLMGateway(lambda api_key: client, self.new_store("llm_responses")).bind("fake-key"), checkpoints=checkpoints)
+
+    def convert(self, client, checkpoints, upload):
+        return self.tools(client, checkpoints).convert_pdf_to_latex(upload)
+
+@pytest.fixture
+def latex_conversion(tmp_path, monkeypatch):
+    """Blocos de 2 páginas, 4 blocos simultâneos e novas tentativas sem espera."""
+    import latex_tools
+    monkeypatch.setattr(latex_tools, "LATEX_PAGES_PER_BLOCK", 2)
+    monkeypatch.setattr(latex_tools, "LATEX_CONVERSION_MAX_WORKERS", 4)
+    monkeypatch.setattr(latex_tools, "LATEX_CONVERSION_RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(latex_tools, "LATEX_MERGE_MODE", "hierarchical")
+    return LatexConversion(tmp_path)
+
+@pytest.fixture
+def fake_genai():
+    """Cliente Gemini falso dos benchmarks, sem latência nem falhas."""
+    from bench_latex_conversion import FakeGenAI
+    return FakeGenAI(0.0, 0.0)
@@ -0,0 +1,82 @@
+import pytest
+
+import answer_cache
+from answer_cache import SemanticAnswerCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+def _cache(**overrides):
+    options = dict(similarity_threshold=0.9, ttl_seconds=60, max_entries=8)
+    options.update(overrides)
+    return SemanticAnswerCache(**options)
+
+def test_similar_questions_above_the_threshold_share_the_answer():
+    cache = _cache()
+    cache.store("pdfs_a:fp", "O que é spin?", [1.0, 0.0], "momento angular intrínseco", 2.0)
+
+    # cos = 0.995 acima do limiar; cos = 0.8 abaixo
+    assert cache.lookup("pdfs_a:fp", "Defina spin", [1.0, 0.1]) == "momento angular intrínseco"
+    assert cache.lookup("pdfs_a:fp", "O que é paridade?", [0.8, 0.6]) is None
+    # A mesma pergunta, a menos de caixa e espaços, dispensa o embedding
+    assert cache.lookup("pdfs_a:fp", "  o que É   spin? ") == "momento angular intrínseco"
+    # Outra impressão digital (outra coleção ou configuração) não compartilha respostas
+    assert cache.lookup("pdfs_b:fp", "O que é spin?", [1.0, 0.0]) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 1)
+    assert stats["latency_saved_s"] > 0
+
+def test_answers_without_embedding_match_only_the_same_question():
+    cache = _cache()
+    cache.store("pdfs_a:fp", "O que é spin?", None, "resposta", 1.0)
+    assert cache.lookup("pdfs_a:fp", "Defina spin", [1.0, 0.0]) is None
+    assert cache.lookup("pdfs_a:fp", "o que é spin?", [1.0, 0.0]) == "resposta"
+
+def test_entries_expire_after_ttl(clock):
+    cache = _cache(ttl_seconds=60)
+    cache.store("pdfs_a:fp", "Pergunta 1", [1.0, 0.0], "r1", 1.0)
+    clock[0] += 30
+    cache.store("pdfs_a:fp", "Pergunta 2", [0.0, 1.0], "r2", 1.0)
+    clock[0] += 31
+
+    assert cache.lookup("pdfs_a:fp", "Pergunta 1") is None
+    assert cache.lookup("pdfs_a:fp", "Outra", [1.0, 0.0]) is None
+    assert cache.lookup("pdfs_a:fp", "Outra", [0.0, 1.0]) == "r2"
+    assert cache.stats()["entries"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = _cache(max_entries=2)
+    cache.store("pdfs_a:fp", "Pergunta 1", [1.0, 0.0], "r1", 1.0)
+    cache.store("pdfs_a:fp", "Pergunta 2", [0.0, 1.0], "r2", 1.0)
+    assert cache.lookup("pdfs_a:fp", "Pergunta 1") == "r1"
+    cache.store("pdfs_a:fp", "Pergunta 3", [-1.0, 0.0], "r3", 1.0)
+
+    assert cache.lookup("pdfs_a:fp", "Pergunta 2") is None
+    assert cache.lookup("pdfs_a:fp", "Pergunta 1") == "r1"
+    assert cache.lookup("pdfs_a:fp", "Pergunta 3") == "r3"
+
+def test_storing_the_same_question_replaces_the_answer():
+    cache = _cache()
+    cache.store("pdfs_a:fp", "Pergunta", [1.0, 0.0], "antiga", 1.0)
+    cache.store("pdfs_a:fp", "pergunta", [1.0, 0.0], "nova", 1.0)
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup("pdfs_a:fp", "Parecida", [1.0, 0.05]) == "nova"
+
+def test_invalidate_drops_only_the_collection_prefix():
+    cache = _cache()
+    cache.store("pdfs_a:fp1", "Pergunta", [1.0, 0.0], "a1", 1.0)
+    cache.store("pdfs_a:fp2", "Pergunta", [1.0, 0.0], "a2", 1.0)
+    # "pdfs_ab" começa com "pdfs_a", mas é outra coleção
+    cache.store("pdfs_ab:fp1", "Pergunta", [1.0, 0.0], "ab", 1.0)
+
+    cache.invalidate("pdfs_a")
+    assert cache.lookup("pdfs_a:fp1", "Pergunta") is None
+    assert cache.lookup("pdfs_a:fp2", "Pergunta") is None
+    assert cache.lookup("pdfs_ab:fp1", "Pergunta") == "ab"
+
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
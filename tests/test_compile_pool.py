@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+import pytest
+
+import latex_compiler
+from latex_compiler import CompilePool, CompileQueueFullError, CompileResult, LatexCompiler
+
+_DOCUMENT = "\\documentclass{article}\n\\begin{document}\nTexto %d.\n\\end{document}\n"
+
+class _BlockingCompiler:
+    """Compilador que só termina quando o teste libera, para controlar a fila."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def compile(self, source, name):
+        self.release.wait(5)
+        return CompileResult(True, None, "ok", 1, 0.0)
+
+    def prune_builds(self):
+        return 0
+
+def _wait_done(pool, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = pool.poll(job_id)
+        if job.state == "concluído":
+            return job
+        time.sleep(0.01)
+    raise AssertionError("compilação não terminou")
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.01)
+
+def test_full_queue_refuses_new_jobs_until_one_finishes():
+    compiler = _BlockingCompiler()
+    pool = CompilePool(compiler, workers=1, max_queue=2)
+    first = pool.submit(_DOCUMENT % 1, "a")
+    pool.submit(_DOCUMENT % 2, "b")
+    with pytest.raises(CompileQueueFullError):
+        pool.submit(_DOCUMENT % 3, "c")
+
+    compiler.release.set()
+    assert _wait_done(pool, first).result.success
+    pool.submit(_DOCUMENT % 3, "c")
+
+def test_unpolled_results_expire_after_the_ttl():
+    compiler = _BlockingCompiler()
+    compiler.release.set()
+    pool = CompilePool(compiler, workers=1, max_queue=4, job_ttl_seconds=0.05)
+    job_id = pool.submit(_DOCUMENT % 1, "a")
+    _wait_for(lambda: pool._jobs[job_id].state == "concluído")
+    time.sleep(0.1)
+    # A próxima operação do pool descarta o resultado que ninguém consultou
+    pool.submit(_DOCUMENT % 2, "b")
+    with pytest.raises(KeyError):
+        pool.poll(job_id)
+
+def test_polled_result_is_delivered_once():
+    compiler = _BlockingCompiler()
+    compiler.release.set()
+    pool = CompilePool(compiler, workers=1)
+    job_id = pool.submit(_DOCUMENT % 1, "a")
+    _wait_done(pool, job_id)
+    with pytest.raises(KeyError):
+        pool.poll(job_id)
+
+def test_runaway_compile_is_killed_at_the_timeout(fake_latex, tmp_path):
+    pid_file = str(tmp_path / "latex.pid")
+    fake_latex.set(sleep=30, pid_file=pid_file)
+    compiler = LatexCompiler(str(tmp_path / "builds"), fake_latex.path, precompile_preamble=False, timeout_seconds=0.5, memory_limit_mb=None)
+    pool = CompilePool(compiler, workers=1)
+    start = time.monotonic()
+    job = _wait_done(pool, pool.submit(_DOCUMENT % 1, "infinito"))
+
+    assert not job.result.success
+    assert "excedeu o limite" in job.result.log
+    assert time.monotonic() - start < 10
+    with open(pid_file) as f:
+        pid = int(f.read())
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+def test_prune_does_not_touch_a_compile_in_progress(fake_latex, tmp_path):
+    compiler = LatexCompiler(str(tmp_path / "builds"), fake_latex.path, precompile_preamble=False, memory_limit_mb=None)
+    assert compiler.compile(_DOCUMENT % 1, "notas").success
+    work_root = tmp_path / "builds" / ".work"
+
+    fake_latex.set(sleep=1)
+    pool = CompilePool(compiler, workers=1)
+    job_id = pool.submit(_DOCUMENT % 2, "notas")
+    _wait_for(lambda: len(fake_latex.runs()) == 3) # a passada do compilador começou
+    work_dirs = os.listdir(work_root)
+
+    # Tudo está velho ou acima do orçamento: o build persistente é podado, o trabalho em andamento não
+    compiler.prune_builds(max_age_seconds=0, max_bytes=0)
+    assert os.listdir(work_root) == work_dirs != []
+    job = _wait_done(pool, job_id)
+    assert job.result.success
+    assert job.result.pdf_data.startswith(b"%PDF-falso")
+    assert os.path.exists(job.result.pdf_path)
+
+def test_pruned_builds_release_their_locks(fake_latex, tmp_path):
+    compiler = LatexCompiler(str(tmp_path / "builds"), fake_latex.path, precompile_preamble=False, memory_limit_mb=None)
+    result = compiler.compile(_DOCUMENT % 1, "notas")
+    build_dir = os.path.abspath(os.path.dirname(result.pdf_path))
+    assert build_dir in latex_compiler._dir_locks
+
+    assert compiler.prune_builds(max_age_seconds=0, max_bytes=0) > 0
+    assert not os.path.exists(build_dir)
+    assert build_dir not in latex_compiler._dir_locks
+
+def test_abandoned_work_dirs_are_pruned(fake_latex, tmp_path):
+    compiler = LatexCompiler(str(tmp_path / "builds"), fake_latex.path, precompile_preamble=False, memory_limit_mb=None)
+    abandoned = tmp_path / "builds" / ".work" / "notas_abandonado"
+    abandoned.mkdir(parents=True)
+    (abandoned / "notas.aux").write_text("1")
+    old = time.time() - 3600
+    os.utime(abandoned, (old, old))
+    compiler.prune_builds(max_age_seconds=60, max_bytes=10 ** 9)
+    assert not abandoned.exists()
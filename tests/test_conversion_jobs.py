@@ -0,0 +1,49 @@
+import conversion_jobs
+import latex_tools
+from bench_latex_conversion import FakeGenAI, FakeUpload
+from conversion_jobs import ConversionJob
+from synthetic_pdf import build_pdf
+
+# 7 páginas em blocos de 2: (1, 2), (3, 4), (5, 6), (7, 7)
+_UPLOAD = FakeUpload("manuscrito.pdf", build_pdf(7, lines_per_page=3))
+_RANGES = [(1, 2), (3, 4), (5, 6), (7, 7)]
+
+def test_resume_redoes_only_missing_blocks_and_completed_pdf_makes_no_calls(latex_conversion):
+    checkpoints = latex_conversion.new_store()
+
+    broken = FakeGenAI(0.0, 0.0, broken="_pags_3_a_")
+    assert latex_conversion.convert(broken, checkpoints, _UPLOAD) == ""
+    # 3 blocos convertidos e gravados; o quebrado esgotou as novas tentativas
+    assert broken.uploads == 3 + latex_tools.LATEX_CONVERSION_MAX_RETRIES + 1
+    assert not broken.uploaded
+
+    resumed = FakeGenAI(0.0, 0.0)
+    latex = latex_conversion.convert(resumed, checkpoints, _UPLOAD)
+    assert resumed.uploads == 1
+    # O bloco ausente e as 3 fronteiras
+    assert resumed.calls == 1 + 3
+    sections = [line for line in latex.splitlines() if line.startswith("\\section")]
+    assert sections == [f"\\section{{manuscrito_pags_{first}_a_{last}.pdf}}" for first, last in _RANGES]
+
+    again = FakeGenAI(0.0, 0.0)
+    assert latex_conversion.convert(again, checkpoints, _UPLOAD) == latex
+    assert again.calls == again.uploads == 0
+
+def test_single_block_pdf_is_checkpointed_too(latex_conversion):
+    checkpoints = latex_conversion.new_store()
+    upload = FakeUpload("curto.pdf", build_pdf(2, lines_per_page=3))
+    first = FakeGenAI(0.0, 0.0)
+    assert latex_conversion.convert(first, checkpoints, upload) == "\\section{curto.pdf}"
+    again = FakeGenAI(0.0, 0.0)
+    assert latex_conversion.convert(again, checkpoints, upload) == "\\section{curto.pdf}"
+    assert (first.calls, again.calls) == (1, 0)
+
+def test_checkpoints_are_keyed_by_model_and_prompt(latex_conversion, monkeypatch):
+    store = latex_conversion.new_store()
+    ConversionJob("pdf", "modelo-a", 2, store).save_block((1, 2), "\\section{A}")
+    assert ConversionJob("pdf", "modelo-a", 2, store).completed_blocks(_RANGES) == {(1, 2): "\\section{A}"}
+    assert ConversionJob("pdf", "modelo-b", 2, store).completed_blocks(_RANGES) == {}
+    assert ConversionJob("outro", "modelo-a", 2, store).completed_blocks(_RANGES) == {}
+
+    monkeypatch.setattr(conversion_jobs, "LATEX_CONVERSION_PROMPT", "Prompt revisado")
+    assert ConversionJob("pdf", "modelo-a", 2, store).completed_blocks(_RANGES) == {}
@@ -0,0 +1,72 @@
+import itertools
+
+import pytest
+
+import disk_cache
+from disk_cache import SQLiteLRUCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Instantes de acesso distintos e crescentes, para que a ordem LRU seja determinística
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(disk_cache.time, "time", lambda: float(next(ticks)))
+
+def _cache(tmp_path, max_entries=3):
+    return SQLiteLRUCache(str(tmp_path / "cache.sqlite3"), max_entries, table="teste")
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = _cache(tmp_path)
+    for key in "abc":
+        cache.set(key, key.encode())
+    assert cache.get("a") == b"a" # "a" passa a ser a mais recente
+    cache.set("d", b"d")
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert [key for key, _ in cache.items_by_access()] == ["c", "a", "d"]
+
+def test_replacing_a_key_does_not_count_as_a_new_entry(tmp_path, clock):
+    cache = _cache(tmp_path)
+    for key in "abc":
+        cache.set(key, b"1")
+    cache.set_many({"a": b"2", "b": b"2", "c": b"2"})
+    assert len(cache) == 3
+    assert cache.get_many("abc") == {"a": b"2", "b": b"2", "c": b"2"}
+
+def test_batch_larger_than_the_limit_keeps_the_newest(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.set("velha", b"0")
+    cache.set_many({key: key.encode() for key in "wxyz"})
+    assert len(cache) == 3
+    assert cache.get("velha") is None
+
+def test_count_survives_deletes_clear_and_reopening(tmp_path, clock):
+    cache = _cache(tmp_path)
+    for key in "abc":
+        cache.set(key, b"1")
+    cache.delete_many(["a", "inexistente"])
+    cache.set("d", b"1")
+    assert len(cache) == 3
+    assert cache.get("b") == b"1" # com a contagem certa, nada foi despejado
+
+    reopened = _cache(tmp_path)
+    reopened.set("e", b"1")
+    assert len(reopened) == 3
+    assert reopened.get("c") is None # "b" foi lida depois de "c"
+
+    reopened.clear()
+    for key in "xyz":
+        reopened.set(key, b"1")
+    assert len(reopened) == 3
+    assert reopened.get_many("xyz").keys() == set("xyz")
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("a", b"1")
+    cache.get("a")
+    cache.get_many(["a", "b", "c", "a"]) # chaves repetidas contam uma vez
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 1)
+    assert stats["hit_ratio"] == 0.5
+    cache.clear()
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
@@ -0,0 +1,40 @@
+from disk_cache import SQLiteLRUCache
+from embedding_cache import CachedEmbeddings
+
+class _CountingEmbeddings:
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+
+    def embed_documents(self, texts):
+        self.documents.extend(texts)
+        return [[float(len(text)), 0.1] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 0.2]
+
+def _embeddings(tmp_path):
+    embedder = _CountingEmbeddings()
+    cache = SQLiteLRUCache(str(tmp_path / "embeddings.sqlite3"), 100, table="embeddings")
+    return embedder, CachedEmbeddings(embedder, "modelo", cache)
+
+def test_only_missing_documents_reach_the_model(tmp_path):
+    embedder, embeddings = _embeddings(tmp_path)
+    first = embeddings.embed_documents(["a", "bb", "a"])
+    second = embeddings.embed_documents(["bb", "ccc"])
+
+    assert embedder.documents == ["a", "bb", "ccc"]
+    assert second[0] == first[1]
+    assert first[0] == first[2]
+    stats = embeddings.cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+def test_queries_and_documents_use_distinct_keys(tmp_path):
+    embedder, embeddings = _embeddings(tmp_path)
+    embeddings.embed_documents(["momento angular"])
+    query = embeddings.embed_query("momento angular")
+    assert embeddings.embed_query("momento angular") == query
+    assert embedder.queries == ["momento angular"]
+    # Vetores devolvidos já em float32, iguais aos que virão do cache
+    assert query == [15.0, embeddings.embed_query("momento angular")[1]]
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from ingestion import embed_batches, iter_batches
+
+class _SlowEmbeddings:
+    """Embedder falso: o vetor codifica o texto e o atraso é definido por texto."""
+
+    def __init__(self, delays=None, gate=None):
+        self.delays = delays or {}
+        self.gate = gate
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            time.sleep(self.delays.get(texts[0], 0))
+            return [[float(text.split("-")[0]), float(text.split("-")[1])] for text in texts]
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def _batches(count, size=2):
+    chunks = [(f"id{b}-{i}", Document(page_content=f"{b}-{i}")) for b in range(count) for i in range(size)]
+    return list(iter_batches(chunks, size))
+
+def test_vectors_stay_paired_with_their_batch_out_of_order():
+    # O primeiro lote é o mais lento: termina depois dos seguintes
+    embeddings = _SlowEmbeddings(delays={"0-0": 0.3})
+    results = list(embed_batches(embeddings, _batches(4), max_workers=4, max_pending=4))
+
+    assert [batch[0][0] for batch, _ in results][-1] == "id0-0"
+    assert sorted(batch[0][0] for batch, _ in results) == ["id0-0", "id1-0", "id2-0", "id3-0"]
+    for batch, vectors in results:
+        assert vectors == [[float(doc.page_content.split("-")[0]), float(doc.page_content.split("-")[1])] for _, doc in batch]
+
+def test_producer_is_held_back_by_max_pending():
+    gate = threading.Event()
+    embeddings = _SlowEmbeddings(gate=gate)
+    pulled = []
+
+    def producer():
+        for batch in _batches(10):
+            pulled.append(batch)
+            yield batch
+
+    results = []
+    consumer = threading.Thread(
+        target=lambda: results.extend(embed_batches(embeddings, producer(), max_workers=2, max_pending=3))
+    )
+    consumer.start()
+    time.sleep(0.3)
+    # 3 lotes em voo mais o lote já retirado do produtor, à espera de uma vaga
+    assert len(pulled) == 4
+    assert embeddings.max_active == 2
+    gate.set()
+    consumer.join(5)
+
+    assert len(results) == 10
+    assert embeddings.max_active <= 2
+
+def test_embedding_errors_reach_the_caller():
+    class _Failing(_SlowEmbeddings):
+        def embed_documents(self, texts):
+            if texts[0] == "1-0":
+                raise RuntimeError("cota excedida")
+            return super().embed_documents(texts)
+
+    with pytest.raises(RuntimeError, match="cota excedida"):
+        list(embed_batches(_Failing(), _batches(3), max_workers=2, max_pending=2))
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from latex_compiler import LatexCompiler
+
+_PREAMBLE = "\\documentclass{article}\n\\usepackage{amsmath}\n"
+_DOCUMENT = _PREAMBLE + "\\begin{document}\nOlá, $E = mc^2$.\n\\end{document}\n"
+
+def _compiler(fake_latex, tmp_path, **kwargs):
+    kwargs.setdefault("precompile_preamble", False)
+    return LatexCompiler(str(tmp_path / "builds"), fake_latex.path, memory_limit_mb=None, **kwargs)
+
+def test_unchanged_source_reuses_the_previous_pdf(fake_latex, tmp_path):
+    compiler = _compiler(fake_latex, tmp_path)
+    first = compiler.compile(_DOCUMENT, "notas")
+    runs = len(fake_latex.runs())
+    second = compiler.compile(_DOCUMENT, "notas")
+
+    assert first.success and second.success
+    assert second.passes == 0
+    assert len(fake_latex.runs()) == runs
+    assert second.pdf_data == first.pdf_data
+    assert second.pdf_path == first.pdf_path
+
+def test_changed_source_is_recompiled(fake_latex, tmp_path):
+    compiler = _compiler(fake_latex, tmp_path)
+    first = compiler.compile(_DOCUMENT, "notas")
+    second = compiler.compile(_DOCUMENT.replace("Olá", "Oi"), "notas")
+    assert second.success and second.passes > 0
+    assert second.pdf_data != first.pdf_data
+
+@pytest.mark.parametrize("aux_changes, max_passes, expected_passes", [
+    (1, 5, 2), # o .aux é criado na primeira passada e se repete na segunda
+    (3, 5, 4),
+    (10, 3, 3), # nunca estabiliza: limitado por max_passes
+])
+def test_passes_stop_when_aux_files_are_stable(fake_latex, tmp_path, aux_changes, max_passes, expected_passes):
+    fake_latex.set(aux_changes=aux_changes)
+    result = _compiler(fake_latex, tmp_path, max_passes=max_passes).compile(_DOCUMENT, "notas")
+    assert result.success
+    assert result.passes == expected_passes == len(fake_latex.runs())
+
+def test_build_aux_files_carry_over_between_compiles(fake_latex, tmp_path):
+    fake_latex.set(aux_changes=2)
+    compiler = _compiler(fake_latex, tmp_path)
+    assert compiler.compile(_DOCUMENT, "notas").passes == 3
+    # O .aux do build já está estável: uma passada basta para a nova versão
+    assert compiler.compile(_DOCUMENT.replace("Olá", "Oi"), "notas").passes == 1
+
+def test_previous_pdf_does_not_count_as_success(fake_latex, tmp_path):
+    compiler = _compiler(fake_latex, tmp_path)
+    assert compiler.compile(_DOCUMENT, "notas").success
+    # O compilador termina sem erro mas não gera páginas: o PDF copiado do build não pode valer
+    result = compiler.compile(_DOCUMENT.replace("Olá", "\\semPaginas"), "notas")
+    assert not result.success
+    assert result.pdf_path is None
+    assert "PDF não encontrado" in result.log
+
+def test_compile_error_returns_diagnostics(fake_latex, tmp_path):
+    result = _compiler(fake_latex, tmp_path).compile(_DOCUMENT.replace("Olá", "\\erro"), "notas")
+    assert not result.success
+    assert result.passes == 1
+    assert [(record.message, record.line) for record in result.diagnostics.errors] == [("Undefined control sequence.", 3)]
+
+def test_preamble_format_is_built_once_and_used(fake_latex, tmp_path):
+    compiler = _compiler(fake_latex, tmp_path, precompile_preamble=True)
+    assert compiler.compile(_DOCUMENT, "notas").success
+    assert compiler.compile(_DOCUMENT.replace("Olá", "Oi"), "notas").success
+    ini_calls = [args for args in fake_latex.calls() if "-ini" in args]
+    assert len(ini_calls) == 1
+    assert all("-fmt=notas_preambulo" in args for args in fake_latex.runs())
+
+def test_format_failure_falls_back_and_is_remembered(fake_latex, tmp_path):
+    fake_latex.set(format_fails=True)
+    compiler = _compiler(fake_latex, tmp_path, precompile_preamble=True)
+    assert compiler.compile(_DOCUMENT, "notas").success
+    assert compiler.compile(_DOCUMENT.replace("Olá", "Oi"), "notas").success
+    assert len([args for args in fake_latex.calls() if "-ini" in args]) == 1
+    assert not any(arg.startswith("-fmt=") for args in fake_latex.runs() for arg in args)
+
+def test_format_timeout_falls_back_and_is_remembered(fake_latex, tmp_path):
+    fake_latex.set(format_sleep=30)
+    compiler = _compiler(fake_latex, tmp_path, precompile_preamble=True, timeout_seconds=1)
+    first = compiler.compile(_DOCUMENT, "notas")
+    assert first.success, first.log
+    assert compiler.compile(_DOCUMENT.replace("Olá", "Oi"), "notas").success
+    assert len([args for args in fake_latex.calls() if "-ini" in args]) == 1
+    assert not any(arg.startswith("-fmt=") for args in fake_latex.runs() for arg in args)
+
+def test_missing_compiler_is_reported(tmp_path):
+    compiler = LatexCompiler(str(tmp_path / "builds"), str(tmp_path / "inexistente"), memory_limit_mb=None)
+    result = compiler.compile(_DOCUMENT, "notas")
+    assert not result.success
+    assert "não foi encontrado" in result.log
+
+def test_work_dirs_are_removed_after_compiling(fake_latex, tmp_path):
+    compiler = _compiler(fake_latex, tmp_path)
+    compiler.compile(_DOCUMENT, "notas")
+    compiler.compile(_DOCUMENT.replace("Olá", "\\erro"), "notas")
+    assert os.listdir(tmp_path / "builds" / ".work") == []
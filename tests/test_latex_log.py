@@ -0,0 +1,89 @@
+from latex_log import BAD_BOX, ERROR, UNDEFINED_REFERENCE, parse_log_lines
+
+# Log do pdflatex (sem -file-line-error) de main.tex com \input{capitulo1}, que por sua vez faz
+# \input{secoes/detalhe}; os trechos citados após o erro e a caixa têm parênteses desbalanceados
+_NESTED_INPUT_LOG = r"""This is pdfTeX, Version 3.141592653-2.6-1.40.25 (TeX Live 2023) (preloaded format=pdflatex)
+entering extended mode
+**main.tex
+(./main.tex
+LaTeX2e <2022-11-01> patch level 1
+(/usr/share/texlive/texmf-dist/tex/latex/base/article.cls
+Document Class: article 2022/07/02 v1.4n Standard LaTeX document class
+(/usr/share/texlive/texmf-dist/tex/latex/base/size10.clo
+File: size10.clo 2022/07/02 v1.4n Standard LaTeX file (size option)
+))
+(./main.aux) (./capitulo1.tex
+Overfull \hbox (12.34pt too wide) in paragraph at lines 3--4
+[]\OT1/cmr/m/n/10 Um texto (com parêntese aberto
+ []
+
+
+LaTeX Warning: Reference `eq:x' on page 1 undefined on input line 5.
+
+(./secoes/detalhe.tex
+! Undefined control sequence.
+l.2 \foo
+        (x
+The control sequence at the end of the top line
+of your error message was never \def'ed.
+
+)
+Underfull \hbox (badness 10000) in paragraph at lines 7--7
+
+ []
+
+)
+
+LaTeX Warning: Citation `knuth' on page 1 undefined on input line 12.
+
+! Missing $ inserted.
+<inserted text>
+                $
+l.14 a^
+       2
+
+[1] (./main.aux) )
+Output written on main.pdf (1 page, 12345 bytes).
+""".splitlines()
+
+def _by_message(parsed):
+    return {record.message: record for record in parsed.records}
+
+def test_messages_are_attributed_to_the_innermost_open_file():
+    records = _by_message(parse_log_lines(_NESTED_INPUT_LOG))
+
+    overfull = records["Overfull \\hbox (12.34pt too wide)"]
+    assert (overfull.kind, overfull.file, overfull.line) == (BAD_BOX, "./capitulo1.tex", 3)
+    reference = next(record for message, record in records.items() if "eq:x" in message)
+    assert (reference.kind, reference.file, reference.line) == (UNDEFINED_REFERENCE, "./capitulo1.tex", 5)
+    undefined = records["Undefined control sequence."]
+    assert (undefined.kind, undefined.file, undefined.line) == (ERROR, "./secoes/detalhe.tex", 2)
+
+def test_messages_after_an_input_returns_go_to_the_parent_file():
+    records = _by_message(parse_log_lines(_NESTED_INPUT_LOG))
+
+    underfull = records["Underfull \\hbox (badness 10000)"]
+    assert (underfull.file, underfull.line) == ("./capitulo1.tex", 7)
+    citation = next(record for message, record in records.items() if "knuth" in message)
+    assert (citation.file, citation.line) == ("./main.tex", 12)
+    missing = records["Missing $ inserted."]
+    assert (missing.file, missing.line) == ("./main.tex", 14)
+
+def test_file_line_errors_keep_their_own_location():
+    parsed = parse_log_lines([
+        "(./main.tex (./capitulo1.tex",
+        "./capitulo1.tex:3: Undefined control sequence.",
+        "l.3 \\foo(",
+        "",
+        ")",
+        "./main.tex:9: Missing $ inserted.",
+        "l.9 a^",
+        "",
+        "Overfull \\hbox (1.0pt too wide) in paragraph at lines 10--10",
+        "",
+    ])
+    assert [(record.kind, record.file, record.line) for record in parsed.records] == [
+        (ERROR, "./capitulo1.tex", 3),
+        (ERROR, "./main.tex", 9),
+        (BAD_BOX, "./main.tex", 10),
+    ]
@@ -0,0 +1,89 @@
+import threading
+
+from latex_merge import BOUNDARY_SEPARATOR, _boundary_windows, merge_latex_blocks, merge_preambles
+
+def _block(preamble, body):
+    return "\n".join(preamble + ["\\begin{document}"] + body + ["\\end{document}"])
+
+def _body(document):
+    lines = document.splitlines()
+    return lines[lines.index("\\begin{document}") + 1:lines.index("\\end{document}")]
+
+def _join(window):
+    # "LLM" determinístico: devolve a janela sem o separador
+    return "\n".join(line for line in window.splitlines() if line != BOUNDARY_SEPARATOR)
+
+def test_preambles_are_merged_without_repetition():
+    merged = merge_preambles([
+        ["\\documentclass[12pt]{article}", "\\usepackage[utf8]{inputenc}", "\\usepackage{amsmath,physics}",
+         "\\newcommand{\\ket}[1]{|#1\\rangle}", "\\title{Notas}", "\\author{A}"],
+        ["\\documentclass{report}", "\\usepackage[latin1]{inputenc}", "\\usepackage{physics, braket}",
+         "\\renewcommand{\\ket}[1]{\\left|#1\\right\\rangle}", "\\title{Outro}", "\\date{2024}",
+         "\\setlength{\\parindent}{0pt}", "\\setlength{\\parindent}{0pt}"],
+    ])
+    assert merged == [
+        "\\documentclass[12pt]{article}",
+        "\\usepackage{amssymb,graphicx}",
+        "\\usepackage[utf8]{inputenc}",
+        "\\usepackage{amsmath,physics}",
+        "\\newcommand{\\ket}[1]{|#1\\rangle}",
+        "\\title{Notas}",
+        "\\author{A}",
+        "\\usepackage{braket}",
+        "\\date{2024}",
+        "\\setlength{\\parindent}{0pt}",
+    ]
+
+def test_missing_documentclass_gets_a_default():
+    assert merge_preambles([[], ["\\usepackage{amsmath}"]]) == [
+        "\\documentclass{article}", "\\usepackage{amssymb,graphicx}", "\\usepackage{amsmath}"
+    ]
+
+def test_maketitle_page_breaks_and_fences_are_removed():
+    parts = [
+        "```latex\n" + _block(["\\documentclass{article}", "\\title{T}"], ["\\maketitle", "Primeira.", "\\newpage"]) + "\n```",
+        _block(["\\documentclass{article}", "\\title{T}"], ["\\maketitle", "\\clearpage", "Segunda."]),
+        "Terceira, sem preâmbulo.",
+    ]
+    document = merge_latex_blocks(parts, None, window_lines=4, max_workers=2)
+    assert document.count("\\maketitle") == 1
+    assert "\\newpage" not in document and "\\clearpage" not in document and "```" not in document
+    assert document.count("\\documentclass") == 1
+    # Sem LLM, os blocos são apenas justapostos, separados por uma linha em branco
+    assert [line for line in _body(document) if line] == ["\\maketitle", "Primeira.", "Segunda.", "Terceira, sem preâmbulo."]
+
+def test_short_blocks_are_split_between_boundaries_without_overlap():
+    bodies = [[f"a{i}" for i in range(10)], ["b0", "b1", "b2"], [f"c{i}" for i in range(10)]]
+    assert _boundary_windows(bodies, 4) == [(4, 1), (2, 4)]
+    assert _boundary_windows(bodies[:2], 4) == [(4, 3)]
+
+def test_boundaries_receive_only_their_windows_and_every_line_is_kept():
+    bodies = [[f"a{i}" for i in range(10)], ["b0", "b1", "b2"], [f"c{i}" for i in range(10)]]
+    windows = []
+    lock = threading.Lock()
+
+    def resolve(window):
+        with lock:
+            windows.append(window)
+        return _join(window)
+
+    document = merge_latex_blocks([_block([], body) for body in bodies], resolve, window_lines=4, max_workers=2)
+
+    assert sorted(windows) == sorted([
+        "\n".join(["a6", "a7", "a8", "a9", BOUNDARY_SEPARATOR, "b0"]),
+        "\n".join(["b1", "b2", BOUNDARY_SEPARATOR, "c0", "c1", "c2", "c3"]),
+    ])
+    assert [line for line in _body(document) if line] == [line for body in bodies for line in body]
+
+def test_failed_boundary_falls_back_to_juxtaposition():
+    bodies = [[f"a{i}" for i in range(6)], [f"b{i}" for i in range(6)], [f"c{i}" for i in range(6)]]
+
+    def resolve(window):
+        if window.startswith("a"):
+            raise RuntimeError("cota excedida")
+        return "```latex\n" + _join(window).replace("b5\nc0", "b5 c0") + "\n```"
+
+    document = merge_latex_blocks([_block([], body) for body in bodies], resolve, window_lines=2, max_workers=2)
+    body = [line for line in _body(document) if line]
+    assert body == [f"a{i}" for i in range(6)] + [f"b{i}" for i in range(5)] + ["b5 c0"] + [f"c{i}" for i in range(1, 6)]
+    assert "```" not in document
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import latex_tools
+from bench_latex_conversion import FakeGenAI
+from conversion_jobs import ConversionJob
+from latex_tools import _with_retry
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(latex_tools.time, "sleep", delays.append)
+    monkeypatch.setattr(latex_tools.random, "random", lambda: 0.5)
+    monkeypatch.setattr(latex_tools, "LATEX_CONVERSION_RETRY_BASE_DELAY", 2.0)
+    monkeypatch.setattr(latex_tools, "LATEX_CONVERSION_MAX_RETRIES", 3)
+    return delays
+
+def _failing(times, error=None):
+    attempts = []
+
+    def operation():
+        attempts.append(len(attempts))
+        if len(attempts) <= times:
+            raise error or RuntimeError("503")
+        return "ok"
+    return operation, attempts
+
+def test_retry_backs_off_exponentially_until_success(sleeps):
+    operation, attempts = _failing(2)
+    assert _with_retry(operation, "teste") == "ok"
+    assert len(attempts) == 3
+    # base * 2^tentativa * (1 + jitter)
+    assert sleeps == [3.0, 6.0]
+
+def test_retry_gives_up_after_max_retries(sleeps):
+    operation, attempts = _failing(10)
+    with pytest.raises(RuntimeError, match="503"):
+        _with_retry(operation, "teste")
+    assert len(attempts) == 4
+    assert sleeps == [3.0, 6.0, 12.0]
+
+@pytest.mark.parametrize("error", [
+    RuntimeError("429 Too Many Requests"),
+    google_exceptions.ResourceExhausted("Quota exceeded"),
+    google_exceptions.ServiceUnavailable("Service Unavailable"),
+    google_exceptions.DeadlineExceeded("Deadline Exceeded"),
+    TimeoutError("timed out"),
+    ConnectionResetError("connection reset"),
+])
+def test_retry_repeats_transient_errors(sleeps, error):
+    operation, attempts = _failing(1, error)
+    assert _with_retry(operation, "teste") == "ok"
+    assert len(attempts) == 2
+    assert sleeps == [3.0]
+
+@pytest.mark.parametrize("error", [
+    ValueError("bloco vazio"),
+    RuntimeError("400 API key not valid"),
+    google_exceptions.InvalidArgument("API key not valid. Please pass a valid API key."),
+    google_exceptions.PermissionDenied("Permission denied"),
+])
+def test_retry_raises_permanent_errors_immediately(sleeps, error):
+    operation, attempts = _failing(10, error)
+    with pytest.raises(type(error)):
+        _with_retry(operation, "teste")
+    assert len(attempts) == 1
+    assert sleeps == []
+
+class _SlowFirstBlock(FakeGenAI):
+    """O primeiro bloco termina por último; os demais, na ordem inversa das páginas."""
+
+    def _generate_content(self, contents):
+        _, payload = contents
+        first_page = int(payload.display_name.split("_")[1])
+        time.sleep(0.3 if first_page == 1 else 0.02 * (10 - first_page))
+        return super()._generate_content(contents)
+
+def _blocks(count):
+    return [(f"b_{2 * i + 1}_.pdf", (2 * i + 1, 2 * i + 2), b"%PDF") for i in range(count)]
+
+class _RecordingJob(ConversionJob):
+    def __init__(self, store):
+        super().__init__("pdf", "fake-model", 2, store)
+        self.saved = []
+        self.lock = threading.Lock()
+
+    def save_block(self, page_range, latex):
+        with self.lock:
+            self.saved.append(page_range)
+        super().save_block(page_range, latex)
+
+def test_blocks_are_reassembled_in_page_order(latex_conversion):
+    client = _SlowFirstBlock(0.0, 0.0)
+    tools = latex_conversion.tools(client, None)
+    job = _RecordingJob(latex_conversion.new_store())
+    blocks = _blocks(4)
+
+    parts = tools._convert_blocks(job, blocks)
+
+    assert parts == [f"\\section{{{name}}}" for name, _, _ in blocks]
+    assert job.saved[-1] == (1, 2)
+    assert sorted(job.saved) == [page_range for _, page_range, _ in blocks]
+
+def test_checkpointed_blocks_are_not_resent_and_failures_keep_the_others(latex_conversion):
+    blocks = _blocks(4)
+    job = _RecordingJob(latex_conversion.new_store())
+    job.save_block((3, 4), "\\section{retomado}")
+    job.saved.clear()
+
+    client = FakeGenAI(0.0, 0.0, broken="b_5_")
+    with pytest.raises(RuntimeError, match="503"):
+        latex_conversion.tools(client, None)._convert_blocks(job, blocks)
+    assert sorted(job.saved) == [(1, 2), (7, 8)]
+    assert client.calls == 2 + latex_tools.LATEX_CONVERSION_MAX_RETRIES + 1
+
+    parts = latex_conversion.tools(FakeGenAI(0.0, 0.0), None)._convert_blocks(job, blocks)
+    assert parts == ["\\section{b_1_.pdf}", "\\section{retomado}", "\\section{b_5_.pdf}", "\\section{b_7_.pdf}"]
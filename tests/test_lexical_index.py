@@ -0,0 +1,174 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import lexical_index
+from lexical_index import LexicalIndex
+from retrieval import takes_lexical_fast_path
+
+_CHUNKS = [
+    "O momento angular orbital é quantizado. O operador hamiltoniano comuta com L^2 e o momento angular se conserva.",
+    "A precessão do momento angular em um campo magnético depende do hamiltoniano de interação e do momento angular de spin.",
+    "Os autovalores do momento angular total seguem as regras de adição; o hamiltoniano é invariante por rotações.",
+    "Para o oscilador harmônico o hamiltoniano é quadrático e o momento angular em duas dimensões é conservado.",
+    "A constante de Planck reduzida \\hbar define a escala: L_z = m \\hbar para o momento angular.",
+    "A energia do sistema é dada pela equação \\label{eq:energia} E = p^2/2m + V, com o hamiltoniano usual.",
+    "As matrizes de Pauli representam o spin 1/2 e satisfazem relações de comutação do momento angular.",
+    "O hamiltoniano de Zeeman desloca os níveis proporcionalmente ao momento angular projetado no campo.",
+]
+
+# Parágrafos genéricos, como os que formam a maior parte de um documento real
+_FILLER = (
+    "Nesta seção o que é discutido é o {topic}, que aparece em {n} exemplos do capítulo e que é "
+    "retomado no momento angular dos exercícios."
+)
+
+@pytest.fixture(scope="module")
+def index():
+    index = LexicalIndex()
+    for number, text in enumerate(_CHUNKS):
+        index.add(f"chunk-{number}", text)
+    for number in range(40):
+        topic = ("oscilador", "potencial", "espalhamento", "átomo de hidrogênio")[number % 4]
+        index.add(f"filler-{number}", _FILLER.format(topic=topic, n=number))
+    return index
+
+@pytest.mark.parametrize("query, expected", [
+    ("\\hbar", "chunk-4"),
+    ("o que é \\hbar", "chunk-4"),
+    ("eq:energia", "chunk-5"),
+])
+def test_rare_identifier_takes_fast_path(index, query, expected):
+    hits = index.search(query, 8)
+    assert hits[0].doc_id == expected
+    assert takes_lexical_fast_path(hits)
+
+@pytest.mark.parametrize("query", ["momento angular", "hamiltoniano", "o que é o momento angular"])
+def test_common_phrase_does_not_take_fast_path(index, query):
+    hits = index.search(query, 8)
+    assert hits
+    assert not takes_lexical_fast_path(hits)
+
+def test_unknown_terms_return_nothing(index):
+    assert index.search("cromodinâmica", 8) == []
+    assert not takes_lexical_fast_path([])
+
+def test_search_is_consistent_while_another_session_indexes():
+    index = LexicalIndex()
+    for number, text in enumerate(_CHUNKS):
+        index.add(f"chunk-{number}", text)
+    errors = []
+
+    def search():
+        try:
+            for _ in range(200):
+                assert index.search("o momento angular e o hamiltoniano", 8)
+        except Exception as e: # IndexError em doc_lengths sem o lock
+            errors.append(e)
+
+    searchers = [threading.Thread(target=search) for _ in range(4)]
+    for thread in searchers:
+        thread.start()
+    for number in range(2000):
+        index.add(f"novo-{number}", _FILLER.format(topic="hamiltoniano", n=number))
+    for thread in searchers:
+        thread.join()
+    assert not errors
+    assert len(index) == len(_CHUNKS) + 2000
+
+class _FakeCollection:
+    """Coleção Chroma falsa; com gate, a listagem dos IDs espera o evento (coleção grande)."""
+
+    def __init__(self, name, texts, gate=None):
+        self.name = name
+        self.texts = texts
+        self.gate = gate
+        self.listing = threading.Event()
+
+    def get(self, ids=None, include=()):
+        if ids is None:
+            self.listing.set()
+            if self.gate is not None:
+                assert self.gate.wait(10)
+            return {"ids": list(self.texts)}
+        return {"ids": ids, "documents": [self.texts[doc_id] for doc_id in ids]}
+
+def _db(collection):
+    return SimpleNamespace(_collection=collection)
+
+@pytest.fixture
+def lexical_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(lexical_index, "_indexes", {})
+    return tmp_path
+
+def test_syncing_one_collection_does_not_block_the_others(lexical_directory):
+    gate = threading.Event()
+    slow = _FakeCollection("pdfs_grande", {f"g{i}": _CHUNKS[i % 8] for i in range(50)}, gate)
+    fast = _FakeCollection("pdfs_pequena", {f"p{i}": text for i, text in enumerate(_CHUNKS)})
+    slow_sync = threading.Thread(target=lexical_index.sync_lexical_index, args=(_db(slow),))
+    slow_sync.start()
+    assert slow.listing.wait(5)
+
+    # Com a sincronização da coleção grande em andamento, as outras operações terminam
+    results = []
+
+    def other_collections():
+        index = lexical_index.get_lexical_index(_db(fast))
+        results.append((len(index), index.search("\\hbar", 1)[0].doc_id))
+        lexical_index.unload_lexical_index("pdfs_pequena")
+        lexical_index.drop_lexical_index("pdfs_outra")
+
+    others = threading.Thread(target=other_collections)
+    others.start()
+    others.join(2)
+    finished = not others.is_alive()
+    gate.set()
+    others.join(5)
+    assert finished
+    assert results == [(len(_CHUNKS), "p4")]
+    slow_sync.join(5)
+    assert len(lexical_index.get_lexical_index(_db(slow))) == 50
+    assert (lexical_directory / "pdfs_grande.bm25").exists()
+
+def test_search_waits_for_the_first_sync_of_its_collection(lexical_directory):
+    gate = threading.Event()
+    collection = _FakeCollection("pdfs_a", {f"c{i}": text for i, text in enumerate(_CHUNKS)}, gate)
+    syncing = threading.Thread(target=lexical_index.sync_lexical_index, args=(_db(collection),))
+    syncing.start()
+    assert collection.listing.wait(5)
+
+    results = []
+    searcher = threading.Thread(target=lambda: results.append(lexical_index.get_lexical_index(_db(collection)).search("\\hbar", 1)))
+    searcher.start()
+    searcher.join(0.2)
+    assert searcher.is_alive() # não devolve o índice ainda vazio
+    gate.set()
+    searcher.join(5)
+    syncing.join(5)
+    assert results[0][0].doc_id == "c4"
+
+def test_index_is_reloaded_from_disk_without_reindexing(lexical_directory):
+    collection = _FakeCollection("pdfs_a", {f"c{i}": text for i, text in enumerate(_CHUNKS)})
+    lexical_index.sync_lexical_index(_db(collection))
+    lexical_index.unload_lexical_index("pdfs_a")
+
+    collection.texts = dict(collection.texts, novo="Texto novo sobre o \\hbar reduzido.")
+    fetched = []
+    original_get = collection.get
+    collection.get = lambda ids=None, include=(): fetched.extend(ids or []) or original_get(ids, include)
+    index = lexical_index.get_lexical_index(_db(collection))
+    assert fetched == ["novo"]
+    assert len(index) == len(_CHUNKS) + 1
+
+def test_dropped_index_is_not_written_back(lexical_directory):
+    gate = threading.Event()
+    collection = _FakeCollection("pdfs_a", {f"c{i}": text for i, text in enumerate(_CHUNKS)}, gate)
+    syncing = threading.Thread(target=lexical_index.sync_lexical_index, args=(_db(collection),))
+    syncing.start()
+    assert collection.listing.wait(5)
+    lexical_index.drop_lexical_index("pdfs_a")
+    gate.set()
+    syncing.join(5)
+    assert not (lexical_directory / "pdfs_a.bm25").exists()
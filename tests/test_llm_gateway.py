@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+import llm_gateway
+from bench_latex_conversion import FakeGenAI
+from disk_cache import SQLiteLRUCache
+from llm_gateway import GenAIClient, LLMGateway
+
+class _ClientsByKey:
+    """Fábrica de clientes falsos: registra as chaves e falha com as inválidas."""
+
+    def __init__(self, latency=0.0, invalid=()):
+        self.latency = latency
+        self.invalid = set(invalid)
+        self.clients = {}
+
+    def __call__(self, api_key):
+        client = FakeGenAI(self.latency, 1.0 if api_key in self.invalid else 0.0)
+        self.clients.setdefault(api_key, []).append(client)
+        return client
+
+    def calls(self):
+        return sum(client.calls for clients in self.clients.values() for client in clients)
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteLRUCache(str(tmp_path / "llm.sqlite3"), 16, table="llm_responses")
+
+def test_each_key_gets_its_own_client_and_models(cache):
+    factory = _ClientsByKey()
+    gateway = LLMGateway(factory, cache)
+    first, second = gateway.bind("chave-a"), gateway.bind("chave-b")
+
+    assert first.client is gateway.bind("chave-a").client
+    assert first.client is not second.client
+    assert first.model("gemini") is first.model("gemini")
+    assert first.model("gemini") is not second.model("gemini")
+    assert {key: len(clients) for key, clients in factory.clients.items()} == {"chave-a": 1, "chave-b": 1}
+
+def test_a_mistyped_key_does_not_affect_the_corrected_one_or_other_sessions(cache):
+    factory = _ClientsByKey(invalid={"chave-errada"})
+    gateway = LLMGateway(factory, cache)
+    with pytest.raises(RuntimeError):
+        gateway.bind("chave-errada").generate("gemini", "Resuma", "texto")
+
+    assert gateway.bind("chave-certa").generate("gemini", "Resuma", "texto") == "texto"
+    assert gateway.bind("outra-chave").generate("gemini", "Resuma", "outro texto") == "outro texto"
+
+def test_least_recently_used_clients_are_dropped(cache, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_GATEWAY_MAX_CLIENTS", 2)
+    factory = _ClientsByKey()
+    gateway = LLMGateway(factory, cache)
+    for api_key in ("a", "b", "a", "c", "a", "b"):
+        gateway.bind(api_key).client
+    assert {key: len(clients) for key, clients in factory.clients.items()} == {"a": 1, "b": 2, "c": 1}
+
+def test_cached_responses_make_no_calls_and_are_shared_between_keys(cache, fake_genai):
+    gateway = LLMGateway(lambda api_key: fake_genai, cache)
+    assert gateway.bind("chave-a").generate("gemini", "Resuma", "texto") == "texto"
+    assert gateway.bind("chave-a").generate("gemini", "Resuma", "texto") == "texto"
+    assert gateway.bind("chave-b").generate("gemini", "Resuma", "texto") == "texto"
+    assert fake_genai.calls == 1
+
+    stats = gateway.stats()
+    assert (stats["calls"], stats["hits"], stats["coalesced"]) == (1, 2, 0)
+
+def test_model_or_prompt_changes_miss_the_cache(cache, fake_genai):
+    gateway = LLMGateway(lambda api_key: fake_genai, cache).bind("chave")
+    gateway.generate("gemini", "Resuma", "texto")
+    gateway.generate("gemini-pro", "Resuma", "texto")
+    gateway.generate("gemini", "Traduza", "texto")
+    gateway.generate("gemini", "Resuma", "texto 2")
+    assert fake_genai.calls == 4
+    assert gateway.stats()["misses"] == 4
+
+def test_concurrent_identical_requests_share_one_call(cache):
+    factory = _ClientsByKey(latency=0.3)
+    gateway = LLMGateway(factory, cache)
+    results = []
+    threads = [
+        threading.Thread(target=lambda api_key=api_key: results.append(gateway.bind(api_key).generate("gemini", "Resuma", "texto")))
+        for api_key in ("a", "b", "a", "c")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["texto"] * 4
+    assert factory.calls() == 1
+    assert (gateway.stats()["calls"], gateway.stats()["coalesced"]) == (1, 3)
+
+def test_failed_call_is_not_cached(cache):
+    factory = _ClientsByKey(invalid={"ruim"})
+    gateway = LLMGateway(factory, cache)
+    with pytest.raises(RuntimeError):
+        gateway.bind("ruim").generate("gemini", "Resuma", "texto")
+    assert gateway.bind("boa").generate("gemini", "Resuma", "texto") == "texto"
+    assert gateway.stats()["calls"] == 1
+
+def test_genai_client_does_not_touch_the_process_wide_configuration():
+    import google.generativeai.client as genai_client
+    global_options = genai_client._client_manager.client_config.get("client_options")
+    global_key = getattr(global_options, "api_key", None)
+
+    client = GenAIClient("chave-da-sessao")
+    model = client.GenerativeModel("gemini")
+    assert model._client is client._clients.get_default_client("generative")
+    assert client._clients.client_config["client_options"].api_key == "chave-da-sessao"
+    assert getattr(genai_client._client_manager.client_config.get("client_options"), "api_key", None) == global_key
@@ -0,0 +1,23 @@
+import pytest
+from langchain_community.document_loaders import PyPDFLoader
+
+from ingestion import extraction_executor, iter_pdf_page_windows
+from synthetic_pdf import write_pdf
+
+@pytest.fixture(scope="module")
+def pdf_paths(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("pdfs")
+    return [write_pdf(str(directory / f"arquivo_{i}.pdf"), pages, seed=i) for i, pages in enumerate((7, 3))]
+
+def _documents(pdf_paths, workers):
+    with extraction_executor(workers) as executor:
+        return [doc for _, pages in iter_pdf_page_windows(pdf_paths, 4, executor, max_pending=2) for doc in pages]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_windows_match_pypdf_loader(pdf_paths, workers):
+    expected = [doc for pdf_path in pdf_paths for doc in PyPDFLoader(pdf_path).load()]
+    documents = _documents(pdf_paths, workers)
+    assert [doc.page_content for doc in documents] == [doc.page_content for doc in expected]
+    assert [doc.metadata for doc in documents] == [
+        {"source": doc.metadata["source"], "page": doc.metadata["page"]} for doc in expected
+    ]
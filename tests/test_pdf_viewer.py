@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+import pdf_viewer
+from pdf_viewer import LazyPDFDocument, dpi_for_width
+from render_cache import RenderCache
+from synthetic_pdf import build_pdf
+
+@pytest.fixture
+def render_cache(tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / "render"), 64 * 2**20, image_format="PNG", workers=2)
+    monkeypatch.setattr(pdf_viewer, "get_render_cache", lambda: cache)
+    return cache
+
+def test_viewer_shows_placeholders_then_full_resolution(render_cache):
+    document = LazyPDFDocument("notas.pdf", build_pdf(4, lines_per_page=5), cache_pages=8)
+    width_px = 400
+    full_dpi = dpi_for_width(document.page_widths[0], width_px)
+    assert full_dpi > pdf_viewer.PDF_VIEWER_PLACEHOLDER_DPI
+
+    provisional = document.render_pages(0, 2, width_px, placeholder=True)
+    deadline = time.monotonic() + 10
+    while document.pending(0, 2, width_px):
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    final = document.render_pages(0, 2, width_px, placeholder=True)
+
+    assert final[0].width > provisional[0].width
+    assert not document.pending(0, 2, width_px)
+    # As provisórias não ficam no LRU em memória; as definitivas sim
+    assert set(document._cache) == {(0, full_dpi), (1, full_dpi)}
+
+def test_memory_lru_keeps_the_most_recent_pages(render_cache):
+    document = LazyPDFDocument("notas.pdf", build_pdf(4, lines_per_page=5), cache_pages=2)
+    dpi = dpi_for_width(document.page_widths[0], 200)
+    document.render_pages(0, 2, 200)
+    document.render_pages(0, 1, 200)
+    document.render_pages(2, 3, 200)
+    assert list(document._cache) == [(0, dpi), (2, dpi)]
@@ -0,0 +1,217 @@
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+import rag_core
+from answer_cache import SemanticAnswerCache
+from rag_core import RAGCore, invalidate_chain_cache
+
+_ANSWER = "O momento angular se conserva porque o hamiltoniano é invariante por rotações."
+_QUESTION = "Por que o momento angular se conserva?"
+
+class _FakeEmbeddings:
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+@pytest.fixture
+def answer_cache(monkeypatch):
+    cache = SemanticAnswerCache(similarity_threshold=0.95, ttl_seconds=3600, max_entries=16)
+    monkeypatch.setattr(rag_core, "get_answer_cache", lambda: cache)
+    return cache
+
+@pytest.fixture
+def vector_db(monkeypatch):
+    # O retriever real depende do Chroma e do Ollama; aqui o contexto é fixo
+    context = [Document(page_content="O hamiltoniano comuta com L^2.")]
+    monkeypatch.setattr(rag_core, "build_retriever", lambda vector_db, llm, mode: RunnableLambda(lambda question: context))
+    invalidate_chain_cache()
+    yield SimpleNamespace(_collection=SimpleNamespace(name="pdfs_teste", count=lambda: 1))
+    invalidate_chain_cache()
+
+def _rag(answer=_ANSWER):
+    rag = RAGCore.__new__(RAGCore)
+    rag.llm = FakeListChatModel(responses=[answer])
+    rag.embeddings = _FakeEmbeddings()
+    return rag
+
+def test_stream_question_yields_incrementally_and_fills_cache(answer_cache, vector_db):
+    rag = _rag()
+    fingerprint = rag._collection_fingerprint(vector_db)
+    stream = rag.stream_question(_QUESTION, vector_db)
+
+    first = next(stream)
+    assert first and first != _ANSWER
+    # A resposta só entra no cache quando o streaming termina
+    assert answer_cache.lookup(fingerprint, _QUESTION) is None
+
+    chunks = [first, *stream]
+    assert len(chunks) > 1
+    assert "".join(chunks) == _ANSWER
+    assert answer_cache.lookup(fingerprint, _QUESTION) == _ANSWER
+
+def test_stream_question_matches_process_question(monkeypatch, vector_db):
+    # Caches separados: a segunda pergunta também passa pela cadeia
+    stream_cache, invoke_cache = SemanticAnswerCache(0.95, 3600, 16), SemanticAnswerCache(0.95, 3600, 16)
+    monkeypatch.setattr(rag_core, "get_answer_cache", lambda: stream_cache)
+    streamed = "".join(_rag().stream_question(_QUESTION, vector_db))
+    invalidate_chain_cache()
+    monkeypatch.setattr(rag_core, "get_answer_cache", lambda: invoke_cache)
+    assert streamed == _rag().process_question(_QUESTION, vector_db)
+
+def test_stream_question_answers_from_cache(answer_cache, vector_db):
+    rag = _rag()
+    assert "".join(rag.stream_question(_QUESTION, vector_db)) == _ANSWER
+    # A mesma pergunta, com outra caixa e espaços, é respondida pelo cache sem chamar o LLM
+    rag.llm = FakeListChatModel(responses=["resposta que não deveria aparecer"])
+    invalidate_chain_cache()
+    assert list(rag.stream_question("  por que o MOMENTO angular se conserva? ", vector_db)) == [_ANSWER]
+
+class _KeyedChatModel(FakeListChatModel):
+    google_api_key: str = ""
+
+def test_sessions_with_different_keys_do_not_share_chains(answer_cache, vector_db):
+    first, second = _rag(), _rag()
+    first.llm = _KeyedChatModel(responses=["resposta com a chave A"], google_api_key="chave-a")
+    second.llm = _KeyedChatModel(responses=["resposta com a chave B"], google_api_key="chave-b")
+    assert first._get_chain(vector_db) is not second._get_chain(vector_db)
+    assert second._get_chain(vector_db).invoke(_QUESTION) == "resposta com a chave B"
+    # Mesma chave: a cadeia compilada é reaproveitada
+    third = _rag()
+    third.llm = _KeyedChatModel(responses=["outra"], google_api_key="chave-a")
+    assert third._get_chain(vector_db) is first._get_chain(vector_db)
+
+def test_chain_is_built_outside_the_cache_lock(monkeypatch, answer_cache, vector_db):
+    def build_retriever(vector_db, llm, mode):
+        # Outra sessão precisa conseguir consultar o cache enquanto o retriever é construído
+        assert rag_core._chain_cache_lock.acquire(blocking=False)
+        rag_core._chain_cache_lock.release()
+        return RunnableLambda(lambda question: [])
+    monkeypatch.setattr(rag_core, "build_retriever", build_retriever)
+    assert _rag()._get_chain(vector_db).invoke(_QUESTION) == _ANSWER
+
+@pytest.fixture(scope="module")
+def split_pdfs(tmp_path_factory):
+    from synthetic_pdf import write_pdf
+    directory = tmp_path_factory.mktemp("split")
+    paths = [write_pdf(str(directory / f"arquivo_{i}.pdf"), pages, seed=i) for i, pages in enumerate((5, 2))]
+    return paths, [(SimpleNamespace(name=f"arquivo_{i}.pdf"), f"hash{i}") for i in range(len(paths))]
+
+def _whole_document_ids(pdf_paths, pending_files, fingerprint):
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=rag_core.CHUNK_SIZE, chunk_overlap=rag_core.CHUNK_OVERLAP)
+    ids = []
+    for pdf_path, (_, file_hash) in zip(pdf_paths, pending_files):
+        chunks = splitter.split_documents(PyPDFLoader(pdf_path).load())
+        ids += [rag_core._chunk_id(file_hash, fingerprint, index, chunk.page_content) for index, chunk in enumerate(chunks)]
+    return ids
+
+class _CollectionWith:
+    def __init__(self, stored_ids=()):
+        self.stored_ids = set(stored_ids)
+
+    def get(self, ids, include):
+        return {"ids": [chunk_id for chunk_id in ids if chunk_id in self.stored_ids]}
+
+def _windowed_chunks(monkeypatch, split_pdfs, window_pages, vector_db):
+    pdf_paths, pending_files = split_pdfs
+    monkeypatch.setattr(rag_core, "INGESTION_PAGE_WINDOW", window_pages)
+    progress = []
+    chunks = list(RAGCore.__new__(RAGCore)._iter_new_chunks(
+        vector_db, pending_files, pdf_paths, "fp", None, 7, lambda done, total: progress.append((done, total))
+    ))
+    return chunks, progress
+
+@pytest.mark.parametrize("window_pages", [1, 3, 100])
+def test_windowed_chunk_ids_match_whole_document_split(monkeypatch, split_pdfs, window_pages):
+    pdf_paths, pending_files = split_pdfs
+    expected = _whole_document_ids(pdf_paths, pending_files, "fp")
+    chunks, progress = _windowed_chunks(monkeypatch, split_pdfs, window_pages, _CollectionWith())
+
+    assert [chunk_id for chunk_id, _ in chunks] == expected
+    assert progress[-1] == (7, 7)
+    assert {chunk.metadata["source"] for _, chunk in chunks} == {"arquivo_0.pdf", "arquivo_1.pdf"}
+
+def test_chunks_already_stored_are_skipped(monkeypatch, split_pdfs):
+    pdf_paths, pending_files = split_pdfs
+    expected = _whole_document_ids(pdf_paths, pending_files, "fp")
+    stored = set(expected[::2])
+    chunks, _ = _windowed_chunks(monkeypatch, split_pdfs, 2, _CollectionWith(stored))
+    assert [chunk_id for chunk_id, _ in chunks] == [chunk_id for chunk_id in expected if chunk_id not in stored]
+
+class _Upload(io.BytesIO):
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+@pytest.fixture
+def ingestion(make_vector_store, monkeypatch):
+    """RAGCore sobre um banco vetorial temporário, contando leituras de PDF e embeddings."""
+    from conftest import FakeEmbeddings
+    monkeypatch.setattr(rag_core, "PDF_EXTRACTION_WORKERS", 1)
+    opened = []
+    real_windows = rag_core.iter_pdf_page_windows
+
+    def iter_pdf_page_windows(pdf_paths, *args, **kwargs):
+        opened.extend(pdf_paths)
+        return real_windows(pdf_paths, *args, **kwargs)
+
+    monkeypatch.setattr(rag_core, "iter_pdf_page_windows", iter_pdf_page_windows)
+    rag = RAGCore.__new__(RAGCore)
+    rag.embeddings = FakeEmbeddings()
+    rag.vector_stores = make_vector_store()
+    return SimpleNamespace(rag=rag, opened=opened)
+
+def test_reuploads_are_not_reparsed_or_reembedded(ingestion):
+    from synthetic_pdf import build_pdf
+    first_pdf, second_pdf = build_pdf(3, lines_per_page=8, seed=1), build_pdf(2, lines_per_page=8, seed=2)
+
+    lease = ingestion.rag.create_vector_db_from_files([_Upload("a.pdf", first_pdf)], tenant="inquilino")
+    first_count = len(ingestion.rag.embeddings.embedded)
+    assert first_count == lease.vector_db._collection.count() > 0
+    lease.release()
+
+    # Os mesmos bytes (com outro nome): mesma coleção, nenhuma leitura e nenhum embedding
+    ingestion.opened.clear()
+    again = ingestion.rag.create_vector_db_from_files([_Upload("copia.pdf", first_pdf)], tenant="inquilino")
+    assert again.name == lease.name
+    assert ingestion.opened == [] and len(ingestion.rag.embeddings.embedded) == first_count
+    again.release()
+
+    # Um arquivo a mais: nova coleção, em que só o arquivo novo é lido e embedado
+    both = ingestion.rag.create_vector_db_from_files(
+        [_Upload("a.pdf", first_pdf), _Upload("b.pdf", second_pdf)], tenant="inquilino"
+    )
+    assert both.name != lease.name
+    assert len(ingestion.opened) == 1
+    new_texts = ingestion.rag.embeddings.embedded[first_count:]
+    assert new_texts and len(new_texts) == both.vector_db._collection.count() - first_count
+    assert len(both.vector_db.get(where={"source": "b.pdf"})["ids"]) == len(new_texts)
+    both.release()
+
+def test_collection_name_is_stable_across_processes_and_tracks_settings(monkeypatch):
+    import subprocess
+    import sys
+    script = (
+        "import sys; sys.path.insert(0, 'src'); import rag_core; "
+        "print(rag_core._collection_name_for(['h2', 'h1'], rag_core._ingestion_fingerprint()))"
+    )
+    names = {
+        subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True,
+            cwd=os.path.join(os.path.dirname(__file__), ".."), env=dict(os.environ, PYTHONHASHSEED=str(seed))
+        ).stdout.strip().splitlines()[-1]
+        for seed in (1, 2)
+    }
+    assert names == {rag_core._collection_name_for(["h1", "h2"], rag_core._ingestion_fingerprint())}
+
+    fingerprint = rag_core._ingestion_fingerprint()
+    for setting, value in (("CHUNK_SIZE", rag_core.CHUNK_SIZE + 1), ("CHUNK_OVERLAP", 0), ("EMBEDDING_MODEL", "outro-modelo")):
+        with monkeypatch.context() as patch:
+            patch.setattr(rag_core, setting, value)
+            assert rag_core._ingestion_fingerprint() != fingerprint
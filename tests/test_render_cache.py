@@ -0,0 +1,123 @@
+import io
+import os
+import random
+import threading
+import time
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+
+import render_cache
+from render_cache import RenderCache, content_hash, page_content_hashes
+from synthetic_pdf import build_pdf
+
+_PDF = build_pdf(3, lines_per_page=5)
+
+def _wait_rendered(cache, pdf_hash, requests, timeout=10):
+    deadline = time.monotonic() + timeout
+    while cache.rendering(pdf_hash, requests):
+        assert time.monotonic() < deadline, "renderização em segundo plano não terminou"
+        time.sleep(0.02)
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(str(tmp_path / "render"), 64 * 2**20, image_format="PNG", workers=2)
+
+def test_placeholder_is_returned_until_full_resolution_is_ready(cache):
+    pdf_hash = content_hash(_PDF)
+    requests = [(0, 144), (1, 144)]
+
+    first = cache.get_or_placeholder(_PDF, pdf_hash, requests, placeholder_dpi=48)
+    assert [final for _, final in first] == [False, False]
+    _wait_rendered(cache, pdf_hash, requests)
+    second = cache.get_or_placeholder(_PDF, pdf_hash, requests, placeholder_dpi=48)
+
+    assert [final for _, final in second] == [True, True]
+    # 144 DPI é o triplo da resolução provisória
+    assert second[0][0].width == pytest.approx(3 * first[0][0].width, abs=3)
+
+def test_requests_at_placeholder_resolution_are_final(cache):
+    pdf_hash = content_hash(_PDF)
+    [(_, final)] = cache.get_or_placeholder(_PDF, pdf_hash, [(2, 48)], placeholder_dpi=48)
+    assert final and not cache.rendering(pdf_hash, [(2, 48)])
+
+def test_page_in_flight_is_rendered_once(cache, monkeypatch):
+    gate = threading.Event()
+    rendered = []
+    real_render_pages = render_cache.render_pages
+
+    def render_pages(source, requests):
+        if any(dpi > 48 for _, dpi in requests):
+            rendered.extend(requests)
+            gate.wait(5)
+        return real_render_pages(source, requests)
+
+    monkeypatch.setattr(render_cache, "render_pages", render_pages)
+    pdf_hash = content_hash(_PDF)
+    cache.prefetch(_PDF, pdf_hash, [(0, 96), (1, 96)])
+    cache.prefetch(_PDF, pdf_hash, [(0, 96)])
+    placeholders = cache.get_or_placeholder(_PDF, pdf_hash, [(0, 96), (1, 96)], placeholder_dpi=48)
+    assert cache.rendering(pdf_hash, [(1, 96)])
+
+    gate.set()
+    _wait_rendered(cache, pdf_hash, [(0, 96), (1, 96)])
+    assert sorted(rendered) == [(0, 96), (1, 96)]
+    assert [final for _, final in placeholders] == [False, False]
+    assert cache._inflight == {}
+    # Já em disco: outro prefetch não agenda nada
+    cache.prefetch(_PDF, pdf_hash, [(0, 96)])
+    assert cache._inflight == {}
+
+def _noise(seed):
+    rng = random.Random(seed)
+    return Image.frombytes("RGB", (48, 48), bytes(rng.getrandbits(8) for _ in range(48 * 48 * 3)))
+
+def test_least_recently_read_images_are_evicted_first(tmp_path):
+    cache = RenderCache(str(tmp_path / "render"), 64 * 2**20, image_format="PNG", workers=1)
+    for page_index in range(3):
+        cache._put("pdf", page_index, 96, _noise(page_index))
+        os.utime(cache._path("pdf", page_index, 96), (100 * (page_index + 1),) * 2)
+    size = os.path.getsize(cache._path("pdf", 0, 96))
+    assert cache.get("pdf", 0, 96) is not None # a página 0 passa a ser a mais recente
+
+    # Com a quarta imagem o total passa do orçamento; o despejo volta a 90% dele
+    cache.max_bytes = int(3.5 * size)
+    cache._put("pdf", 3, 96, _noise(3))
+
+    remaining = {page_index for page_index in range(4) if os.path.exists(cache._path("pdf", page_index, 96))}
+    assert remaining == {0, 2, 3}
+    assert cache.stats()["bytes"] == sum(os.path.getsize(cache._path("pdf", page_index, 96)) for page_index in remaining)
+    # O total sobrevive à reabertura do diretório
+    assert RenderCache(cache.directory, cache.max_bytes, image_format="PNG").stats()["bytes"] == cache.stats()["bytes"]
+
+def _recompiled(subset_prefix, edited_page=None, rotated_page=None):
+    """
+    Simula uma recompilação do mesmo documento: o prefixo de subconjunto da fonte muda (como no
+    pdflatex quando algum glifo novo aparece) e, opcionalmente, uma página é editada ou girada.
+    """
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(_PDF)))
+    for page in writer.pages:
+        font = page["/Resources"]["/Font"]["/F1"].get_object()
+        font[NameObject("/BaseFont")] = NameObject(f"/{subset_prefix}+Helvetica")
+    if edited_page is not None:
+        contents = writer.pages[edited_page].get_contents()
+        contents.set_data(contents.get_data() + b" BT /F1 10 Tf 50 50 Td (Pagina editada) Tj ET")
+        writer.pages[edited_page].replace_contents(contents)
+    if rotated_page is not None:
+        writer.pages[rotated_page].rotate(90)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def test_page_hashes_survive_a_recompile_except_for_edited_pages():
+    before = page_content_hashes(_recompiled("AAAAAA"))
+    unchanged = page_content_hashes(_recompiled("BBBBBB"))
+    edited = page_content_hashes(_recompiled("CCCCCC", edited_page=1))
+    rotated = page_content_hashes(_recompiled("AAAAAA", rotated_page=2))
+
+    assert len(set(before)) == 3
+    assert unchanged == before
+    assert [edited[0], edited[2]] == [before[0], before[2]] and edited[1] != before[1]
+    assert rotated[:2] == before[:2] and rotated[2] != before[2]
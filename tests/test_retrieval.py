@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+import retrieval
+from retrieval import QueryRetriever, build_retriever, reciprocal_rank_fusion
+
+def _doc(name):
+    return Document(page_content=name, metadata={"source": "notas.pdf", "page": 0})
+
+class _FakeVectorDB:
+    """Resultados fixos por consulta: {consulta: [(nome, pontuação), ...]}."""
+
+    def __init__(self, results, on_search=None):
+        self.results = results
+        self.on_search = on_search
+        self.queries = []
+
+    def similarity_search_with_relevance_scores(self, query, k):
+        self.queries.append(query)
+        if self.on_search:
+            self.on_search(query)
+        return [(_doc(name), score) for name, score in self.results.get(query, [])][:k]
+
+class _FakeLLM:
+    """Reescreve qualquer pergunta nas variantes fixas, registrando as chamadas."""
+
+    def __init__(self, variants, on_call=None):
+        self.calls = 0
+        self.on_call = on_call
+        self.runnable = RunnableLambda(self._rewrite)
+        self.variants = variants
+
+    def _rewrite(self, prompt):
+        self.calls += 1
+        if self.on_call:
+            self.on_call()
+        return "\n".join(self.variants)
+
+_RESULTS = {
+    "pergunta": [("A", 0.9), ("B", 0.8), ("C", 0.7)],
+    "variante 1": [("B", 0.9), ("D", 0.8)],
+    "variante 2": [("D", 0.9), ("B", 0.8), ("E", 0.7)],
+}
+
+def _names(docs):
+    return [doc.page_content for doc in docs]
+
+def test_rrf_matches_hand_computed_ranks():
+    # k = 60: B = 1/62 + 1/61 + 1/62, D = 1/62 + 1/61, A = 1/61, C = E = 1/63 (empate: ordem de chegada)
+    rankings = [[_doc(name) for name in ranking] for ranking in (["A", "B", "C"], ["B", "D"], ["D", "B", "E"])]
+    assert _names(reciprocal_rank_fusion(rankings, top_k=4, k=60)) == ["B", "D", "A", "C"]
+    assert _names(reciprocal_rank_fusion(rankings, top_k=10, k=60)) == ["B", "D", "A", "C", "E"]
+
+def test_direct_never_rewrites():
+    llm = _FakeLLM(["variante 1"])
+    vector_db = _FakeVectorDB(_RESULTS)
+    docs = build_retriever(vector_db, llm.runnable, "direct").invoke("pergunta")
+    assert _names(docs) == ["A", "B", "C"]
+    assert llm.calls == 0
+    assert vector_db.queries == ["pergunta"]
+
+def test_parallel_multi_searches_while_rewriting_and_fuses_with_rrf():
+    # A busca direta e a reescrita só passam da barreira se estiverem em andamento ao mesmo tempo
+    barrier = threading.Barrier(2, timeout=5)
+    llm = _FakeLLM(["variante 1", "variante 2"], on_call=barrier.wait)
+    vector_db = _FakeVectorDB(_RESULTS, on_search=lambda query: barrier.wait() if query == "pergunta" else None)
+
+    docs = QueryRetriever(vector_db, llm.runnable, "parallel-multi", top_k=4).invoke("pergunta")
+
+    assert _names(docs) == ["B", "D", "A", "C"]
+    assert llm.calls == 1
+    assert sorted(vector_db.queries) == ["pergunta", "variante 1", "variante 2"]
+
+@pytest.mark.parametrize("top_score, rewrites", [(0.9, False), (0.5, False), (0.3, True)])
+def test_adaptive_rewrites_only_below_the_minimum_score(monkeypatch, top_score, rewrites):
+    monkeypatch.setattr(retrieval, "RAG_ADAPTIVE_MIN_SCORE", 0.5)
+    results = dict(_RESULTS, pergunta=[("A", top_score), ("B", 0.2), ("C", 0.1)])
+    llm = _FakeLLM(["variante 1", "variante 2"])
+
+    docs = QueryRetriever(_FakeVectorDB(results), llm.runnable, "adaptive", top_k=4).invoke("pergunta")
+
+    assert llm.calls == int(rewrites)
+    assert _names(docs) == (["B", "D", "A", "C"] if rewrites else ["A", "B", "C"])
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match="desconhecido"):
+        build_retriever(_FakeVectorDB({}), _FakeLLM([]).runnable, "semantico")
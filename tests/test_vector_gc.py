@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import time
+
+from conftest import FakeEmbeddings
+from vector_gc import VectorStoreGC, _ReadOnlyVectorStore, _read_catalog
+
+_DAY = 86400
+
+def _add_collection(manager, name, chunks=1, age_days=0.0):
+    lease = manager.open(name, FakeEmbeddings())
+    lease.vector_db._collection.add(
+        ids=[f"{name}-{i}" for i in range(chunks)],
+        embeddings=[[float(i), 1.0] for i in range(chunks)],
+        documents=["texto " * 50] * chunks
+    )
+    lease.release()
+    # Último acesso no passado, gravado direto no registro
+    manager.access_log._conn.execute(
+        "UPDATE collection_access SET last_access = ? WHERE key = ?", (time.time() - age_days * _DAY, name)
+    )
+
+def _snapshot(directory):
+    return {
+        os.path.join(root, name): (os.path.getsize(os.path.join(root, name)), os.path.getmtime(os.path.join(root, name)))
+        for root, _, files in os.walk(directory) for name in files
+    }
+
+def test_dry_run_only_reads(vector_store_paths, make_vector_store, tmp_path):
+    paths = vector_store_paths
+    manager = make_vector_store()
+    _add_collection(manager, "pdfs_antiga", age_days=40)
+    _add_collection(manager, "pdfs_recente")
+    before = _snapshot(tmp_path)
+
+    store = _ReadOnlyVectorStore(paths["persist_directory"], paths["access_log_path"])
+    report = VectorStoreGC(store, paths["lexical_directory"], max_age_seconds=30 * _DAY, max_bytes=None).collect(dry_run=True)
+
+    assert report.evicted == ["pdfs_antiga"]
+    assert _snapshot(tmp_path) == before
+    assert sorted(manager.collection_names()) == ["pdfs_antiga", "pdfs_recente"]
+
+def test_dry_run_does_not_create_missing_files(vector_store_paths, tmp_path):
+    paths = vector_store_paths
+    store = _ReadOnlyVectorStore(paths["persist_directory"], paths["access_log_path"])
+    report = VectorStoreGC(store, paths["lexical_directory"], max_age_seconds=_DAY, max_bytes=None).collect(dry_run=True)
+    assert report.evicted == []
+    assert sorted(os.listdir(tmp_path)) == ["lexical"]
+
+def _collector(vector_store_paths, manager, **kwargs):
+    return VectorStoreGC(manager, vector_store_paths["lexical_directory"], **kwargs)
+
+def _chroma_catalog(vector_store_paths):
+    return _read_catalog(os.path.join(vector_store_paths["persist_directory"], "chroma.sqlite3"))
+
+def test_old_collections_are_evicted_first_then_lru_until_within_budget(vector_store_paths, make_vector_store):
+    manager = make_vector_store()
+    for name, age_days in (("pdfs_recente", 1), ("pdfs_antiga", 40), ("pdfs_media", 20)):
+        _add_collection(manager, name, age_days=age_days)
+
+    by_age = _collector(vector_store_paths, manager, max_age_seconds=30 * _DAY, max_bytes=None)
+    assert by_age.collect(dry_run=True).evicted == ["pdfs_antiga"]
+    # Orçamento impossível: todas saem, das menos às mais usadas recentemente
+    by_size = _collector(vector_store_paths, manager, max_age_seconds=None, max_bytes=1)
+    assert by_size.collect(dry_run=True).evicted == ["pdfs_antiga", "pdfs_media", "pdfs_recente"]
+
+def test_budget_stops_evicting_once_it_fits(vector_store_paths, make_vector_store):
+    manager = make_vector_store()
+    for name, age_days in (("pdfs_recente", 1), ("pdfs_antiga", 40), ("pdfs_media", 20)):
+        _add_collection(manager, name, chunks=20, age_days=age_days)
+    collector = _collector(vector_store_paths, manager, max_age_seconds=None, max_bytes=None)
+    sizes = collector._collection_sizes(manager.collection_names(), _chroma_catalog(vector_store_paths))
+    collector.max_bytes = collector._disk_usage() - sizes["pdfs_antiga"] // 2
+    assert collector.collect(dry_run=True).evicted == ["pdfs_antiga"]
+
+def test_collections_in_use_are_never_evicted(vector_store_paths, make_vector_store):
+    manager = make_vector_store()
+    _add_collection(manager, "pdfs_antiga", age_days=40)
+    lease = manager.open("pdfs_antiga", FakeEmbeddings())
+    report = _collector(vector_store_paths, manager, max_age_seconds=30 * _DAY, max_bytes=1).collect()
+    assert report.evicted == []
+    assert manager.collection_names() == ["pdfs_antiga"]
+    lease.release()
+
+def test_collect_removes_evicted_collections_and_orphans(vector_store_paths, make_vector_store):
+    manager = make_vector_store()
+    _add_collection(manager, "pdfs_antiga", age_days=40)
+    _add_collection(manager, "pdfs_recente")
+    persist_directory = vector_store_paths["persist_directory"]
+    lexical_directory = vector_store_paths["lexical_directory"]
+    segments = _chroma_catalog(vector_store_paths).segments
+    evicted_segments = {segment for segment, name in segments.items() if name == "pdfs_antiga"}
+    kept_dirs = {
+        segment for segment, name in segments.items()
+        if name == "pdfs_recente" and os.path.isdir(os.path.join(persist_directory, segment))
+    }
+    assert kept_dirs
+
+    # Segmento HNSW sem coleção no catálogo do Chroma e índices lexicais de coleções inexistentes
+    orphan_segment = "0f0f0f0f-1111-2222-3333-444444444444"
+    os.makedirs(os.path.join(persist_directory, orphan_segment))
+    with open(os.path.join(persist_directory, orphan_segment, "data_level0.bin"), "wb") as f:
+        f.write(b"\0" * 4096)
+    for name in ("pdfs_fantasma", "pdfs_antiga", "pdfs_recente"):
+        with open(os.path.join(lexical_directory, f"{name}.bm25"), "wb") as f:
+            f.write(b"indice")
+    # Arquivos fora do padrão de segmentos não são tocados
+    os.makedirs(os.path.join(persist_directory, "nao-e-segmento"))
+
+    collector = _collector(vector_store_paths, manager, max_age_seconds=30 * _DAY, max_bytes=None)
+    preview = collector.collect(dry_run=True)
+    assert preview.orphan_segments == [orphan_segment]
+    assert preview.orphan_lexical == ["pdfs_fantasma"]
+    assert os.path.isdir(os.path.join(persist_directory, orphan_segment))
+
+    report = collector.collect()
+    assert report.evicted == ["pdfs_antiga"]
+    # O Chroma deixa para trás os diretórios da coleção removida, que viram órfãos na mesma coleta
+    assert orphan_segment in report.orphan_segments
+    assert set(report.orphan_segments) <= evicted_segments | {orphan_segment}
+    assert report.orphan_lexical == ["pdfs_fantasma"]
+    assert report.bytes_after < report.bytes_before
+    assert manager.collection_names() == ["pdfs_recente"]
+    assert sorted(os.listdir(lexical_directory)) == ["pdfs_recente.bm25"]
+    assert not os.path.exists(os.path.join(persist_directory, orphan_segment))
+    assert os.path.isdir(os.path.join(persist_directory, "nao-e-segmento"))
+    remaining = set(os.listdir(persist_directory))
+    assert not remaining & evicted_segments
+    assert kept_dirs <= remaining
+
+def test_segments_without_a_readable_catalog_are_kept(vector_store_paths, make_vector_store):
+    manager = make_vector_store()
+    collector = _collector(vector_store_paths, manager, max_age_seconds=None, max_bytes=None)
+    assert collector._orphan_segments(None, ["0f0f0f0f-1111-2222-3333-444444444444"]) == []
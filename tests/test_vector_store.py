@@ -0,0 +1,98 @@
+import gc
+
+import pytest
+
+import rag_core
+from conftest import FakeEmbeddings
+from rag_core import RAGCore
+
+@pytest.fixture
+def manager(make_vector_store):
+    return make_vector_store(idle_seconds=3600)
+
+def test_sessions_share_one_open_collection(manager):
+    first = manager.open("pdfs_a", FakeEmbeddings(), "inquilino1")
+    second = manager.open("pdfs_a", FakeEmbeddings(), "inquilino2")
+    assert first.vector_db is second.vector_db
+    assert manager.stats() == {"open_collections": 1, "leases": 2}
+
+    first.release()
+    first.release() # liberar duas vezes não conta duas vezes
+    assert manager.stats()["leases"] == 1
+    assert manager.in_use("pdfs_a")
+    second.release()
+    assert not manager.in_use("pdfs_a")
+
+def test_dropped_lease_is_released(manager):
+    lease = manager.open("pdfs_a", FakeEmbeddings())
+    assert manager.in_use("pdfs_a")
+    del lease
+    gc.collect()
+    assert not manager.in_use("pdfs_a")
+
+def test_only_idle_collections_are_closed(make_vector_store):
+    manager = make_vector_store(idle_seconds=0)
+    closed = []
+    manager.add_eviction_listener(closed.append)
+    busy = manager.open("pdfs_ocupada", FakeEmbeddings())
+    manager.open("pdfs_ociosa", FakeEmbeddings()).release()
+
+    assert manager.evict_idle() == ["pdfs_ociosa"]
+    assert closed == ["pdfs_ociosa"]
+    assert manager.stats() == {"open_collections": 1, "leases": 1}
+    # Fechar não apaga: a coleção continua no banco vetorial
+    assert "pdfs_ociosa" in manager.collection_names()
+    busy.release()
+
+def test_delete_if_unused_keeps_collections_in_use(manager):
+    removed = []
+    manager.add_eviction_listener(removed.append)
+    lease = manager.open("pdfs_a", FakeEmbeddings(), "inquilino1")
+    manager.record_files("pdfs_a", ["hash1"], "impressao")
+
+    assert not manager.delete_if_unused("pdfs_a")
+    assert "pdfs_a" in manager.collection_names()
+    assert removed == []
+
+    lease.release()
+    assert manager.delete_if_unused("pdfs_a")
+    assert "pdfs_a" not in manager.collection_names()
+    assert removed == ["pdfs_a"]
+    assert manager.collections_with_file("hash1", "impressao") == []
+    assert manager.tenant_collections("inquilino1") == []
+
+def test_release_tenant_returns_only_collections_left_without_owners(manager):
+    manager.open("pdfs_compartilhada", FakeEmbeddings(), "inquilino1").release()
+    manager.open("pdfs_compartilhada", FakeEmbeddings(), "inquilino2").release()
+    manager.open("pdfs_propria", FakeEmbeddings(), "inquilino1").release()
+
+    assert sorted(manager.tenant_collections("inquilino1")) == ["pdfs_compartilhada", "pdfs_propria"]
+    assert manager.release_tenant("inquilino1") == ["pdfs_propria"]
+    assert manager.tenant_collections("inquilino1") == []
+    assert manager.release_tenant("inquilino2") == ["pdfs_compartilhada"]
+
+def _rag(manager):
+    rag = RAGCore.__new__(RAGCore)
+    rag.vector_stores = manager
+    return rag
+
+def test_delete_tenant_data_keeps_collections_of_other_tenants(manager):
+    manager.open("pdfs_compartilhada", FakeEmbeddings(), "inquilino1").release()
+    manager.open("pdfs_compartilhada", FakeEmbeddings(), "inquilino2").release()
+    manager.open("pdfs_propria", FakeEmbeddings(), "inquilino1").release()
+
+    assert _rag(manager).delete_tenant_data("inquilino1") == 1
+    assert manager.collection_names() == ["pdfs_compartilhada"]
+    assert manager.tenant_collections("inquilino2") == ["pdfs_compartilhada"]
+
+def test_delete_tenant_data_leaves_open_collections_to_the_gc(manager, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(rag_core, "invalidate_chain_cache", invalidated.append)
+    lease = manager.open("pdfs_propria", FakeEmbeddings(), "inquilino1")
+
+    assert _rag(manager).delete_tenant_data("inquilino1") == 0
+    assert manager.collection_names() == ["pdfs_propria"]
+    assert invalidated == []
+    # Sem dono, a coleção fica para a coleta de lixo quando a sessão a liberar
+    assert manager.tenant_collections("inquilino1") == []
+    lease.release()
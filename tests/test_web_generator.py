@@ -0,0 +1,185 @@
+import re
+import threading
+
+import pytest
+
+from config import WEB_SECTION_SEPARATOR
+from web_generator import (
+    PENDING_NOTE,
+    LatexSection,
+    WebGenerator,
+    iter_page_html,
+    latex_preamble,
+    render_latex_html,
+    render_latex_inline,
+    split_latex_sections,
+)
+
+def test_url_is_escaped_for_the_href_attribute():
+    rendered = render_latex_inline('\\url{https://exemplo.com/?a=1&b="x" onmouseover="alert(1)}')
+    assert 'href="https://exemplo.com/?a=1&amp;b=&quot;x&quot; onmouseover=&quot;alert(1)"' in rendered
+    # As aspas só aparecem literalmente no texto do link, nunca dentro da tag
+    assert rendered.split(">", 1)[0].count('"') == 4
+
+def test_href_keeps_label_and_escapes_quotes():
+    rendered = render_latex_inline('\\href{https://exemplo.com/"x}{o \\textbf{site}}')
+    assert rendered == '<a class="text-blue-400 underline" href="https://exemplo.com/&quot;x">o <strong>site</strong></a>'
+
+@pytest.mark.parametrize("source", [
+    "\\href{javascript:alert(1)}{clique}",
+    "\\href{ JaVaScRiPt:alert(1)}{clique}",
+    "\\href{java\tscript:alert(1)}{clique}",
+    "\\href{data:text/html,<script>alert(1)</script>}{clique}",
+])
+def test_unsafe_schemes_render_as_text(source):
+    rendered = render_latex_inline(source)
+    assert "<a" not in rendered
+    assert "clique" in rendered
+
+def test_unsafe_url_keeps_escaped_text():
+    rendered = render_latex_inline("\\url{javascript:alert('<x>')}")
+    assert rendered == "javascript:alert('&lt;x&gt;')"
+
+_DOCUMENT = """\\documentclass{article}
+\\newcommand{\\ket}[1]{|#1\\rangle}
+\\begin{document}
+\\maketitle
+Texto de abertura.
+\\section{Spin}
+O estado $\\ket{\\uparrow}$.
+\\section*{Momento angular}
+Ver a seção anterior.
+\\section{Precessão}
+Campo magnético.
+\\end{document}
+"""
+
+class _FakeGateway:
+    """Responde cada seção pelo título; seções em hold aguardam o evento, as em fail falham."""
+
+    def __init__(self, hold=(), fail=()):
+        self.hold = hold
+        self.fail = fail
+        self.release = threading.Event()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def generate(self, model_name, prompt, content):
+        with self.lock:
+            self.requests.append(content)
+        title = re.search(r"\\section\{([^}]*)\}", content)
+        title = title.group(1) if title else "abertura"
+        if title in self.hold:
+            self.release.wait(5)
+        if title in self.fail:
+            raise RuntimeError("503")
+        return f"```html\n<p>LLM: {title}</p>\n```"
+
+def test_split_keeps_text_before_the_first_section_and_the_preamble_apart():
+    sections = split_latex_sections(_DOCUMENT)
+    assert [section.title for section in sections] == ["", "Spin", "Momento angular", "Precessão"]
+    assert len(sections) - 1 == _DOCUMENT.count("\\section")
+    assert sections[0].body == "Texto de abertura."
+    assert sections[1].body == "O estado $\\ket{\\uparrow}$."
+    assert latex_preamble(_DOCUMENT) == "\\documentclass{article}\n\\newcommand{\\ket}[1]{|#1\\rangle}"
+    assert split_latex_sections("Só texto, sem seções.") == [LatexSection("", "Só texto, sem seções.")]
+
+def test_sections_are_sent_with_the_preamble():
+    gateway = _FakeGateway()
+    list(WebGenerator("fake-model", gateway=gateway).stream_interactive_page(_DOCUMENT, max_workers=2))
+    assert len(gateway.requests) == 4
+    for request in gateway.requests:
+        preamble, section = request.split(f"\n{WEB_SECTION_SEPARATOR}\n")
+        assert "\\newcommand{\\ket}" in preamble and "\\newcommand" not in section
+
+def test_sections_stream_as_each_call_finishes():
+    gateway = _FakeGateway(hold={"Precessão"})
+    updates = WebGenerator("fake-model", gateway=gateway).stream_interactive_page(_DOCUMENT, max_workers=4)
+
+    skeleton = next(updates)
+    assert (skeleton.completed, skeleton.total) == (0, 4)
+    assert skeleton.html.count(PENDING_NOTE) == 4
+    assert "Texto de abertura." in skeleton.html
+
+    # Três seções chegam enquanto a última ainda espera o LLM
+    partial = [next(updates) for _ in range(3)]
+    assert [update.completed for update in partial] == [1, 2, 3]
+    assert partial[-1].html.count(PENDING_NOTE) == 1
+    assert "<p>LLM: Precessão</p>" not in partial[-1].html
+
+    gateway.release.set()
+    final = next(updates)
+    assert final.completed == 4
+    assert PENDING_NOTE not in final.html and "```" not in final.html
+    assert [title in final.html for title in ("LLM: abertura", "LLM: Spin", "LLM: Momento angular", "LLM: Precessão")] == [True] * 4
+    assert list(updates) == []
+
+    # Tempo até o primeiro conteúdo (esqueleto) e tempo total
+    elapsed = [update.elapsed for update in [skeleton] + partial + [final]]
+    assert elapsed == sorted(elapsed)
+    assert skeleton.elapsed < final.elapsed
+
+def test_failed_section_keeps_the_local_rendering():
+    gateway = _FakeGateway(fail={"Spin"})
+    updates = list(WebGenerator("fake-model", gateway=gateway).stream_interactive_page(_DOCUMENT, max_workers=2))
+
+    final = updates[-1]
+    assert final.completed == final.total == 4
+    assert "LLM: Spin" not in final.html
+    assert render_latex_html("O estado $\\ket{\\uparrow}$.") in final.html
+    assert "LLM: Precessão" in final.html
+
+def test_sections_become_anchored_h2_listed_in_the_toc():
+    page = "".join(iter_page_html(split_latex_sections("\\section{Spin $s$}\nTexto.\n\\subsection{Pauli}\nMatrizes.\n\\section{Ondas}\nMais.")))
+    assert re.findall(r'<section id="(secao-\d+)"', page) == ["secao-0", "secao-1"]
+    assert re.findall(r'<a class="hover:text-white" href="#(secao-\d+)">([^<]*)</a>', page) == [
+        ("secao-0", "Spin \\(s\\)"), ("secao-1", "Ondas")
+    ]
+    assert '<h2 class="text-2xl font-bold text-white border-b border-gray-700 pb-2">Spin \\(s\\)</h2>' in page
+    assert '<h3 class="text-xl font-semibold text-white mt-6">Pauli</h3>' in page
+    assert "<title>Spin s</title>" in page.replace("\\(", "").replace("\\)", "")
+
+def test_headings_inside_a_body():
+    rendered = render_latex_html("\\section*{Geral}\n\\subsection{Particular}\n\\subsubsection{Detalhe}")
+    assert rendered.splitlines() == [
+        '<h2 class="text-2xl font-bold text-white">Geral</h2>',
+        '<h3 class="text-xl font-semibold text-white mt-6">Particular</h3>',
+        '<h4 class="text-lg font-semibold text-white mt-4">Detalhe</h4>',
+    ]
+
+@pytest.mark.parametrize("source, expected", [
+    ("$a+b$", "\\(a+b\\)"),
+    ("\\(a+b\\)", "\\(a+b\\)"),
+    ("$$E = mc^2$$", "\\[E = mc^2\\]"),
+    ("\\[E = mc^2\\]", "\\[E = mc^2\\]"),
+    ("\\begin{equation}E = mc^2\\label{eq:energia}\\end{equation}", "\\[E = mc^2\\]"),
+    ("\\begin{align*}a &= b \\\\ c &= d\\end{align*}", "\\[\\begin{aligned}a &amp;= b \\\\ c &amp;= d\\end{aligned}\\]"),
+    ("Custa \\$5 e $x$", "Custa $5 e \\(x\\)"),
+])
+def test_math_uses_katex_delimiters(source, expected):
+    assert render_latex_inline(source) == expected
+
+def test_text_outside_math_is_escaped():
+    rendered = render_latex_html("Se <script>alert(1)</script> & \"aspas\", então $a < b$.")
+    assert "<script>" not in rendered
+    assert "&lt;script&gt;alert(1)&lt;/script&gt; &amp; \"aspas\"" in rendered
+    # Dentro da fórmula o KaTeX lê o texto já decodificado pelo navegador
+    assert "\\(a &lt; b\\)" in rendered
+
+def test_lists_are_rendered_with_nested_items_and_labels():
+    rendered = render_latex_html(
+        "\\begin{enumerate}\n\\item Primeiro $x$\n\\item[(b)] Segundo\n"
+        "\\begin{itemize}\n\\item Interno\n\\end{itemize}\n\\end{enumerate}"
+    )
+    assert rendered.startswith('<ol class="list-decimal ml-6 space-y-1">')
+    assert "<li>Primeiro \\(x\\)</li>" in rendered
+    # Item com sublista: o texto vira parágrafo e a sublista fica dentro do mesmo <li>
+    assert '<li><strong>(b)</strong> <p class="leading-relaxed">Segundo</p>\n<ul class="list-disc ml-6 space-y-1">\n<li>Interno</li>\n</ul></li>' in rendered
+    assert rendered.endswith("</ol>")
+
+def test_unknown_macros_keep_their_argument_and_comments_are_dropped():
+    rendered = render_latex_html("\\minhamacro[op]{texto \\textbf{forte}} e \\semargumento fim % comentário\n\n\\label{x}Depois")
+    assert rendered.splitlines() == [
+        '<p class="leading-relaxed">texto <strong>forte</strong> e  fim</p>',
+        '<p class="leading-relaxed">Depois</p>',
+    ]